@@ -0,0 +1,133 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Measures the throughput of obj2Fiware and fiware2Obj on the corpora (see corpora.py)
+    with encode=False, encode=True and compactArrays=True. The ROS-Messages are also decoded
+    directly into their classes (fiware2Obj/<corpus>/message). For every case the operations per
+    second and the JSON-bytes per second are printed and compared with the stored baseline:
+
+        python benchmarks/bench_conversion.py                 # compare with baseline.json
+        python benchmarks/bench_conversion.py --save          # store the results as new baseline
+        python benchmarks/bench_conversion.py --filter image  # only cases containing 'image'
+
+    The exit code is 1 if a case is slower than the baseline by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from object_fiware_converter import ObjectFiwareConverter
+from json_to_object.message_plan import MessagePlan, isMessage
+import json_backend
+import corpora
+
+BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+# Suffix of the case, encode and compactArrays
+VARIANTS = [("plain", False, False), ("encode", True, False), ("compact", False, True)]
+
+
+class Target(object):
+    """ The Object in which the Entities are converted back """
+    pass
+
+
+def cases(filterText=None):
+    """ Yields (name, function, number of JSON-bytes per call) for every benchmark """
+    for corpusName, _ in corpora.CORPORA:
+        _object = corpora.create(corpusName)
+        for suffix, encode, compactArrays in VARIANTS:
+            jsonStr = ObjectFiwareConverter.obj2Fiware(_object, encode=encode, compactArrays=compactArrays)
+            size = len(jsonStr.encode('utf-8'))
+
+            name = "obj2Fiware/{}/{}".format(corpusName, suffix)
+            if filterText is None or filterText in name:
+                yield name, (lambda _object=_object, encode=encode, compactArrays=compactArrays: ObjectFiwareConverter.obj2Fiware(
+                    _object, encode=encode, compactArrays=compactArrays)), size
+
+            name = "fiware2Obj/{}/{}".format(corpusName, suffix)
+            if filterText is None or filterText in name:
+                yield name, (lambda jsonStr=jsonStr, encode=encode: ObjectFiwareConverter.fiware2Obj(jsonStr, Target(), setAttr=True, encoded=encode)), size
+
+        name = "fiware2Obj/{}/message".format(corpusName)
+        if isMessage(_object) and (filterText is None or filterText in name):
+            jsonStr = ObjectFiwareConverter.obj2Fiware(_object)
+            yield name, (lambda jsonStr=jsonStr, cls=_object.__class__: ObjectFiwareConverter.fiware2Obj(jsonStr, cls)), len(jsonStr.encode('utf-8'))
+
+
+def measure(function, minTime, repeat):
+    """ Returns the best time of one call, every measurement takes at least minTime seconds """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * minTime / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--baseline", default=BASELINE, help="JSON-file with the ops/s of a previous run")
+    parser.add_argument("--save", action="store_true", help="store the results as baseline")
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimal seconds per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    for typeName, messageClass in corpora.MESSAGE_CLASSES.items():
+        MessagePlan.register(messageClass, typeName)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if "_environment" in baseline:
+        print("Baseline: Python {python}, JSON-backend {jsonBackend}".format(**baseline["_environment"]))
+    results = {}
+    regressions = []
+    print("{:<36} {:>12} {:>12} {:>10}".format("case", "ops/s", "MB/s", "baseline"))
+    for name, function, size in cases(args.filter):
+        seconds = measure(function, args.min_time, args.repeat)
+        ops = 1.0 / seconds
+        results[name] = dict(ops=ops, bytes=size)
+        comparison = ""
+        if name in baseline:
+            ratio = ops / baseline[name]["ops"]
+            comparison = "{:+.1%}".format(ratio - 1)
+            if ratio < 1 - args.tolerance:
+                regressions.append(name)
+                comparison += " !"
+        print("{:<36} {:>12.1f} {:>12.2f} {:>10}".format(name, ops, ops * size / 1e6, comparison))
+
+    if args.save:
+        baseline.update(results)
+        # The results depend on the environment
+        baseline["_environment"] = dict(python=sys.version.split()[0], jsonBackend=json_backend.get().name)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Baseline saved to " + args.baseline)
+    if regressions:
+        print("Slower than the baseline: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Synthetic Objects for the benchmarks. Every corpus is created with a fixed seed,
+    so that all runs convert the same values. The ROS-like Messages mimic the classes
+    generated by genpy (__slots__, _slot_types and _type).
+"""
+
+import random
+
+SEED = 4711
+
+
+class Time(object):
+    __slots__ = ['secs', 'nsecs']
+
+    def __init__(self, rnd):
+        self.secs = rnd.randint(0, 2 ** 31 - 1)
+        self.nsecs = rnd.randint(0, 999999999)
+
+
+class Header(object):
+    __slots__ = ['seq', 'stamp', 'frame_id', '_type']
+    _slot_types = ['uint32', 'time', 'string', 'string']
+
+    def __init__(self, rnd, frame_id="base_link"):
+        self.seq = rnd.randint(0, 2 ** 32 - 1)
+        self.stamp = Time(rnd)
+        self.frame_id = frame_id
+        self._type = 'std_msgs/Header'
+
+
+class Image(object):
+    __slots__ = ['header', 'height', 'width', 'encoding', 'is_bigendian', 'step', 'data', '_type']
+    _slot_types = ['std_msgs/Header', 'uint32', 'uint32', 'string', 'uint8', 'uint32', 'uint8[]', 'string']
+
+    def __init__(self, rnd, height=240, width=320):
+        self.header = Header(rnd, "camera")
+        self.height = height
+        self.width = width
+        self.encoding = "rgb8"
+        self.is_bigendian = 0
+        self.step = width * 3
+        # ROS delivers uint8[] as bytes
+        self.data = bytes(bytearray(rnd.getrandbits(8) for _ in range(height * width * 3)))
+        self._type = 'sensor_msgs/Image'
+
+
+class PointField(object):
+    __slots__ = ['name', 'offset', 'datatype', 'count', '_type']
+    _slot_types = ['string', 'uint32', 'uint8', 'uint32', 'string']
+
+    def __init__(self, name, offset):
+        self.name = name
+        self.offset = offset
+        self.datatype = 7  # FLOAT32
+        self.count = 1
+        self._type = 'sensor_msgs/PointField'
+
+
+class PointCloud2(object):
+    __slots__ = ['header', 'height', 'width', 'fields', 'is_bigendian', 'point_step', 'row_step', 'data', 'is_dense', '_type']
+    _slot_types = ['std_msgs/Header', 'uint32', 'uint32', 'sensor_msgs/PointField[]', 'bool', 'uint32', 'uint32', 'uint8[]', 'bool', 'string']
+
+    def __init__(self, rnd, points=4096):
+        self.header = Header(rnd, "lidar")
+        self.height = 1
+        self.width = points
+        self.fields = [PointField(name, 4 * i) for i, name in enumerate("xyz")]
+        self.is_bigendian = False
+        self.point_step = 12
+        self.row_step = 12 * points
+        self.data = bytes(bytearray(rnd.getrandbits(8) for _ in range(self.row_step)))
+        self.is_dense = True
+        self._type = 'sensor_msgs/PointCloud2'
+
+
+class Vector3(object):
+    __slots__ = ['x', 'y', 'z', '_type']
+    _slot_types = ['float64', 'float64', 'float64', 'string']
+
+    def __init__(self, rnd, _type='geometry_msgs/Vector3'):
+        self.x = rnd.uniform(-100, 100)
+        self.y = rnd.uniform(-100, 100)
+        self.z = rnd.uniform(-100, 100)
+        self._type = _type
+
+
+class Quaternion(object):
+    __slots__ = ['x', 'y', 'z', 'w', '_type']
+    _slot_types = ['float64', 'float64', 'float64', 'float64', 'string']
+
+    def __init__(self, rnd):
+        self.x = rnd.random()
+        self.y = rnd.random()
+        self.z = rnd.random()
+        self.w = rnd.random()
+        self._type = 'geometry_msgs/Quaternion'
+
+
+class Pose(object):
+    __slots__ = ['position', 'orientation', '_type']
+    _slot_types = ['geometry_msgs/Point', 'geometry_msgs/Quaternion', 'string']
+
+    def __init__(self, rnd):
+        self.position = Vector3(rnd, 'geometry_msgs/Point')
+        self.orientation = Quaternion(rnd)
+        self._type = 'geometry_msgs/Pose'
+
+
+class PoseWithCovariance(object):
+    __slots__ = ['pose', 'covariance', '_type']
+    _slot_types = ['geometry_msgs/Pose', 'float64[36]', 'string']
+
+    def __init__(self, rnd):
+        self.pose = Pose(rnd)
+        self.covariance = [rnd.random() for _ in range(36)]
+        self._type = 'geometry_msgs/PoseWithCovariance'
+
+
+class Twist(object):
+    __slots__ = ['linear', 'angular', '_type']
+    _slot_types = ['geometry_msgs/Vector3', 'geometry_msgs/Vector3', 'string']
+
+    def __init__(self, rnd):
+        self.linear = Vector3(rnd)
+        self.angular = Vector3(rnd)
+        self._type = 'geometry_msgs/Twist'
+
+
+class TwistWithCovariance(object):
+    __slots__ = ['twist', 'covariance', '_type']
+    _slot_types = ['geometry_msgs/Twist', 'float64[36]', 'string']
+
+    def __init__(self, rnd):
+        self.twist = Twist(rnd)
+        self.covariance = [rnd.random() for _ in range(36)]
+        self._type = 'geometry_msgs/TwistWithCovariance'
+
+
+class Odometry(object):
+    __slots__ = ['header', 'child_frame_id', 'pose', 'twist', '_type']
+    _slot_types = ['std_msgs/Header', 'string', 'geometry_msgs/PoseWithCovariance', 'geometry_msgs/TwistWithCovariance', 'string']
+
+    def __init__(self, rnd):
+        self.header = Header(rnd, "odom")
+        self.child_frame_id = "base_link"
+        self.pose = PoseWithCovariance(rnd)
+        self.twist = TwistWithCovariance(rnd)
+        self._type = 'nav_msgs/Odometry'
+
+
+class LaserScan(object):
+    __slots__ = ['header', 'angle_min', 'angle_max', 'angle_increment', 'time_increment', 'scan_time',
+                 'range_min', 'range_max', 'ranges', 'intensities', '_type']
+    _slot_types = ['std_msgs/Header', 'float32', 'float32', 'float32', 'float32', 'float32',
+                   'float32', 'float32', 'float32[]', 'float32[]', 'string']
+
+    def __init__(self, rnd, beams=720):
+        self.header = Header(rnd, "laser")
+        self.angle_min = -3.14159
+        self.angle_max = 3.14159
+        self.angle_increment = 6.28318 / beams
+        self.time_increment = 0.0001
+        self.scan_time = 0.1
+        self.range_min = 0.05
+        self.range_max = 30.0
+        self.ranges = [rnd.uniform(0.05, 30.0) for _ in range(beams)]
+        self.intensities = [rnd.uniform(0, 1000) for _ in range(beams)]
+        self._type = 'sensor_msgs/LaserScan'
+
+
+class NestedDicts(object):
+    """ A (plain) class with deeply nested dicts of mixed primitives """
+
+    def __init__(self, rnd, depth=5, width=3):
+        self.id = "Nested1"
+        self.tree = self._tree(rnd, depth, width)
+
+    def _tree(self, rnd, depth, width):
+        if depth == 0:
+            return rnd.choice([rnd.randint(-1000, 1000), rnd.random(), "leaf/" + str(rnd.randint(0, 99)), True, None])
+        return dict(("key" + str(i), self._tree(rnd, depth - 1, width)) for i in range(width))
+
+
+class LongLists(object):
+    """ A (plain) class with long lists of primitives """
+
+    def __init__(self, rnd, length=10000):
+        self.id = "Lists1"
+        self.floats = [rnd.random() for _ in range(length)]
+        self.ints = [rnd.randint(-2 ** 31, 2 ** 31 - 1) for _ in range(length)]
+        self.strings = ["item " + str(i) for i in range(length // 10)]
+
+
+# Message-type -> class of the nested Messages, so that they can be decoded directly (see MessagePlan)
+MESSAGE_CLASSES = {
+    'time': Time,
+    'std_msgs/Header': Header,
+    'sensor_msgs/PointField': PointField,
+    'geometry_msgs/Vector3': Vector3,
+    'geometry_msgs/Point': Vector3,
+    'geometry_msgs/Quaternion': Quaternion,
+    'geometry_msgs/Pose': Pose,
+    'geometry_msgs/PoseWithCovariance': PoseWithCovariance,
+    'geometry_msgs/Twist': Twist,
+    'geometry_msgs/TwistWithCovariance': TwistWithCovariance,
+}
+
+# Name -> Function which creates the Object from a seeded Random
+CORPORA = [
+    ("image", lambda rnd: Image(rnd)),
+    ("pointcloud2", lambda rnd: PointCloud2(rnd)),
+    ("odometry", lambda rnd: Odometry(rnd)),
+    ("laserscan", lambda rnd: LaserScan(rnd)),
+    ("nested_dicts", lambda rnd: NestedDicts(rnd)),
+    ("long_lists", lambda rnd: LongLists(rnd)),
+]
+
+
+def create(name, seed=SEED):
+    """ Creates the Object of the corpus with the given seed """
+    for corpusName, factory in CORPORA:
+        if corpusName == name:
+            return factory(random.Random(seed))
+    raise ValueError("Unknown corpus '{}'".format(name))
@@ -0,0 +1,162 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Splits a response with many Entities (the JSON-Array of GET /v2/entities or newline-delimited
+    Entities, see obj2FiwareStream) into the JSON-texts of the single Entities while it is read.
+    Only the current Entity and the unread rest of one chunk are kept in memory.
+"""
+
+import re
+
+# Bytes read from a file-like object at once
+CHUNK_SIZE = 1 << 16
+
+UNEXPECTED_END_MESSAGE = "Unexpected end of the JSON-stream"
+NOT_AN_ENTITY_MESSAGE = "Expected an Entity (JSON-Object) at byte {}, found {!r}"
+NOT_A_SEPARATOR_MESSAGE = "Expected ',' or ']' after the Entity at byte {}, found {!r}"
+
+# Skips everything (also complete Strings) up to the next character, which changes the nesting,
+# or up to the start of a String, which does not end in the buffer
+_SKIP = re.compile(b'[^"\\[\\]{}]*(?:"[^"\\\\]*(?:\\\\[\\s\\S][^"\\\\]*)*"[^"\\[\\]{}]*)*')
+# Skips the rest of a String up to its end, up to an escape at the end of the buffer or to the end
+_STRING_REST = re.compile(b'[^"\\\\]*(?:\\\\[\\s\\S][^"\\\\]*)*')
+_WHITESPACE = frozenset(bytearray(b" \t\r\n"))
+_QUOTE, _BACKSLASH, _COMMA = ord('"'), ord('\\'), ord(',')
+_OPEN_OBJECT, _OPEN_ARRAY, _CLOSE_ARRAY = ord('{'), ord('['), ord(']')
+# Expected between the Entities of a JSON-Array: the first Entity or ']', ',' or ']', the next Entity
+_EXPECT_FIRST, _EXPECT_SEPARATOR, _EXPECT_ENTITY = range(3)
+
+
+class EntitySplitter(object):
+    """ Incremental splitter: feed(chunk) returns the JSON-texts (bytes) of all Entities, which
+        are completed by the chunk, close() checks that the input ended after the last one.
+        The input is either one JSON-Array of Entities or Entities separated by whitespace.
+        Only the nesting and the commas between the Entities are checked, every Entity is
+        validated when it is parsed.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0           # Next byte to scan
+        self._start = None      # Start of the current Entity
+        self._depth = 0
+        self._inString = False
+        self._array = None      # Input is a JSON-Array (None: not known yet)
+        self._closed = False    # The JSON-Array has ended
+        self._expect = _EXPECT_FIRST
+        self._offset = 0        # Bytes dropped from the buffer
+
+    def feed(self, chunk):
+        """ Adds the chunk (bytes or str) and returns the completed Entities """
+        if not isinstance(chunk, (bytes, bytearray)):
+            chunk = chunk.encode('utf-8')
+        buf = self._buffer
+        buf += chunk
+        entities = []
+        pos, start, depth, inString, expect = self._pos, self._start, self._depth, self._inString, self._expect
+        skip, stringRest = _SKIP.match, _STRING_REST.match
+        length = len(buf)
+        while pos < length:
+            if start is None:
+                # Between the Entities
+                byte = buf[pos]
+                if byte in _WHITESPACE:
+                    pos += 1
+                    continue
+                if self._array is None:
+                    self._array = byte == _OPEN_ARRAY
+                    if self._array:
+                        pos += 1
+                        continue
+                if self._array and not self._closed:
+                    if byte == _CLOSE_ARRAY and expect != _EXPECT_ENTITY:
+                        self._closed = True
+                        pos += 1
+                        continue
+                    if expect == _EXPECT_SEPARATOR:
+                        if byte != _COMMA:
+                            raise ValueError(NOT_A_SEPARATOR_MESSAGE.format(self._offset + pos, chr(byte)))
+                        expect = _EXPECT_ENTITY
+                        pos += 1
+                        continue
+                if byte != _OPEN_OBJECT or self._closed:
+                    raise ValueError(NOT_AN_ENTITY_MESSAGE.format(self._offset + pos, chr(byte)))
+                start = pos
+                depth = 1
+                pos += 1
+            elif inString:
+                pos = stringRest(buf, pos).end()
+                if pos == length or buf[pos] == _BACKSLASH:
+                    # The String (or the escaped character) continues in the next chunk
+                    break
+                inString = False
+                pos += 1
+            else:
+                pos = skip(buf, pos).end()
+                if pos == length:
+                    break
+                byte = buf[pos]
+                pos += 1
+                if byte == _QUOTE:
+                    inString = True
+                elif byte == _OPEN_OBJECT or byte == _OPEN_ARRAY:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        entities.append(bytes(buf[start:pos]))
+                        start = None
+                        expect = _EXPECT_SEPARATOR
+
+        # Drop everything before the current Entity
+        keep = pos if start is None else start
+        if keep:
+            del buf[:keep]
+            self._offset += keep
+            pos -= keep
+            if start is not None:
+                start = 0
+        self._pos, self._start, self._depth, self._inString, self._expect = pos, start, depth, inString, expect
+        return entities
+
+    def close(self):
+        """ Raises a ValueError if the last Entity (or the JSON-Array) is incomplete """
+        if self._start is not None or (self._array and not self._closed):
+            raise ValueError(UNEXPECTED_END_MESSAGE)
+
+
+def chunks(source, chunkSize=CHUNK_SIZE):
+    """ Yields the chunks of a str/bytes, a file-like object (read) or an iterable of chunks
+        (e.g. the body of a HTTP-response with iter_content)
+    """
+    if isinstance(source, (bytes, bytearray, type(u""))):
+        yield source
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunkSize)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        for chunk in source:
+            yield chunk
+
+
+def iterEntities(source, chunkSize=CHUNK_SIZE):
+    """ Yields the JSON-texts (bytes) of the Entities in the source one after the other """
+    splitter = EntitySplitter()
+    for chunk in chunks(source, chunkSize):
+        for entity in splitter.feed(chunk):
+            yield entity
+    splitter.close()
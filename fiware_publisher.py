@@ -0,0 +1,238 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" An (optional) asyncio-Client, which converts Objects with the ObjectFiwareConverter
+    and sends them to the NGSIv2-Api of a Context-Broker. Only the standard library is used.
+    Needs Python 3.7 or newer.
+"""
+
+import asyncio
+import url_encoding
+
+from object_fiware_converter import ObjectFiwareConverter
+
+# Status codes which are worth another try
+RETRY_STATUS = set([408, 429, 500, 502, 503, 504])
+# Status codes, with which the Context-Broker (or a proxy) rejects a Request without processing it
+REJECTED_STATUS = set([408, 429, 503])
+# Requests, which can be repeated without changing the result
+IDEMPOTENT_METHODS = set(["GET", "HEAD", "PUT", "PATCH", "DELETE"])
+
+
+class FiwarePublishError(Exception):
+    """ The Context-Broker did not accept the Request """
+
+    def __init__(self, status, body):
+        Exception.__init__(self, "Context-Broker responded with {}: {}".format(status, body[:200]))
+        self.status = status
+        self.body = body
+
+
+class FiwarePublisher(object):
+    """ Publishes Objects to the Context-Broker on host:port. Up to maxConnections
+        keep-alive connections are opened and reused, at most maxInFlight Objects are
+        converted and sent at once. Failed Requests (connection errors, timeouts and
+        RETRY_STATUS) are repeated up to retries times, waiting backoff * 2**attempt seconds
+        in between. A POST, which may have reached the Context-Broker, is not repeated (it
+        would create the Entities twice): only if the connection could not be opened or the
+        Request was rejected with REJECTED_STATUS. A Request on an idle connection, which the
+        Context-Broker closed without answering, is sent once more on a new connection.
+        The semaphores and connections belong to the event loop, in which the publisher is
+        used first (e.g. inside asyncio.run); they are created again in another loop.
+        The endpoint depends on showIdValue:
+            - True:  POST  /v2/entities (creates the Entity)
+            - False: PATCH /v2/entities/{id}/attrs (updates the Entity with the 'id' of the Object)
+        publishBatch uses POST /v2/op/update. With keyValues the Entities are sent
+        in the keyValues-Representation (options=keyValues).
+    """
+
+    def __init__(self, host="localhost", port=1026, maxConnections=4, maxInFlight=16, retries=3, backoff=0.1,
+                 timeout=10.0, service=None, servicePath=None):
+        self.host = host
+        self.port = port
+        self.maxConnections = maxConnections
+        self.maxInFlight = maxInFlight
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = {"Host": "{}:{}".format(host, port), "Content-Type": "application/json"}
+        if service is not None:
+            self.headers["Fiware-Service"] = service
+        if servicePath is not None:
+            self.headers["Fiware-ServicePath"] = servicePath
+        # Created in the running loop (see _bind), before Python 3.10 they are bound to the loop of their creation
+        self._loop = None
+        self._inFlight = None
+        self._connections = None
+        self._idle = []
+
+    async def publish(self, _object, showIdValue=True, dataTypeDict={}, ignorePythonMetaData=False, encode=False, packThreshold=None,
+                      keyValues=False, schema=None, idGenerator=None):
+        """ Converts and sends the Object, returns the status code. With an IdRegistry as
+            idGenerator (see entity_id.py), Objects without 'id' are created only once
+        """
+        self._bind()
+        async with self._inFlight:
+            body = ObjectFiwareConverter.obj2Fiware(_object, dataTypeDict=dataTypeDict, ignorePythonMetaData=ignorePythonMetaData,
+                                                    showIdValue=showIdValue, encode=encode, packThreshold=packThreshold, asBytes=True,
+                                                    keyValues=keyValues, schema=schema, idGenerator=idGenerator)
+            if showIdValue:
+                return await self.request("POST", _withOptions("/v2/entities", keyValues), body)
+            return await self.request("PATCH", _withOptions(self._attrsPath(_object, encode), keyValues), body)
+
+    async def publishMany(self, _objects, **options):
+        """ Publishes all Objects concurrently, returns their status codes in order """
+        return await asyncio.gather(*[self.publish(_object, **options) for _object in _objects])
+
+    async def publishBatch(self, _objects, actionType="append", dataTypeDict={}, ignorePythonMetaData=False, encode=False, packThreshold=None,
+                           keyValues=False, schema=None, idGenerator=None):
+        """ Sends all Objects in one batch update operation, returns the status code """
+        self._bind()
+        async with self._inFlight:
+            body = ObjectFiwareConverter.obj2FiwareBatch(_objects, actionType=actionType, dataTypeDict=dataTypeDict, ignorePythonMetaData=ignorePythonMetaData,
+                                                         encode=encode, asBytes=True, packThreshold=packThreshold, keyValues=keyValues, schema=schema,
+                                                         idGenerator=idGenerator)
+            return await self.request("POST", _withOptions("/v2/op/update", keyValues), body)
+
+    async def request(self, method, path, body):
+        """ Sends the Request (with retries), returns the status code or raises a FiwarePublishError """
+        self._bind()
+        idempotent = method in IDEMPOTENT_METHODS
+        retryStatus = RETRY_STATUS if idempotent else REJECTED_STATUS
+        attempt = 0
+        while True:
+            sent = []
+            try:
+                status, response = await asyncio.wait_for(self._send(method, path, body, sent), self.timeout)
+            except (OSError, EOFError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                if attempt >= self.retries or (sent and not idempotent):
+                    raise
+            else:
+                if status < 300:
+                    return status
+                if status not in retryStatus or attempt >= self.retries:
+                    raise FiwarePublishError(status, response.decode('utf-8', 'replace'))
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    async def _send(self, method, path, body, sent):
+        """ Sends the Request on an idle or a new connection, appends to sent before the first byte is written """
+        head = ["{} {} HTTP/1.1".format(method, path), "Content-Length: {}".format(len(body))]
+        head.extend("{}: {}".format(key, value) for key, value in self.headers.items())
+        request = ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body
+        async with self._connections:
+            reuse = True
+            while True:
+                reused = reuse and bool(self._idle)
+                if reused:
+                    reader, writer = self._idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                try:
+                    sent.append(True)
+                    writer.write(request)
+                    await writer.drain()
+                    status, headers, response = await _readResponse(reader)
+                except _NoResponse:
+                    writer.close()
+                    if not reused:
+                        raise
+                    # The Context-Broker closed the idle connection before it read the Request
+                    reuse = False
+                    continue
+                except BaseException:
+                    # The state of the connection is unknown
+                    writer.close()
+                    raise
+                break
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+            else:
+                self._idle.append((reader, writer))
+            return status, response
+
+    def _bind(self):
+        """ Creates the semaphores in the running loop (again, if the loop has changed) """
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._inFlight = asyncio.Semaphore(self.maxInFlight)
+            self._connections = asyncio.Semaphore(self.maxConnections)
+            # Connections of another loop cannot be used (nor closed) in this one
+            self._idle = []
+
+    def _attrsPath(self, _object, encode):
+        entityId = _object["id"] if isinstance(_object, dict) else getattr(_object, "id", None)
+        if entityId is None:
+            raise ValueError("Updating an Entity (showIdValue=False) needs the 'id' of the Object")
+        if isinstance(_object, dict):
+            entityType = _object.get("type", _object.__class__.__name__)
+        else:
+            entityType = getattr(_object, "type", _object.__class__.__name__)
+        if encode:
+            # The Entity is stored with the encoded id and type
+            entityId = url_encoding.quote(entityId)
+            entityType = url_encoding.quote(entityType)
+        return "/v2/entities/{}/attrs?type={}".format(url_encoding.quote(entityId), url_encoding.quote(entityType))
+
+    async def close(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+class _NoResponse(EOFError):
+    """ The connection was closed before the first byte of the response """
+
+
+def _withOptions(path, keyValues):
+    if not keyValues:
+        return path
+    return path + ("&" if "?" in path else "?") + "options=keyValues"
+
+
+async def _readResponse(reader):
+    statusLine = await reader.readline()
+    if not statusLine:
+        raise _NoResponse("Connection closed by the Context-Broker")
+    status = int(statusLine.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode('latin-1').partition(":")
+        headers[key.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            chunks.append(chunk[:-2])
+        response = b"".join(chunks)
+    else:
+        response = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers, response
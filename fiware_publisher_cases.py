@@ -0,0 +1,274 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" The tests of the FiwarePublisher, which need Python 3 (see test_fiware_publisher.py) """
+
+import asyncio
+import json
+import unittest
+
+from fiware_publisher import FiwarePublisher, FiwarePublishError
+
+
+class StubBroker(object):
+    """ A local HTTP-Server, which records the Requests and answers with the given status codes """
+
+    def __init__(self, statusCodes=(), default=201, chunked=False, closeIdle=False):
+        self.statusCodes = list(statusCodes)
+        self.default = default
+        self.chunked = chunked
+        # Closes the keep-alive connection after every response (without 'Connection: close')
+        self.closeIdle = closeIdle
+        self.requests = []
+        self.connections = 0
+        self.inFlight = 0
+        self.maxInFlight = 0
+        self.handlers = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        for handler in list(self.handlers):
+            handler.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b"\r\n":
+                        break
+                    key, _, value = line.decode('latin-1').partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers["content-length"]))
+                method, path, _ = requestLine.decode('latin-1').split(" ")
+                self.requests.append((method, path, headers, json.loads(body.decode('utf-8'))))
+
+                self.inFlight += 1
+                self.maxInFlight = max(self.maxInFlight, self.inFlight)
+                await asyncio.sleep(0.01)
+                self.inFlight -= 1
+
+                status = self.statusCodes.pop(0) if self.statusCodes else self.default
+                response = b'{"error":"Stub"}' if status >= 300 else b""
+                if self.chunked:
+                    writer.write("HTTP/1.1 {} Stub\r\nTransfer-Encoding: chunked\r\n\r\n".format(status).encode('latin-1'))
+                    if response:
+                        writer.write("{:x}\r\n".format(len(response)).encode('latin-1') + response + b"\r\n")
+                    writer.write(b"0\r\n\r\n")
+                else:
+                    writer.write("HTTP/1.1 {} Stub\r\nContent-Length: {}\r\n\r\n".format(status, len(response)).encode('latin-1') + response)
+                await writer.drain()
+                if self.closeIdle:
+                    break
+        finally:
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+def run(test):
+    """ Runs the coroutine function test(broker) against a started StubBroker """
+    def wrapper(self):
+        async def main():
+            broker = StubBroker(*getattr(self, "brokerArgs", ()))
+            await broker.start()
+            try:
+                await test(self, broker)
+            finally:
+                await broker.stop()
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(main())
+        finally:
+            loop.close()
+    return wrapper
+
+
+class TestFiwarePublisher(unittest.TestCase):
+    brokerArgs = ()
+
+    @run
+    async def test_PostEntities(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, service="factory", servicePath="/hall") as publisher:
+            self.assertEqual(await publisher.publish(Robot("Robot1")), 201)
+        method, path, headers, body = broker.requests[0]
+        self.assertEqual((method, path), ("POST", "/v2/entities"))
+        self.assertEqual(headers["fiware-service"], "factory")
+        self.assertEqual(headers["fiware-servicepath"], "/hall")
+        self.assertEqual(headers["content-type"], "application/json")
+        self.assertEqual((body["id"], body["type"], body["speed"]["value"]), ("Robot1", "Robot", 1.5))
+
+    @run
+    async def test_PatchAttrs(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port) as publisher:
+            await publisher.publish(Robot("Robot/1"), showIdValue=False)
+            await publisher.publish(Robot("Robot/1"), showIdValue=False, encode=True)
+            with self.assertRaises(ValueError):
+                await publisher.publish(object(), showIdValue=False)
+        self.assertEqual([request[:2] for request in broker.requests], [
+            ("PATCH", "/v2/entities/Robot%2F1/attrs?type=Robot"),
+            ("PATCH", "/v2/entities/Robot%252F1/attrs?type=Robot")])
+        self.assertFalse("id" in broker.requests[0][3])
+
+    @run
+    async def test_KeyValues(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port) as publisher:
+            await publisher.publish(Robot("Robot1"), keyValues=True)
+            await publisher.publish(Robot("Robot1"), showIdValue=False, keyValues=True)
+            await publisher.publishBatch([Robot("Robot2")], keyValues=True)
+        self.assertEqual([request[:2] for request in broker.requests], [
+            ("POST", "/v2/entities?options=keyValues"),
+            ("PATCH", "/v2/entities/Robot1/attrs?type=Robot&options=keyValues"),
+            ("POST", "/v2/op/update?options=keyValues")])
+        self.assertEqual(broker.requests[0][3], dict(id="Robot1", type="Robot", speed=1.5, name="Arm"))
+
+    @run
+    async def test_Batch(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port) as publisher:
+            await publisher.publishBatch([Robot("Robot1"), Robot("Robot2")], actionType="update")
+        method, path, _, body = broker.requests[0]
+        self.assertEqual((method, path), ("POST", "/v2/op/update"))
+        self.assertEqual(body["actionType"], "update")
+        self.assertEqual([entity["id"] for entity in body["entities"]], ["Robot1", "Robot2"])
+
+    @run
+    async def test_ConnectionsAreReusedAndBounded(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, maxConnections=2) as publisher:
+            statusCodes = await publisher.publishMany([Robot("Robot" + str(i)) for i in range(10)])
+        self.assertEqual(statusCodes, [201] * 10)
+        self.assertEqual(broker.connections, 2)
+        self.assertEqual(broker.maxInFlight, 2)
+        self.assertEqual(sorted(request[3]["id"] for request in broker.requests), sorted("Robot" + str(i) for i in range(10)))
+
+
+class TestFiwarePublisherRetry(unittest.TestCase):
+    brokerArgs = ([503, 503],)
+
+    @run
+    async def test_Retry(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, backoff=0.001) as publisher:
+            self.assertEqual(await publisher.publish(Robot("Robot1")), 201)
+        self.assertEqual(len(broker.requests), 3)
+
+    @run
+    async def test_RetriesExhausted(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, retries=1, backoff=0.001) as publisher:
+            with self.assertRaises(FiwarePublishError) as context:
+                await publisher.publish(Robot("Robot1"))
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(len(broker.requests), 2)
+
+
+class TestFiwarePublisherNonIdempotent(unittest.TestCase):
+    brokerArgs = ([500, 500],)
+
+    @run
+    async def test_NoRetryForPostAfterServerError(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, backoff=0.001) as publisher:
+            with self.assertRaises(FiwarePublishError) as context:
+                await publisher.publish(Robot("Robot1"))
+        self.assertEqual(context.exception.status, 500)
+        self.assertEqual(len(broker.requests), 1)
+
+    @run
+    async def test_RetryForPatch(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, backoff=0.001) as publisher:
+            self.assertEqual(await publisher.publish(Robot("Robot1"), showIdValue=False), 201)
+        self.assertEqual(len(broker.requests), 3)
+
+    @run
+    async def test_NoRetryForPostAfterTimeout(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, backoff=0.001, timeout=0.005) as publisher:
+            with self.assertRaises(asyncio.TimeoutError):
+                await publisher.publishBatch([Robot("Robot1")])
+        self.assertEqual(len(broker.requests), 1)
+
+
+class TestFiwarePublisherErrors(unittest.TestCase):
+    brokerArgs = ([422], 204, True)
+
+    @run
+    async def test_NoRetryForClientErrors(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, backoff=0.001) as publisher:
+            with self.assertRaises(FiwarePublishError) as context:
+                await publisher.publish(Robot("Robot1"))
+            self.assertEqual(context.exception.body, '{"error":"Stub"}')
+            # Chunked responses on the same connection
+            self.assertEqual(await publisher.publish(Robot("Robot1"), showIdValue=False), 204)
+        self.assertEqual(len(broker.requests), 2)
+        self.assertEqual(broker.connections, 1)
+
+    def test_ConnectionRefused(self):
+        async def main():
+            publisher = FiwarePublisher("127.0.0.1", 1, retries=1, backoff=0.001)
+            await publisher.publish(Robot("Robot1"))
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertRaises(OSError, loop.run_until_complete, main())
+        finally:
+            loop.close()
+
+
+class TestFiwarePublisherClosedConnections(unittest.TestCase):
+    brokerArgs = ((), 201, False, True)
+
+    @run
+    async def test_PostOnClosedIdleConnection(self, broker):
+        async with FiwarePublisher("127.0.0.1", broker.port, retries=0) as publisher:
+            for i in range(3):
+                self.assertEqual(await publisher.publish(Robot("Robot" + str(i))), 201)
+                # Let the Context-Broker close the idle connection
+                await asyncio.sleep(0.02)
+        self.assertEqual([request[3]["id"] for request in broker.requests], ["Robot0", "Robot1", "Robot2"])
+        self.assertEqual(broker.connections, 3)
+
+
+class TestFiwarePublisherLoops(unittest.TestCase):
+
+    def test_CreatedOutsideOfTheLoop(self):
+        publisher = FiwarePublisher("127.0.0.1", 1, maxConnections=1, maxInFlight=1)
+
+        async def main():
+            broker = StubBroker()
+            await broker.start()
+            publisher.port = broker.port
+            try:
+                return await publisher.publishMany([Robot("Robot" + str(i)) for i in range(4)])
+            finally:
+                await broker.stop()
+        # Semaphores under contention in two different loops
+        for _ in range(2):
+            loop = asyncio.new_event_loop()
+            try:
+                self.assertEqual(loop.run_until_complete(main()), [201] * 4)
+            finally:
+                loop.close()
+
+
+class Robot(object):
+    def __init__(self, id):
+        self.id = id
+        self.speed = 1.5
+        self.name = "Arm"
@@ -0,0 +1,179 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Statistics of the conversions of the ObjectFiwareConverter. They are only collected
+    while an Instrumentation is set with ObjectFiwareConverter.setInstrumentation(...),
+    otherwise no converter is wrapped and nothing is measured.
+"""
+
+import time
+
+# Directions of a conversion
+OBJ2FIWARE = "obj2Fiware"
+FIWARE2OBJ = "fiware2Obj"
+
+# Phases of a conversion
+INTROSPECTION = "introspection"     # Converting the Object into the Entity (without the following two)
+BASE64 = "base64"                   # Packing Arrays into Base64
+QUOTING = "quoting"                 # URL-encoding of Strings (encode=True)
+JSON = "json"                       # Serializing the Entity
+PARSING = "parsing"                 # Parsing the JSON-String
+DECODING = "decoding"               # Converting the Entity into the Object
+PHASES = [INTROSPECTION, BASE64, QUOTING, JSON, PARSING, DECODING]
+
+# Counters of every Entity (and summed up per Entity-type)
+COUNTERS = ["entities", "nodes", "attributes", "base64Fields", "base64Bytes", "bytes"]
+
+# Converters of these types neither pack nor quote and are not wrapped
+_UNMEASURED = set([type(None), bool, int, float, complex, tuple, list, dict])
+
+
+class Instrumentation(object):
+    """ Collects the time spent in every phase (timings) and the COUNTERS per direction
+        and Entity-type (types[direction][type]). onEntityStart(stats) is called before
+        and onEntityEnd(stats) after every Entity with its EntityStats.
+        An Instrumentation is not thread-safe.
+    """
+
+    def __init__(self, onEntityStart=None, onEntityEnd=None, clock=None):
+        self.onEntityStart = onEntityStart
+        self.onEntityEnd = onEntityEnd
+        self.clock = clock or getattr(time, "perf_counter", time.time)
+        self._converters = None
+        self.reset()
+
+    def reset(self):
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.types = {OBJ2FIWARE: {}, FIWARE2OBJ: {}}
+
+    def begin(self, direction, _object):
+        """ Returns the EntityStats of a new conversion """
+        stats = EntityStats(self, direction, _object)
+        if self.onEntityStart is not None:
+            self.onEntityStart(stats)
+        stats.start()
+        return stats
+
+    def timed(self, phase, function, *args, **kwargs):
+        """ Calls the function and adds its time to the phase """
+        start = self.clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.timings[phase] += self.clock() - start
+
+    def wrapConverters(self, converters):
+        """ Returns the converters of the ConversionContext, which measure packing and quoting """
+        if self._converters is None or self._converters[0] is not converters:
+            wrapped = dict((key, converter if key in _UNMEASURED else _measureConverter(converter))
+                           for key, converter in converters.items())
+            self._converters = (converters, wrapped)
+        return self._converters[1]
+
+    def report(self):
+        """ Returns the collected statistics as readable text """
+        lines = ["{:<14} {:>10.6f} s".format(phase, self.timings[phase]) for phase in PHASES]
+        for direction in (OBJ2FIWARE, FIWARE2OBJ):
+            for entityType, counters in sorted(self.types[direction].items()):
+                lines.append("{} {}: {}".format(direction, entityType, ", ".join(
+                    "{}={}".format(counter, counters[counter]) for counter in COUNTERS)))
+        return "\n".join(lines)
+
+    def _add(self, stats):
+        for phase, seconds in stats.timings.items():
+            self.timings[phase] += seconds
+        types = self.types[stats.direction]
+        if stats.type not in types:
+            types[stats.type] = dict.fromkeys(COUNTERS, 0)
+        counters = types[stats.type]
+        counters["entities"] += 1
+        for counter in COUNTERS[1:]:
+            counters[counter] += getattr(stats, counter)
+
+
+class EntityStats(object):
+    """ The statistics of the conversion of one Entity (Object) """
+    __slots__ = ['instrumentation', 'direction', 'object', 'type', 'nodes', 'attributes',
+                 'base64Fields', 'base64Bytes', 'bytes', 'timings', '_last', '_nested']
+
+    def __init__(self, instrumentation, direction, _object):
+        self.instrumentation = instrumentation
+        self.direction = direction
+        self.object = _object
+        self.type = None
+        self.nodes = 0
+        self.attributes = 0
+        self.base64Fields = 0
+        self.base64Bytes = 0
+        self.bytes = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+
+    def start(self):
+        self._last = self.instrumentation.clock()
+        self._nested = 0.0
+
+    def mark(self, phase):
+        """ Adds the time since the last mark to the phase, without the time of
+            the (nested) phases which were measured in between
+        """
+        now = self.instrumentation.clock()
+        self.timings[phase] += now - self._last - self._nested
+        self._last = now
+        self._nested = 0.0
+
+    def end(self, entityType, attributes, body=None):
+        """ Finishes the Entity, its statistics are added to the Instrumentation """
+        self.type = entityType
+        self.attributes = attributes
+        # The Attributes are nodes, too
+        self.nodes += attributes
+        if body is not None:
+            self.bytes = len(body)
+        self.instrumentation._add(self)
+        if self.instrumentation.onEntityEnd is not None:
+            self.instrumentation.onEntityEnd(self)
+        return body
+
+    def wrapMake(self, make):
+        """ Counts the nodes created by 'make' of the ConversionContext """
+        def countingMake(_object, concreteDataType=None):
+            self.nodes += 1
+            return make(_object, concreteDataType)
+        return countingMake
+
+    def wrapConverters(self, converters):
+        return self.instrumentation.wrapConverters(converters)
+
+    def _nestedPhase(self, phase, seconds):
+        self.timings[phase] += seconds
+        self._nested += seconds
+
+
+def _measureConverter(converter):
+    """ Wraps a converter of EntityAttribute, so that packing into Base64
+        and quoting of Strings are measured
+    """
+    def measuredConverter(_object, concreteDataType, ctx):
+        stats = ctx.stats
+        clock = stats.instrumentation.clock
+        start = clock()
+        value, type_, metadata = converter(_object, concreteDataType, ctx)
+        if type_ == "base64":
+            stats._nestedPhase(BASE64, clock() - start)
+            stats.base64Fields += 1
+            stats.base64Bytes += len(value)
+        elif type_ == "string" and ctx.encode:
+            stats._nestedPhase(QUOTING, clock() - start)
+        return value, type_, metadata
+    return measuredConverter
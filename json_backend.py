@@ -0,0 +1,248 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Backends which serialize (dumps) and parse (loads) the JSON of the ObjectFiwareConverter.
+    The fastest installed one of orjson, ujson and rapidjson is used, otherwise
+    the json-module of the standard library. With use(name) another backend can be set.
+    The JSON-text is always exactly the one of the stdlib: A backend only serializes if it
+    can reproduce it (see supportsIndent), for all other indents and values (e.g. integers
+    beyond 64 bit, NaN or non ASCII-text) the stdlib is used.
+"""
+
+import json
+import re
+
+# In order of preference
+BACKEND_NAMES = ["orjson", "ujson", "rapidjson", "json"]
+
+# The errors of the backends if they cannot handle a value
+_UNSUPPORTED = (TypeError, ValueError, OverflowError)
+
+
+class JsonBackend(object):
+    """ The json-module of the standard library. Every backend has the same interface:
+        dumps(obj, indent, default, plain) returns a str, dumpBytes the UTF-8 encoded bytes.
+        A backend raises one of _UNSUPPORTED for values it cannot write like the stdlib.
+        plain is a hint that obj only contains PLAIN_TYPES (see dumps).
+    """
+    name = "json"
+
+    def supportsIndent(self, indent):
+        return True
+
+    def dumps(self, obj, indent=None, default=None, plain=False):
+        return json.dumps(obj, default=default, indent=indent)
+
+    def dumpBytes(self, obj, indent=None, default=None, plain=False):
+        return self.dumps(obj, indent, default).encode('utf-8')
+
+    def loads(self, jsonStr):
+        return json.loads(jsonStr)
+
+
+class OrjsonBackend(JsonBackend):
+    """ orjson serializes directly into bytes. It is only used with an indent of 0 or 2, for which
+        the stdlib uses its (much slower) pure Python encoder. Without indent the stdlib is as fast.
+        orjson writes non ASCII-text, NaN/Infinity (as null) and floats with an exponent
+        differently, such values are rejected by _reproducible. A plain obj is not walked
+        beforehand, only the JSON is searched for such values (see _suspicious).
+    """
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def supportsIndent(self, indent):
+        return indent is not None and indent in (0, 2)
+
+    def dumps(self, obj, indent=None, default=None, plain=False):
+        return self.dumpBytes(obj, indent, default, plain).decode('utf-8')
+
+    def dumpBytes(self, obj, indent=None, default=None, plain=False):
+        if indent is None or indent not in (0, 2) or not (plain or _reproducible(obj)):
+            raise ValueError("orjson cannot reproduce the JSON of the stdlib")
+        jsonBytes = self._orjson.dumps(obj, option=self._orjson.OPT_INDENT_2)
+        if plain and _suspicious(jsonBytes) and not _reproducible(obj):
+            raise ValueError("orjson cannot reproduce the JSON of the stdlib")
+        if indent == 0:
+            # Every newline is part of the layout (Strings contain them escaped)
+            jsonBytes = _INDENTATION.sub(b"\n", jsonBytes)
+        return jsonBytes
+
+    def loads(self, jsonStr):
+        return self._orjson.loads(jsonStr)
+
+
+class UjsonBackend(JsonBackend):
+    """ Only used for parsing, its JSON differs from the stdlib (separators, floats, escapes) """
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def supportsIndent(self, indent):
+        return False
+
+    def dumps(self, obj, indent=None, default=None, plain=False):
+        if default is None:
+            return self._ujson.dumps(obj, indent=indent or 0, escape_forward_slashes=False)
+        return self._ujson.dumps(obj, indent=indent or 0, escape_forward_slashes=False, default=default)
+
+    def loads(self, jsonStr):
+        return self._ujson.loads(jsonStr)
+
+
+class RapidjsonBackend(JsonBackend):
+    """ Only used for parsing, its JSON differs from the stdlib (separators, floats, escapes) """
+    name = "rapidjson"
+
+    def __init__(self):
+        import rapidjson
+        self._rapidjson = rapidjson
+
+    def supportsIndent(self, indent):
+        return False
+
+    def dumps(self, obj, indent=None, default=None, plain=False):
+        return self._rapidjson.dumps(obj, indent=indent or None, default=default)
+
+    def loads(self, jsonStr):
+        return self._rapidjson.loads(jsonStr)
+
+
+# The types of a plain obj (see dumps)
+PLAIN_TYPES = (dict, list, str, int, float, bool, type(None))
+# The indentation of OPT_INDENT_2
+_INDENTATION = re.compile(b"\n +")
+# Characters, which orjson writes differently: not ASCII or DEL (str.isascii() needs Python 3.7)
+_NOT_REPRODUCIBLE = re.compile(u"[^\x00-\x7e]").search
+# The bytes which orjson writes like the stdlib (ASCII without DEL)
+_ASCII = bytes(bytearray(range(0x7f)))
+# A number with an exponent, which orjson writes differently (e.g. 1e16 instead of 1e+16)
+_EXPONENT = re.compile(b"e[-+]?[0-9]+(?:[,\n]|$)").search
+
+
+def _suspicious(jsonBytes):
+    """ Checks if the JSON of orjson of a plain obj may differ from the stdlib: Not ASCII or DEL,
+        null (also NaN and Infinity), numbers with an exponent and below 1e-4 (orjson writes e.g. 0.00001).
+        Strings can match as well (e.g. 'null' in a text), then _reproducible decides
+    """
+    return (len(jsonBytes.translate(None, _ASCII)) > 0 or b"null" in jsonBytes or b"0.0000" in jsonBytes
+            or _EXPONENT(jsonBytes) is not None)
+
+
+def _reproducible(obj):
+    """ Checks if orjson writes the same JSON as the stdlib: Only dicts with ASCII-keys, lists, ASCII-text
+        (without DEL, which the stdlib escapes), None, bools, ints and floats, which the stdlib writes
+        without exponent (and which are finite)
+    """
+    stack = [obj]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        value = pop()
+        valueType = type(value)
+        if valueType is dict:
+            for key in value:
+                if type(key) is not str or _NOT_REPRODUCIBLE(key):
+                    return False
+            extend(value.values())
+        elif valueType is list:
+            extend(value)
+        elif valueType is str:
+            if _NOT_REPRODUCIBLE(value):
+                return False
+        elif valueType is float:
+            if not (1e-4 <= abs(value) < 1e16 or value == 0.0):
+                return False
+        elif valueType is not int and valueType is not bool and value is not None:
+            return False
+    return True
+
+
+_CLASSES = dict(orjson=OrjsonBackend, ujson=UjsonBackend, rapidjson=RapidjsonBackend, json=JsonBackend)
+STDLIB = JsonBackend()
+_backends = dict(json=STDLIB)
+
+
+def get(name=None):
+    """ Returns the backend with the name (or the one currently used).
+        Raises an ImportError if it is not installed
+    """
+    if name is None:
+        return _current
+    if name not in _CLASSES:
+        raise ValueError("Unknown JSON-backend '{}', expected one of {}".format(name, BACKEND_NAMES))
+    if name not in _backends:
+        _backends[name] = _CLASSES[name]()
+    return _backends[name]
+
+
+def available():
+    """ Returns the names of the installed backends """
+    names = []
+    for name in BACKEND_NAMES:
+        try:
+            get(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+def use(name):
+    """ Sets the backend which is used by default """
+    global _current
+    _current = get(name)
+    return _current
+
+
+def dumps(obj, indent=None, default=None, asBytes=False, backend=None, plain=False):
+    """ Serializes obj with the backend (by default the current one) into a str
+        or with asBytes into UTF-8 encoded bytes. With plain the caller guarantees that obj
+        only contains PLAIN_TYPES (dicts with str-keys), like the Attributes of the converters.
+        The values of a plain obj are then only checked in the JSON of the backend.
+    """
+    if backend is None:
+        backend = _current
+    if backend is not STDLIB and backend.supportsIndent(indent):
+        try:
+            if asBytes:
+                return backend.dumpBytes(obj, indent, default, plain)
+            return backend.dumps(obj, indent, default, plain)
+        except _UNSUPPORTED:
+            # e.g. integers beyond 64 bit, the stdlib decides if it can be serialized
+            pass
+    if asBytes:
+        return STDLIB.dumpBytes(obj, indent, default)
+    return STDLIB.dumps(obj, indent, default)
+
+
+def loads(jsonStr, backend=None):
+    """ Parses a JSON str (or UTF-8 encoded bytes) """
+    if backend is None:
+        backend = _current
+    if backend is not STDLIB:
+        try:
+            return backend.loads(jsonStr)
+        except _UNSUPPORTED:
+            # Let the stdlib parse it (or raise its error)
+            pass
+    return STDLIB.loads(jsonStr)
+
+
+_current = STDLIB
+use(available()[0])
@@ -0,0 +1,245 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import importlib
+import url_encoding
+
+from json_to_object.reverse_entity_attribute import STRING_TYPES, WHOLE_NUMBERS, TYPE_VALUE_METADATA_NOT_DEFINED_MESSAGE
+
+MESSAGE_MISMATCH_MESSAGE = "The Message-Type does not match with the JSON-type ({} != {})"
+
+# Builtin ROS-types, they are never Messages
+PRIMITIVE_TYPES = frozenset(["bool", "byte", "char", "int8", "uint8", "int16", "uint16", "int32", "uint32",
+                             "int64", "uint64", "float32", "float64", "string"])
+
+# Numeric ROS-types -> (conversion, accepted JSON-values)
+NUMBER_TYPES = dict((rosType, (int, tuple(WHOLE_NUMBERS))) for rosType in [
+    "byte", "char", "int8", "uint8", "int16", "uint16", "int32", "uint32", "int64", "uint64"])
+NUMBER_TYPES["float32"] = NUMBER_TYPES["float64"] = (float, tuple(WHOLE_NUMBERS) + (float,))
+
+# Kinds of fields
+FIELD_VALUE = 0         # Decoded by the DecodingContext
+FIELD_MESSAGE = 1       # A nested Message, created directly
+FIELD_MESSAGES = 2      # An Array of nested Messages
+FIELD_NUMBER = 3        # A number, converted into the type of the slot
+FIELD_NUMBERS = 4       # An Array of numbers (not packed), converted into the type of the slot
+MAX_PLANS = 1024
+
+
+class MessagePlan(object):
+    """ A compiled description how Entities (or nested Objects) are decoded into a class with
+        __slots__, e.g. a ROS-Message generated by genpy. Compiling is done once per class with
+        __slots__ and _slot_types and the plan contains for every field a tuple of (key, kind of
+        field, class of the nested Message or entry of NUMBER_TYPES). Numbers are converted into
+        the type of the slot without looking at their metadata. The classes of nested Messages are taken from
+        MessagePlan.classes (see register), the defaults of the class (if it can be created without
+        arguments) or the module '<package>.msg'. Fields of an unknown type are decoded as usual.
+        Nested Messages are created recursively, ROS-Messages cannot contain themselves.
+        The plans are cached in MessagePlan.cache.
+    """
+    cache = dict()
+    # Message-type (e.g. 'std_msgs/Header') -> class
+    classes = dict()
+
+    def __init__(self, messageClass):
+        self.cls = messageClass
+        self.slots = tuple(messageClass.__slots__)
+        self.hasTypeSlot = '_type' in self.slots
+        _type = getattr(messageClass, '_type', None)
+        if isinstance(_type, tuple(STRING_TYPES)):
+            self.typeName = _type
+        elif hasattr(messageClass, '_slot_types'):
+            # '_type' is set per instance, it is not checked
+            self.typeName = None
+        else:
+            # Classes with __slots__ are converted with their name
+            self.typeName = messageClass.__name__
+
+        defaults = self.newInstance(allowEmpty=False)
+        self.fields = []
+        for key, slotType in zip(self.slots, getattr(messageClass, '_slot_types', [None] * len(self.slots))):
+            if key.startswith('_'):
+                continue
+            kind, target = FIELD_VALUE, None
+            if slotType is None:
+                pass
+            elif slotType in NUMBER_TYPES:
+                kind, target = FIELD_NUMBER, NUMBER_TYPES[slotType]
+            elif slotType.endswith(']'):
+                elementType = slotType[:slotType.index('[')]
+                if elementType in NUMBER_TYPES and elementType not in ("uint8", "char"):
+                    # uint8[] and char[] are bytes
+                    kind, target = FIELD_NUMBERS, NUMBER_TYPES[elementType]
+                elif elementType not in PRIMITIVE_TYPES:
+                    kind, target = FIELD_MESSAGES, self.messageClass(elementType)
+            elif slotType not in PRIMITIVE_TYPES:
+                kind, target = FIELD_MESSAGE, self.messageClass(slotType, getattr(defaults, key, None))
+            if target is None:
+                kind = FIELD_VALUE
+            self.fields.append((key, kind, target))
+        self.fields = tuple(self.fields)
+        # The Entity-Attributes 'id' and 'type' are never fields
+        self.attributes = tuple(field for field in self.fields if field[0] != 'id' and field[0] != 'type')
+
+    def newInstance(self, allowEmpty=True):
+        """ Returns an instance with the defaults of the class. If the class needs arguments
+            an empty instance (without any field set) or None (allowEmpty=False)
+        """
+        try:
+            return self.cls()
+        except TypeError:
+            return self.cls.__new__(self.cls) if allowEmpty else None
+
+    def fillEntity(self, obj, payload, ctx, checkTypes=True):
+        """ Sets the fields of obj from the Attributes of the Entity """
+        return self._fill(obj, payload, ctx, checkTypes, self.attributes)
+
+    def create(self, _dict, ctx, checkTypes=True):
+        """ Creates the Message from the JSON-Attribute of a nested Object. Other
+            values (e.g. None) are decoded as usual. Fields missing in the JSON get
+            the defaults of the class
+        """
+        try:
+            type_ = _dict['type']
+            value = _dict['value']
+        except (KeyError, TypeError):
+            raise ValueError(TYPE_VALUE_METADATA_NOT_DEFINED_MESSAGE)
+        if not isinstance(value, dict):
+            return ctx.decode(_dict)
+        if ctx.encoded and '%' in type_:
+            type_ = url_encoding.unquote(type_)
+        if checkTypes and self.typeName is not None and type_ != self.typeName:
+            raise TypeError(MESSAGE_MISMATCH_MESSAGE.format(self.typeName, type_))
+
+        obj = self.cls.__new__(self.cls)
+        if self.hasTypeSlot:
+            obj._type = type_
+        if self._fill(obj, value, ctx, checkTypes, self.fields) < len(self.fields):
+            defaults = self.newInstance(allowEmpty=False)
+            if defaults is not None:
+                for key, _, _ in self.fields:
+                    if key not in value:
+                        setattr(obj, key, getattr(defaults, key))
+        return obj
+
+    def createArray(self, _dict, ctx, checkTypes=True):
+        """ Creates the Messages of a JSON-Array. Other values are decoded as usual """
+        value = _dict.get('value') if isinstance(_dict, dict) else None
+        if not isinstance(value, list):
+            return ctx.decode(_dict)
+        result = [self.create(item, ctx, checkTypes) for item in value]
+        if ctx.pythonType(_dict) == "tuple":
+            return tuple(result)
+        return result
+
+    def _fill(self, obj, values, ctx, checkTypes, fields):
+        # Returns the number of fields which were set
+        count = 0
+        get = MessagePlan.get
+        for key, kind, target in fields:
+            _dict = values.get(key)
+            if _dict is None:
+                continue
+            if kind is FIELD_VALUE:
+                value = ctx.decode(_dict)
+            elif kind is FIELD_NUMBER:
+                value = _number(_dict, target, ctx)
+            elif kind is FIELD_NUMBERS:
+                value = _numbers(_dict, target, ctx)
+            elif kind is FIELD_MESSAGE:
+                value = get(target).create(_dict, ctx, checkTypes)
+            else:
+                value = get(target).createArray(_dict, ctx, checkTypes)
+            setattr(obj, key, value)
+            count += 1
+        return count
+
+    @classmethod
+    def messageClass(cls, typeName, default=None):
+        """ Returns the class of the Message-type or None """
+        messageClass = cls.classes.get(typeName)
+        if messageClass is None and hasattr(default, '__slots__'):
+            messageClass = default.__class__
+        if messageClass is None and '/' in typeName:
+            package, _, name = typeName.partition('/')
+            try:
+                messageClass = getattr(importlib.import_module(package + '.msg'), name)
+            except (ImportError, AttributeError):
+                pass
+        if messageClass is not None and not hasattr(messageClass, '__slots__'):
+            return None
+        return messageClass
+
+    @classmethod
+    def register(cls, messageClass, typeName=None):
+        """ Registers the class of a Message-type (by default its _type), e.g. for Arrays
+            of nested Messages or classes which need arguments
+        """
+        cls.classes[typeName or messageClass._type] = messageClass
+        # Plans compiled before may miss the class
+        cls.cache.clear()
+
+    @classmethod
+    def get(cls, messageClass):
+        """ Returns the cached plan of the class or compiles a new one """
+        plan = cls.cache.get(messageClass)
+        if plan is None:
+            plan = MessagePlan(messageClass)
+            if len(cls.cache) < MAX_PLANS:
+                cls.cache[messageClass] = plan
+        return plan
+
+    @classmethod
+    def clear(cls):
+        cls.cache.clear()
+
+
+def _number(_dict, numberType, ctx):
+    # Numbers of the JSON are converted directly, everything else as usual
+    try:
+        value = _dict['value']
+    except (KeyError, TypeError):
+        return ctx.decode(_dict)
+    if isinstance(value, numberType[1]) and type(value) is not bool:
+        return numberType[0](value)
+    return ctx.decode(_dict)
+
+
+def _numbers(_dict, numberType, ctx):
+    # Arrays of numbers (also compact ones) are converted directly, everything else as usual
+    convert, accepted = numberType
+    try:
+        if _dict['type'] == 'array':
+            value = _dict['value']
+            metadata = _dict.get('metadata')
+            if metadata and 'elementType' in metadata:
+                values = value
+            else:
+                values = [item['value'] for item in value]
+            for item in values:
+                if not isinstance(item, accepted) or type(item) is bool:
+                    break
+            else:
+                result = list(map(convert, values))
+                if ctx.pythonType(_dict) == "tuple":
+                    return tuple(result)
+                return result
+    except (KeyError, TypeError):
+        pass
+    return ctx.decode(_dict)
+
+
+def isMessage(obj):
+    """ Checks if obj is a ROS-Message (or its class), which is decoded with a MessagePlan """
+    return hasattr(obj, '__slots__') and hasattr(obj, '_slot_types')
@@ -12,11 +12,9 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-try: 
-    import urllib.parse as quote
-except ImportError:
-    import urllib as quote
-from json_to_object.reverse_entity_attribute import ReverseEntityAttribute
+import url_encoding
+from json_to_object.reverse_entity_attribute import DecodingContext, restoreKeyValue
+from json_to_object.message_plan import MessagePlan, isMessage
 
 MISMATCH_MESSAGE = "The Class-Type does not match with the JSON-type ({} != {})"
 
@@ -26,6 +24,7 @@ class ReverseEntity(object):
         The Function setObject decides if type check (ignoreWrongDataType)
         is used and adds the (if the key from JSON is also in obj) value to the obj.
         'setAttr' is here explicitly used, if set to true.
+        ROS-Messages (or their classes) are filled with their MessagePlan instead.
     """
 
     def __init__(self, type=None, id=None, *args, **payload):
@@ -33,29 +32,176 @@ class ReverseEntity(object):
         self.id = id
         self.payload = payload
 
-    def setObject(self, obj, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False):
+    @classmethod
+    def fromDict(clsself, entity):
+        """ Creates the ReverseEntity without copying the Entity (as with **entity).
+            The keys "id" and "type" are skipped in setObject.
+        """
+        re = clsself.__new__(clsself)
+        re.type = entity.get('type')
+        re.id = entity.get('id')
+        re.payload = entity
+        return re
+
+    def setObject(self, obj, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False, binaryType=None):
+        ctx = DecodingContext(useMetaData, encoded, binaryType)
+        if isMessage(obj):
+            return self.setMessage(obj, ignoreWrongDataType, ctx, setAttr)
+
         # Explicitly set id and type, always!
-        if encoded:
-            setattr(obj, 'id', str(self.id))
-            setattr(obj, 'type', str(self.type))
-        else:
-            setattr(obj, 'id', quote.unquote(str(self.id)))
-            setattr(obj, 'type', quote.unquote(str(self.type)))
-
-        
-        
+        self.setIdAndType(obj, encoded)
+
         for key, value in self.payload.items():
-            rea = ReverseEntityAttribute(value, useMetaData, encoded=encoded)
+            if key == 'id' or key == 'type':
+                continue
             if (setAttr):
                 # Just use setAttr
-                setattr(obj, key, rea.getValue())
+                setattr(obj, key, ctx.decode(value))
             elif key in obj.__dict__:
                 if (ignoreWrongDataType):
                     # Ignoring expected Data-Type
-                    obj.__dict__[key] = rea.getValue()
+                    obj.__dict__[key] = ctx.decode(value)
                 else:
-                    val = rea.getValue()
+                    val = ctx.decode(value)
                     if type(obj.__dict__[key]) is not type(val):
                         raise TypeError(MISMATCH_MESSAGE.format(type(obj.__dict__[key]), type(val)))
                     else:
                         obj.__dict__[key] = val
+        return obj
+
+    def setMessage(self, msg, ignoreWrongDataType, ctx, setAttr=False):
+        """ Sets the fields of the ROS-Message (with __slots__ and _slot_types) and creates
+            its nested Messages directly. If the class is given, a new Message is created.
+            The id and type of the Entity are set, if the Message has a slot for them. Only
+            the types of nested Messages are checked (not with ignoreWrongDataType or setAttr).
+            With setAttr the Attributes, which are no fields, are set as well if the Message
+            has a __dict__ (e.g. a subclass without __slots__), otherwise they are ignored.
+        """
+        msg, plan = _messageAndPlan(msg)
+        plan.fillEntity(msg, self.payload, ctx, not (ignoreWrongDataType or setAttr))
+
+        hasDict = self._setMessageIdAndType(msg, plan, ctx.encoded)
+        if setAttr and hasDict:
+            fields = set(field[0] for field in plan.fields)
+            for key, value in self.payload.items():
+                if key != 'id' and key != 'type' and key not in fields:
+                    setattr(msg, key, ctx.decode(value))
+        return msg
+
+    def setKeyValues(self, obj, schema=None, ignoreWrongDataType=False, setAttr=False, encoded=False):
+        """ The same as setObject, but for an Entity in the keyValues-Representation (plain
+            JSON-values without type and metadata). The types are restored from the schema
+            (dict: Attribute-name -> type) or else from the current value of the Attribute in obj.
+            Returns obj (a new Message, if the class of a ROS-Message is given).
+        """
+        if isMessage(obj):
+            return self.setMessageKeyValues(obj, schema, ignoreWrongDataType, setAttr, encoded)
+        self.setIdAndType(obj, encoded)
+
+        for key, value in self.payload.items():
+            if key == 'id' or key == 'type':
+                continue
+            inObject = key in obj.__dict__
+            if not setAttr and not inObject:
+                continue
+            if schema is not None and key in schema:
+                template = schema[key]
+            else:
+                template = obj.__dict__.get(key)
+            val = restoreKeyValue(value, template, encoded)
+            if inObject and not setAttr and not ignoreWrongDataType and type(obj.__dict__[key]) is not type(val):
+                raise TypeError(MISMATCH_MESSAGE.format(type(obj.__dict__[key]), type(val)))
+            setattr(obj, key, val)
+        return obj
+
+    def setMessageKeyValues(self, msg, schema=None, ignoreWrongDataType=False, setAttr=False, encoded=False):
+        """ setKeyValues for a ROS-Message (or its class, then a new Message is created). The
+            fields are restored with the schema or their current values (the defaults of the
+            class) as templates. id, type and the other Attributes are set as in setMessage.
+        """
+        msg, plan = _messageAndPlan(msg)
+        hasDict = self._setMessageIdAndType(msg, plan, encoded)
+        fields = set(field[0] for field in plan.attributes)
+        for key, value in self.payload.items():
+            if key == 'id' or key == 'type':
+                continue
+            if key in fields:
+                current = getattr(msg, key, None)
+            elif setAttr and hasDict:
+                current = None
+            else:
+                continue
+            template = schema[key] if schema is not None and key in schema else current
+            val = restoreKeyValue(value, template, encoded)
+            if current is not None and not setAttr and not ignoreWrongDataType and type(current) is not type(val):
+                raise TypeError(MISMATCH_MESSAGE.format(type(current), type(val)))
+            setattr(msg, key, val)
+        return msg
+
+    def _setMessageIdAndType(self, msg, plan, encoded):
+        # Only if the Message has a slot (or a __dict__) for them, returns if it has a __dict__
+        hasDict = hasattr(msg, '__dict__')
+        if hasDict or 'id' in plan.slots:
+            setattr(msg, 'id', _idOrType(self.id, encoded))
+        if hasDict or 'type' in plan.slots:
+            setattr(msg, 'type', _idOrType(self.type, encoded))
+        return hasDict
+
+    def setIdAndType(self, obj, encoded=False):
+        setattr(obj, 'id', _idOrType(self.id, encoded))
+        setattr(obj, 'type', _idOrType(self.type, encoded))
+
+    def lazy(self, obj=None, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False, binaryType=None):
+        """ Returns a LazyEntity, which converts the Attributes not until they are accessed """
+        return LazyEntity(self, obj, useMetaData, ignoreWrongDataType, setAttr, encoded, binaryType)
+
+
+class LazyEntity(object):
+    """ The Attributes of the ReverseEntity are only converted on the first access
+        and then stored in this Object (so they are converted at most once).
+        If a (template) obj is given, the same rules as in ReverseEntity.setObject
+        apply: Without setAttr only Attributes of obj are converted and their
+        type is checked (unless ignoreWrongDataType). Attributes, which are not
+        in the JSON, are taken from obj.
+    """
+
+    def __init__(self, reverseEntity, obj=None, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False, binaryType=None):
+        self._payload = reverseEntity.payload
+        self._ctx = DecodingContext(useMetaData, encoded, binaryType)
+        self._template = obj
+        self._ignoreWrongDataType = ignoreWrongDataType
+        self._setAttr = setAttr or obj is None
+        reverseEntity.setIdAndType(self, encoded)
+
+    def __getattr__(self, key):
+        # Only called if the Attribute is not (yet) set
+        if key.startswith('_'):
+            raise AttributeError(key)
+        template = self.__dict__.get('_template')
+        inTemplate = template is not None and key in template.__dict__
+        if key in self._payload and key != 'id' and key != 'type' and (self._setAttr or inTemplate):
+            value = self._ctx.decode(self._payload[key])
+            if inTemplate and not self._setAttr and not self._ignoreWrongDataType and type(template.__dict__[key]) is not type(value):
+                raise TypeError(MISMATCH_MESSAGE.format(type(template.__dict__[key]), type(value)))
+            self.__dict__[key] = value
+            return value
+        if inTemplate:
+            return template.__dict__[key]
+        raise AttributeError("'{}' has no Attribute '{}'".format(self.type, key))
+
+    def __repr__(self):
+        return "LazyEntity(Id: " + str(self.id) + ", Type: " + str(self.type) + ")"
+
+
+def _messageAndPlan(msg):
+    # A new Message, if the class is given
+    if isinstance(msg, type):
+        plan = MessagePlan.get(msg)
+        return plan.newInstance(), plan
+    return msg, MessagePlan.get(msg.__class__)
+
+
+def _idOrType(value, encoded):
+    if encoded:
+        return str(value)
+    return url_encoding.unquote(str(value))
@@ -14,10 +14,15 @@
 
 import base64
 import array
+import sys
+import url_encoding
+from object_to_json.conversion_plan import ROS_TYPECODES
+
 try:
-    import urllib.parse as quote
+    # NumPy is optional, it is only needed to convert ndarrays back
+    import numpy
 except ImportError:
-    import urllib as quote
+    numpy = None
 
 
 # Error Messages
@@ -30,6 +35,10 @@ TEXT_TYPES = ["string",  "text"]
 BOOLEAN_TYPES = ["bool",  "boolean"]
 ARRAYLIKE_TYPES = ["array", "list", "tuple", "vector"]
 OBJECTLIKE_TYPES = ["object", "obj"]
+# Types in which base64 Attributes can be returned
+BINARY_TYPES = ["list", "bytes", "bytearray", "memoryview", "array"]
+# Strings which are converted into False for boolean types
+FALSE_STRINGS = ["false", "f", "0", ""]
 try:
     # Python 2
     WHOLE_NUMBERS = [int, long]
@@ -40,6 +49,7 @@ except NameError:
     WHOLE_NUMBERS = [int]
     STRING_TYPES = [str]
     COMPLEX_TYPES = [complex, tuple, list]
+_STRINGS = tuple(STRING_TYPES)
 
 
 class ReverseEntityAttribute(object):
@@ -49,136 +59,441 @@ class ReverseEntityAttribute(object):
         It defaults then from:
         Complex, Tuple -> List
         Unicode -> String
+        base64-Attributes are returned as the type given in binaryType (see BINARY_TYPES).
+        If it is not given, the python-metadata decides and defaults to a list.
+        The given _dict is not modified.
     """
+    __slots__ = ['value']
 
-    def __init__(self, _dict, useMetaData=True, encoded=False):
+    def __init__(self, _dict, useMetaData=True, encoded=False, binaryType=None):
         """ By initializing we set the value in self.value
         """
-        self.value = None
+        self.value = DecodingContext(useMetaData, encoded, binaryType).decode(_dict)
+
+    def getValue(self):
+        return self.value
+
 
+class DecodingContext(object):
+    """ The options of one conversion back. 'decode' looks up the decoder
+        of the type in '_DECODERS'. Arrays and Objects are not decoded recursively,
+        their nested values are decoded with an explicit stack (see _decodeNested).
+    """
+    __slots__ = ['useMetaData', 'encoded', 'binaryType']
+
+    def __init__(self, useMetaData=True, encoded=False, binaryType=None):
+        self.useMetaData = useMetaData
+        self.encoded = encoded
+        self.binaryType = binaryType
+
+    def decode(self, _dict):
+        """ Returns the value of the JSON-Attribute """
+        type_, value, decoder = self._lookup(_dict)
+        if decoder in _NESTED:
+            return self._decodeNested(_dict, type_, value, decoder)
+        return decoder(self, _dict, type_, value)
+
+    def _lookup(self, _dict):
+        """ Returns the type, value and decoder of the JSON-Attribute """
         if _dict is None:
             raise ValueError(VALUE_EMPTY_MESSAGE)
-
-        if 'type' not in _dict or 'value' not in _dict:
+        try:
+            type_ = _dict['type']
+            value = _dict['value']
+        except KeyError:
             # Check if a correct struct exists.
             raise ValueError(TYPE_VALUE_METADATA_NOT_DEFINED_MESSAGE)
 
-        if not 'metadata' in _dict:
-            useMetaData = False
-
-        if encoded:
-            _dict['type'] = quote.unquote(_dict['type'])
-
-        # Back Conversion:
-        if _dict['type'] == '':
-            self.value = _dict['value']
-
-        elif _dict['type'].lower() in BOOLEAN_TYPES:
-            self._setValue(bool, _dict['value'])
-
-        elif _dict['type'].lower() in NUMERICAL_TYPES:
-            # Case something numerical
-            self._setValue(float, _dict['value'])
-            if self.value % 1 == 0.0:
-                # Number is Integer Like, convert to int or long
-                self._setValueWithMetadata(
-                    WHOLE_NUMBERS, useMetaData, _dict, self.value)
-
-        elif _dict['type'].lower() in TEXT_TYPES:
-            # Case String or Unicode
-            self._setValueWithMetadata(
-                STRING_TYPES, useMetaData, _dict, _dict['value'])
-            if encoded:
-                self.value = quote.unquote(self.value)
-
-        elif _dict['type'].lower() in ARRAYLIKE_TYPES:
-            # Case Complex, Tuple or List
-            # First: reverse every element to Obj
-            tempList = _dict['value']
-            tempValue = list()
-            for value in tempList:
-                re = ReverseEntityAttribute(value, useMetaData)
-                tempValue.append(re.getValue())
-
-            # Second: decide if Complex, Tuple or List
-            self._setValueWithMetadata(
-                COMPLEX_TYPES, useMetaData, _dict, tempValue)
-
-        elif _dict['type'].lower() in OBJECTLIKE_TYPES:
-            # arbitary JSON object with key, value
-            tempDict = _dict['value']
-            self.value = {}
-            for key, value in tempDict.items():
-                rea = ReverseEntityAttribute(value, useMetaData)
-                self.value[key] = rea.getValue()
-
-        elif _dict['type'].lower() == "base64":
-            # Case we have a base64 String:
-            # First Unquote Special Characters
-            tempValue = quote.unquote(_dict['value'])
-
-            # Decode Base64 String into Bytes
-            tempValue = base64.b64decode(tempValue)
-
-            # Retrieve Information about int8 or uint8
-            if "metadata" in _dict and "dataType" in _dict["metadata"]:
-                datatype = _dict['metadata']['dataType']['value']
+        if self.encoded and '%' in type_:
+            type_ = url_encoding.unquote(type_)
+
+        # Exact types are found directly, otherwise the lower case type or a class
+        decoder = _DECODERS.get(type_)
+        if decoder is None:
+            decoder = _DECODERS.get(type_.lower(), _decodeClass)
+        return type_, value, decoder
+
+    def _decodeNested(self, _dict, type_, value, decoder):
+        """ Decodes an Array or Object. Every nested Array or Object gets a frame on the
+            stack, its result is added to the parent frame when all its values are decoded
+        """
+        lookup = self._lookup
+        stack = [_Frame(self, _dict, type_, value, decoder, None)]
+        while True:
+            frame = stack[-1]
+            nested = None
+            if frame.isArray:
+                append = frame.result.append
+                for item in frame.items:
+                    itemType, itemValue, itemDecoder = lookup(item)
+                    if itemDecoder in _NESTED:
+                        nested = _Frame(self, item, itemType, itemValue, itemDecoder, None)
+                        break
+                    append(itemDecoder(self, item, itemType, itemValue))
             else:
-                raise ValueError(
-                    "Unknown Object-Type: " + _dict['type'] + ". The MetaData does not specify what the actual DataType is.")
+                result = frame.result
+                for key, item in frame.items:
+                    itemType, itemValue, itemDecoder = lookup(item)
+                    if itemDecoder in _NESTED:
+                        nested = _Frame(self, item, itemType, itemValue, itemDecoder, key)
+                        break
+                    result[key] = itemDecoder(self, item, itemType, itemValue)
+            if nested is not None:
+                # Continue with this frame, after the nested one is done
+                stack.append(nested)
+                continue
 
-            # convert back to integers
-            if datatype == "int8[]":
-                tempValue = array.array("b", tempValue)
+            stack.pop()
+            result = frame.finish(self)
+            if not stack:
+                return result
+            parent = stack[-1]
+            if parent.isArray:
+                parent.result.append(result)
             else:
-                tempValue = array.array("B", tempValue)
+                parent.result[frame.key] = result
+
+    def pythonType(self, _dict):
+        """ Returns the type given in the python-metadata (or None) """
+        if self.useMetaData:
+            metadata = _dict.get('metadata')
+            if metadata:
+                python = metadata.get('python')
+                if isinstance(python, dict):
+                    return python.get('value')
+        return None
+
 
-            # Change DataType to primitive python list
-            self.value = tempValue.tolist()
+class _Frame(object):
+    """ An Array or Object which is decoded by DecodingContext._decodeNested.
+        'items' iterates over the values (or pairs of key and value) not yet decoded,
+        'key' is the key of the Object in its parent Object
+    """
+    __slots__ = ['_dict', 'items', 'result', 'key', 'isArray']
 
+    def __init__(self, ctx, _dict, type_, value, decoder, key):
+        self._dict = _dict
+        self.key = key
+        self.isArray = decoder is _decodeArray
+        if self.isArray:
+            metadata = _dict.get('metadata')
+            if metadata and 'elementType' in metadata:
+                # A compact Array, its elements are plain values
+                self.items = iter(())
+                self.result = _decodeElements(ctx, metadata['elementType'].get('value'), value)
+            else:
+                self.items = iter(value)
+                self.result = []
         else:
-            # Maybe a class with key, value or another JSON object, check if you can iterate!
-            if (not hasattr(_dict['value'], 'items')):
+            if decoder is _decodeClass and not hasattr(value, 'items'):
                 raise ValueError(
-                    "Unknown Object-Type: " + _dict['type'] + ". And it is not possible to iterate over this Object-Type!")
+                    "Unknown Object-Type: " + type_ + ". And it is not possible to iterate over this Object-Type!")
+            self.items = iter(value.items())
+            self.result = {}
 
-            tempDict = {}
-            for key, value in _dict['value'].items():
-                rea = ReverseEntityAttribute(value, useMetaData)
-                tempDict[key] = rea.getValue()
-            self.value = tempDict
+    def finish(self, ctx):
+        if not self.isArray:
+            return self.result
+        # Decide if Complex, Tuple or List
+        pythonType = ctx.pythonType(self._dict)
+        if pythonType == "complex":
+            return complex(*self.result)
+        if pythonType == "tuple":
+            return tuple(self.result)
+        return self.result
 
-    def getValue(self):
-        return self.value
 
-    def _setValue(self, targetType, value):
-        """ This function sets self.value  . 
-            Complex needs to be called differently
-            and we need to check if the input of bool is a string
-        """
-        if targetType == bool and type(value) == str:
-            self.value = value.lower in ["false", "f", "0"]
-        elif targetType != complex:
-            self.value = targetType(value)
-        else:
-            self.value = targetType(*value)
+def _decodeRaw(ctx, _dict, type_, value):
+    return value
 
-    def _setValueWithMetadata(self, targetTypes, useMetaData, readict, value):
-        """ This function sets the Value, dependent on the given metadata.
-            If no metadata is given or it does not contain the correct format,
-            we default to the last element of targetTypes
-        """
-        if useMetaData and 'python' in readict['metadata']:
-            metadata = readict['metadata']
 
-            # we try to find a valid dataType
-            for tt in targetTypes:
-                if metadata['python'] == dict(type="dataType", value=tt.__name__):
-                    self._setValue(tt, value)
-                    return
+def _decodeBool(ctx, _dict, type_, value):
+    if isinstance(value, _STRINGS):
+        return value.lower() not in FALSE_STRINGS
+    return bool(value)
 
-            # Case: we did not set self.value, we default to the last element
-            self._setValue(targetTypes[-1], value)
-        else:
-            # Case: no metadata, we also default to the last element
-            self._setValue(targetTypes[-1], value)
+
+def _decodeNumber(ctx, _dict, type_, value):
+    # Case something numerical. Integers are kept exactly (no conversion into float)
+    if isinstance(value, _STRINGS):
+        try:
+            value = int(value)
+        except ValueError:
+            value = float(value)
+    elif type(value) is bool:
+        value = int(value)
+
+    pythonType = ctx.pythonType(_dict)
+    if type(value) is float:
+        if pythonType == "float" or value % 1 != 0.0:
+            return value
+        # Number is Integer Like, convert to int or long
+        value = int(value)
+
+    if pythonType == "float":
+        return float(value)
+    if pythonType != "int" and len(WHOLE_NUMBERS) > 1:
+        # Python 2: Without the python-type int the number is a long (as before)
+        return WHOLE_NUMBERS[1](value)
+    return value
+
+
+def _decodeText(ctx, _dict, type_, value):
+    # Case String or Unicode
+    if ctx.encoded and isinstance(value, _STRINGS) and '%' in value:
+        value = url_encoding.unquote(value)
+    if len(STRING_TYPES) > 1 and ctx.pythonType(_dict) == "unicode":
+        # Python 2
+        return STRING_TYPES[0](value)
+    return STRING_TYPES[-1](value)
+
+
+def _decodeArray(ctx, _dict, type_, value):
+    # Case Complex, Tuple or List
+    return ctx._decodeNested(_dict, type_, value, _decodeArray)
+
+
+def _decodeElements(ctx, elementType, value):
+    """ Decodes the plain elements of a compact Array (see metadata 'elementType') """
+    if elementType in ("str", "unicode"):
+        if ctx.encoded:
+            value = [url_encoding.unquote(item) if '%' in item else item for item in value]
+        if elementType == "unicode" and len(STRING_TYPES) > 1 and ctx.useMetaData:
+            # Python 2
+            return [STRING_TYPES[0](item) for item in value]
+        return [STRING_TYPES[-1](item) for item in value]
+    if elementType == "long" and not ctx.useMetaData:
+        elementType = "int"
+    pythonType = _ELEMENT_TYPES.get(elementType)
+    if pythonType is None:
+        raise ValueError("Unknown elementType '{}', expected one of {}".format(elementType, sorted(_ELEMENT_TYPES)))
+    return list(map(pythonType, value))
+
+
+def _decodeObject(ctx, _dict, type_, value):
+    # arbitary JSON object with key, value
+    return ctx._decodeNested(_dict, type_, value, _decodeObject)
+
+
+def _decodeBase64(ctx, _dict, type_, value):
+    # Case we have a base64 String:
+    # First Unquote Special Characters (if there are any)
+    if '%' in value:
+        value = url_encoding.unquote(value)
+
+    # Decode Base64 String into Bytes
+    value = base64.b64decode(value)
+
+    if "metadata" in _dict and "dtype" in _dict["metadata"]:
+        # A packed NumPy-Array
+        return _toNdarray(value, _dict["metadata"])
+    return _toBinary(value, _dict, ctx)
+
+
+def _decodeClass(ctx, _dict, type_, value):
+    # Maybe a class with key, value or another JSON object, check if you can iterate!
+    return ctx._decodeNested(_dict, type_, value, _decodeClass)
+
+
+def _toNdarray(data, metadata):
+    """ Creates the ndarray directly over the decoded bytes (without copying it).
+        Therefore the returned Array is read-only.
+    """
+    if numpy is None:
+        raise ValueError("NumPy needs to be installed to convert the ndarray of dtype " + metadata['dtype']['value'])
+    value = numpy.frombuffer(data, dtype=numpy.dtype(metadata['dtype']['value']))
+    if 'shape' in metadata:
+        value = value.reshape(metadata['shape']['value'])
+    return value
+
+
+def _toBinary(data, _dict, ctx):
+    """ Converts the decoded bytes into the requested binaryType """
+    # Retrieve Information about the type of the elements, e.g. 'int8[]' or 'float32[36]'
+    if "metadata" in _dict and "dataType" in _dict["metadata"]:
+        dataType = _dict['metadata']['dataType']['value']
+        typecode = ROS_TYPECODES.get(dataType.split('[')[0], 'B')
+    else:
+        raise ValueError(
+            "Unknown Object-Type: " + _dict['type'] + ". The MetaData does not specify what the actual DataType is.")
+
+    byteOrder = _dict['metadata'].get('byteOrder')
+    if isinstance(byteOrder, dict) and byteOrder.get('value') not in (None, sys.byteorder):
+        # Packed in the other byte order
+        swapped = array.array(typecode, data)
+        swapped.byteswap()
+        data = swapped.tobytes() if hasattr(swapped, 'tobytes') else swapped.tostring()
+
+    binaryType = ctx.binaryType
+    if binaryType is None:
+        # The python-metadata may contain the type, e.g. bytes
+        binaryType = ctx.pythonType(_dict)
+        if binaryType not in BINARY_TYPES:
+            binaryType = "list"
+
+    if binaryType == "bytes":
+        return data
+    elif binaryType == "bytearray":
+        return bytearray(data)
+    elif binaryType == "memoryview":
+        return memoryview(data)
+    elif binaryType == "array":
+        return array.array(typecode, data)
+    elif binaryType == "list":
+        # convert back to a primitive python list of integers
+        return array.array(typecode, data).tolist()
+    raise ValueError("Unknown binaryType '{}', expected one of {}".format(binaryType, BINARY_TYPES))
+
+
+def restoreKeyValue(value, template, encoded=False):
+    """ Converts the value of a keyValues-Attribute (a plain JSON-value without type
+        and metadata) back into the type of the template. The template is either a type
+        or an example value (e.g. the current value of the Attribute), whose items are
+        then the templates of the nested values. Without a template (None) the JSON-value
+        is returned (also if it cannot be converted), only the strings are unquoted if encoded.
+    """
+    pythonType = template if isinstance(template, type) else type(template)
+    restore = _RESTORERS.get(pythonType)
+    if restore is not None:
+        try:
+            return restore(value, template, encoded)
+        except (TypeError, ValueError):
+            # Not convertible into the type, the type check decides
+            return _restoreJson(value, encoded)
+    if isinstance(value, dict) and pythonType.__module__ not in ("builtins", "__builtin__"):
+        # An Object of a (not built-in) class
+        return _restoreClass(value, template, pythonType, encoded)
+    return _restoreJson(value, encoded)
+
+
+def _restoreJson(value, encoded):
+    # Unquotes the strings in the JSON-value
+    if not encoded:
+        return value
+    if isinstance(value, _STRINGS):
+        return url_encoding.unquote(value) if '%' in value else value
+    if not isinstance(value, (list, dict)):
+        return value
+    root = [value]
+    stack = [root]
+    while stack:
+        container = stack.pop()
+        keys = range(len(container)) if isinstance(container, list) else list(container)
+        for key in keys:
+            item = container[key]
+            if isinstance(item, _STRINGS) and '%' in item:
+                container[key] = url_encoding.unquote(item)
+            elif isinstance(item, (list, dict)):
+                # Copy it, the given value is not modified
+                container[key] = item = list(item) if isinstance(item, list) else dict(item)
+                stack.append(item)
+    return root[0]
+
+
+def _restoreBool(value, template, encoded):
+    if isinstance(value, _STRINGS):
+        return value.lower() not in FALSE_STRINGS
+    return bool(value)
+
+
+def _restoreNumber(value, template, encoded):
+    pythonType = template if isinstance(template, type) else type(template)
+    if isinstance(value, _STRINGS) and pythonType is not float:
+        try:
+            return pythonType(value)
+        except ValueError:
+            value = float(value)
+    return pythonType(value)
+
+
+def _restoreText(value, template, encoded):
+    pythonType = template if isinstance(template, type) else type(template)
+    if encoded and isinstance(value, _STRINGS) and '%' in value:
+        value = url_encoding.unquote(value)
+    return pythonType(value)
+
+
+def _restoreComplex(value, template, encoded):
+    if isinstance(value, list):
+        return complex(*value)
+    return complex(value)
+
+
+def _restoreTuple(value, template, encoded):
+    if isinstance(template, type) or len(template) != len(value):
+        return tuple(_restoreJson(list(value), encoded))
+    return tuple(restoreKeyValue(item, itemTemplate, encoded) for item, itemTemplate in zip(value, template))
+
+
+def _restoreList(value, template, encoded):
+    if isinstance(value, _STRINGS):
+        # A packed Array (uint8)
+        return array.array('B', _fromBase64(value)).tolist()
+    if isinstance(template, type) or not template:
+        return _restoreJson(list(value), encoded)
+    if len(template) == len(value):
+        # Every item has its own template
+        return [restoreKeyValue(item, itemTemplate, encoded) for item, itemTemplate in zip(value, template)]
+    # Otherwise the first item is the template of all items
+    itemTemplate = template[0]
+    return [restoreKeyValue(item, itemTemplate, encoded) for item in value]
+
+
+def _restoreDict(value, template, encoded):
+    if isinstance(template, type) or not template:
+        return _restoreJson(dict(value), encoded)
+    return dict((key, restoreKeyValue(item, template.get(key), encoded)) for key, item in value.items())
+
+
+def _restoreBinary(value, template, encoded):
+    pythonType = template if isinstance(template, type) else type(template)
+    if isinstance(value, _STRINGS):
+        return pythonType(_fromBase64(value))
+    return pythonType(bytearray(value))
+
+
+def _restoreNdarray(value, template, encoded):
+    dtype = None if isinstance(template, type) else template.dtype
+    if isinstance(value, _STRINGS):
+        value = numpy.frombuffer(_fromBase64(value), dtype=dtype if dtype is not None else numpy.uint8)
+        return value if isinstance(template, type) else value.reshape(template.shape)
+    return numpy.array(value, dtype=dtype)
+
+
+def _restoreClass(value, template, pythonType, encoded):
+    # A new Object of the class, the Attributes of the template are the templates of its Attributes
+    obj = pythonType.__new__(pythonType)
+    isType = isinstance(template, type)
+    for key, item in value.items():
+        setattr(obj, key, restoreKeyValue(item, None if isType else getattr(template, key, None), encoded))
+    return obj
+
+
+def _fromBase64(value):
+    # Special characters of Base64 may be quoted
+    if '%' in value:
+        value = url_encoding.unquote(value)
+    return base64.b64decode(value)
+
+
+# Python-types of the elements of compact Arrays (the strings are handled in _decodeElements)
+_ELEMENT_TYPES = {"bool": bool, "int": int, "float": float, "long": WHOLE_NUMBERS[-1]}
+
+# Restorers of keyValues for each python-type of the template (see restoreKeyValue)
+_RESTORERS = {bool: _restoreBool, complex: _restoreComplex, tuple: _restoreTuple, list: _restoreList,
+              dict: _restoreDict, bytes: _restoreBinary, bytearray: _restoreBinary, float: _restoreNumber}
+_RESTORERS.update((_type, _restoreNumber) for _type in WHOLE_NUMBERS)
+_RESTORERS.update((_type, _restoreText) for _type in STRING_TYPES)
+if numpy is not None:
+    _RESTORERS[numpy.ndarray] = _restoreNdarray
+
+
+# Decoders for each (lower case) type. Every other type is handled as a class
+_DECODERS = {'': _decodeRaw, "base64": _decodeBase64}
+_DECODERS.update((type_, _decodeBool) for type_ in BOOLEAN_TYPES)
+_DECODERS.update((type_, _decodeNumber) for type_ in NUMERICAL_TYPES)
+_DECODERS.update((type_, _decodeText) for type_ in TEXT_TYPES)
+_DECODERS.update((type_, _decodeArray) for type_ in ARRAYLIKE_TYPES)
+_DECODERS.update((type_, _decodeObject) for type_ in OBJECTLIKE_TYPES)
+# Decoders of values which contain further JSON-Attributes
+_NESTED = set([_decodeArray, _decodeObject, _decodeClass])
@@ -0,0 +1,219 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import json
+import unittest
+
+from object_fiware_converter import ObjectFiwareConverter
+from json_to_object.message_plan import MessagePlan, isMessage, FIELD_VALUE, FIELD_MESSAGE, FIELD_MESSAGES
+
+
+class TestMessagePlan(unittest.TestCase):
+
+    def setUp(self):
+        MessagePlan.clear()
+
+    def tearDown(self):
+        MessagePlan.classes.pop("test_msgs/Field", None)
+        MessagePlan.clear()
+
+    def test_Plan(self):
+        plan = MessagePlan.get(Cloud)
+        self.assertTrue(MessagePlan.get(Cloud) is plan)
+        self.assertEqual(plan.typeName, "test_msgs/Cloud")
+        # The class of the Array is unknown, not registered and not importable
+        self.assertEqual(plan.fields, (("header", FIELD_MESSAGE, Header), ("fields", FIELD_VALUE, None),
+                                       ("data", FIELD_VALUE, None)))
+        # 'type' is a field of nested Messages, but not an Attribute of the Entity
+        self.assertEqual([field[0] for field in MessagePlan.get(Field).fields], ["name", "offset", "type"])
+        self.assertEqual([field[0] for field in MessagePlan.get(Field).attributes], ["name", "offset"])
+        self.assertEqual(MessagePlan.get(Time).typeName, "Time")
+
+        MessagePlan.register(Field)
+        self.assertEqual(MessagePlan.get(Cloud).fields[1], ("fields", FIELD_MESSAGES, Field))
+
+    def test_IsMessage(self):
+        self.assertTrue(isMessage(Cloud()))
+        self.assertTrue(isMessage(Cloud))
+        self.assertFalse(isMessage(Time()))
+        self.assertFalse(isMessage(Plain()))
+
+    def test_Fiware2Message(self):
+        MessagePlan.register(Field)
+        cloud = Cloud()
+        cloud.header.seq = 7
+        cloud.header.stamp.secs = 1500000000
+        cloud.fields = [Field("x", 0), Field("y/z", 4)]
+        cloud.data = bytes(bytearray(range(10)))
+        body = ObjectFiwareConverter.obj2Fiware(cloud, encode=True)
+
+        result = ObjectFiwareConverter.fiware2Obj(body, Cloud, encoded=True)
+        self.assertEqual(type(result), Cloud)
+        self.assertEqual(type(result.header), Header)
+        self.assertEqual(type(result.header.stamp), Time)
+        self.assertEqual((result.header.seq, result.header.stamp.secs, result.header.frame_id), (7, 1500000000, "base_link"))
+        self.assertEqual([(type(field), field.name, field.offset, field.type) for field in result.fields],
+                         [(Field, "x", 0, 7), (Field, "y/z", 4, 7)])
+        self.assertEqual(result.data, cloud.data)
+
+        # An existing Message is filled
+        target = Cloud()
+        self.assertTrue(ObjectFiwareConverter.fiware2Obj(body, target, encoded=True) is target)
+        self.assertEqual(target.fields[1].name, "y/z")
+
+    def test_Fiware2Message_WrongType(self):
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(Cloud()))
+        entity["header"]["type"] = "std_msgs/Other"
+        self.assertRaises(TypeError, ObjectFiwareConverter.fiware2Obj, entity, Cloud())
+        self.assertEqual(ObjectFiwareConverter.fiware2Obj(entity, Cloud(), ignoreWrongDataType=True).header.seq, 0)
+
+    def test_Fiware2Message_MissingFields(self):
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(Cloud()))
+        del entity["header"]["value"]["frame_id"]
+        del entity["data"]
+        target = Cloud()
+        target.data = b"old"
+        ObjectFiwareConverter.fiware2Obj(entity, target)
+        # Defaults of the nested Message, the Entity keeps the value
+        self.assertEqual(target.header.frame_id, "base_link")
+        self.assertEqual(target.data, b"old")
+
+        # Classes, which need arguments, are created empty
+        MessagePlan.register(Field)
+        entity = dict(id="Field1", type="Field", name=dict(type="string", value="x"))
+        field = ObjectFiwareConverter.fiware2Obj(entity, Field)
+        self.assertEqual(field.name, "x")
+        self.assertFalse(hasattr(field, "offset"))
+
+    def test_Fiware2Message_Numbers(self):
+        entity = dict(id="Scan1", type="Scan", x=dict(type="number", value=2), count=dict(type="number", value=1.5),
+                      ranges=dict(type="array", value=[dict(type="number", value=1), dict(type="number", value=0.5)],
+                                  metadata=dict(python=dict(type="dataType", value="tuple"))),
+                      counts=dict(type="array", value=[1, 2], metadata=dict(elementType=dict(type="dataType", value="int"))),
+                      flags=dict(type="array", value=[dict(type="boolean", value=True)]))
+        scan = ObjectFiwareConverter.fiware2Obj(entity, Scan)
+        self.assertEqual((scan.x, type(scan.x)), (2.0, float))
+        self.assertEqual(scan.ranges, (1.0, 0.5))
+        self.assertEqual(type(scan.ranges[0]), float)
+        self.assertEqual(scan.counts, [1, 2])
+        # Not an integer (or not a number) is decoded as usual
+        self.assertEqual(scan.count, 1.5)
+        self.assertEqual(scan.flags, [True])
+
+    def test_Fiware2Message_IdAndSetAttr(self):
+        MessagePlan.register(Field)
+        entity = dict(id="Field1", type="Field", name=dict(type="string", value="x"), offset=dict(type="string", value="4"),
+                      extra=dict(type="number", value=1))
+        # The Entity-type is the 'type' of the Object (see obj2Fiware)
+        field = ObjectFiwareConverter.fiware2Obj(entity, Field)
+        self.assertEqual((field.name, field.offset, field.type), ("x", "4", "Field"))
+        self.assertFalse(hasattr(field, "id"))
+
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(Cloud()))
+        entity["header"]["type"] = "std_msgs/Other"
+        entity["extra"] = dict(type="number", value=1)
+        self.assertRaises(TypeError, ObjectFiwareConverter.fiware2Obj, entity, TaggedCloud)
+        cloud = ObjectFiwareConverter.fiware2Obj(entity, TaggedCloud, setAttr=True)
+        self.assertEqual((cloud.id, cloud.type, cloud.extra), (entity["id"], "Cloud", 1))
+        # Without setAttr only the fields, id and type are set
+        cloud = ObjectFiwareConverter.fiware2Obj(entity, TaggedCloud, ignoreWrongDataType=True)
+        self.assertEqual(cloud.type, "Cloud")
+        self.assertFalse(hasattr(cloud, "extra"))
+
+    def test_Fiware2Message_KeyValues(self):
+        cloud = Cloud()
+        cloud.header.seq = 7
+        cloud.header.stamp.secs = 15
+        cloud.data = bytes(bytearray(range(10)))
+        body = ObjectFiwareConverter.obj2Fiware(cloud, keyValues=True)
+
+        target = Cloud()
+        self.assertTrue(ObjectFiwareConverter.fiware2Obj(body, target, keyValues=True) is target)
+        result = ObjectFiwareConverter.fiware2Obj(body, Cloud, keyValues=True)
+        for message in (target, result):
+            self.assertEqual(type(message.header), Header)
+            self.assertEqual((message.header.seq, message.header.stamp.secs, message.header.frame_id), (7, 15, "base_link"))
+            self.assertEqual(message.data, cloud.data)
+        stream = list(ObjectFiwareConverter.fiware2ObjStream("[" + body + "," + body + "]", Cloud, keyValues=True))
+        self.assertEqual([message.header.seq for message in stream], [7, 7])
+
+        entity = json.loads(body)
+        entity["header"] = "base_link"
+        self.assertRaises(TypeError, ObjectFiwareConverter.fiware2Obj, entity, Cloud, keyValues=True)
+        entity["extra"] = 2
+        tagged = ObjectFiwareConverter.fiware2Obj(entity, TaggedCloud, keyValues=True, setAttr=True)
+        self.assertEqual((tagged.header, tagged.extra, tagged.type), ("base_link", 2, "Cloud"))
+
+    def test_Fiware2Message_Unresolved(self):
+        cloud = Cloud()
+        cloud.fields = (Field("x", 0),)
+        result = ObjectFiwareConverter.fiware2Obj(ObjectFiwareConverter.obj2Fiware(cloud), Cloud)
+        # Decoded as usual
+        self.assertEqual(result.fields, (dict(name="x", offset=0, type=7),))
+
+
+class Time(object):
+    __slots__ = ['secs', 'nsecs']
+
+    def __init__(self):
+        self.secs = 0
+        self.nsecs = 0
+
+
+class Header(object):
+    __slots__ = ['seq', 'stamp', 'frame_id']
+    _slot_types = ['uint32', 'time', 'string']
+    _type = 'std_msgs/Header'
+
+    def __init__(self):
+        self.seq = 0
+        self.stamp = Time()
+        self.frame_id = "base_link"
+
+
+class Field(object):
+    __slots__ = ['name', 'offset', 'type']
+    _slot_types = ['string', 'uint32', 'uint8']
+    _type = 'test_msgs/Field'
+
+    def __init__(self, name, offset):
+        self.name = name
+        self.offset = offset
+        self.type = 7
+
+
+class Cloud(object):
+    __slots__ = ['header', 'fields', 'data']
+    _slot_types = ['std_msgs/Header', 'test_msgs/Field[]', 'uint8[]']
+    _type = 'test_msgs/Cloud'
+
+    def __init__(self):
+        self.header = Header()
+        self.fields = []
+        self.data = b""
+
+
+class TaggedCloud(Cloud):
+    """ A subclass without __slots__ has a __dict__ """
+
+
+class Scan(object):
+    __slots__ = ['x', 'count', 'ranges', 'counts', 'flags']
+    _slot_types = ['float64', 'int32', 'float32[]', 'uint16[]', 'int8[]']
+    _type = 'test_msgs/Scan'
+
+
+class Plain(object):
+    def __init__(self):
+        self.value = 1
@@ -102,6 +102,56 @@ class TestReverseEntity(unittest.TestCase):
             pass
             # Success!!
 
+    def test_ReverseEntityFromDict(self):
+        d = dict(type="MyJSONType", id="MyJSONTypeID", variableName=dict(
+            type="number", value=1, metadata=dict(python=dict(type="dataType", value="int"))))
+        en = ReverseEntity.fromDict(d)
+        self.assertEqual(getattr(en, "type"), "MyJSONType")
+        self.assertEqual(getattr(en, "id"), "MyJSONTypeID")
+        self.assertTrue(en.payload is d)
+
+        tj = TestJson()
+        en.setObject(tj)
+        self.assertEqual(tj.variableName, 1)
+        self.assertEqual(tj.id, "MyJSONTypeID")
+        self.assertEqual(tj.type, "MyJSONType")
+
+    def test_ReverseEntityLazy(self):
+        d = dict(type="MyJSONType", id="MyJSONTypeID", variableName=dict(
+            type="number", value=1, metadata=dict(python=dict(type="dataType", value="int"))))
+        lazy = ReverseEntity.fromDict(d).lazy()
+        self.assertEqual(lazy.id, "MyJSONTypeID")
+        self.assertEqual(lazy.type, "MyJSONType")
+        self.assertFalse("variableName" in lazy.__dict__)
+
+        self.assertEqual(lazy.variableName, 1)
+        self.assertEqual(lazy.__dict__["variableName"], 1)
+        self.assertFalse(hasattr(lazy, "notInJSON"))
+
+    def test_ReverseEntityLazyDecodesOnce(self):
+        d = dict(type="MyJSONType", id="MyJSONTypeID", variableName=dict(
+            type="array", value=[dict(type="number", value=1)]))
+        lazy = ReverseEntity.fromDict(d).lazy()
+        self.assertTrue(lazy.variableName is lazy.variableName)
+
+    def test_ReverseEntityLazyWithTemplate(self):
+        d = dict(type="MyJSONType", id="MyJSONTypeID", variableName=dict(
+            type="number", value=1.5, metadata=dict(python=dict(type="dataType", value="float"))), other=dict(
+            type="number", value=2))
+        tj = TestJson()
+        lazy = ReverseEntity.fromDict(d).lazy(tj)
+        self.assertEqual(lazy.notDefinedVarByJSON, 42)
+        self.assertFalse(hasattr(lazy, "other"))
+        # Type is checked on access
+        self.assertRaises(TypeError, getattr, lazy, "variableName")
+
+        lazy = ReverseEntity.fromDict(d).lazy(tj, ignoreWrongDataType=True)
+        self.assertEqual(lazy.variableName, 1.5)
+        lazy = ReverseEntity.fromDict(d).lazy(tj, setAttr=True)
+        self.assertEqual(lazy.other, 2)
+        # The template is not modified
+        self.assertEqual(tj.variableName, 0)
+
 
 class TestJson(object):
     def __init__(self):
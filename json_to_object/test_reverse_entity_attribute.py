@@ -12,10 +12,17 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import array
+import base64
 import sys
 import unittest
 
-from json_to_object.reverse_entity_attribute import ReverseEntityAttribute
+from json_to_object.reverse_entity_attribute import ReverseEntityAttribute, restoreKeyValue, WHOLE_NUMBERS
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestEntityAttribute(unittest.TestCase):
@@ -130,3 +137,164 @@ class TestEntityAttribute(unittest.TestCase):
         rea = ReverseEntityAttribute(d)
         self.assertEqual(False, rea.getValue())
         self.assertEqual(type(rea.getValue()), bool)
+
+    def test_ReverseEntityAttributeBase64(self):
+        d = dict(type="base64", value="%2F%2F8B", metadata=dict(dataType=dict(type="dataType", value="int8[]")))
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), [-1, -1, 1])
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="bytes").getValue(), b"\xff\xff\x01")
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="bytearray").getValue(), bytearray(b"\xff\xff\x01"))
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="memoryview").getValue().tobytes(), b"\xff\xff\x01")
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="array").getValue(), array.array('b', [-1, -1, 1]))
+        self.assertEqual(d["value"], "%2F%2F8B")
+        self.assertRaises(ValueError, ReverseEntityAttribute, d, binaryType="str")
+
+    def test_ReverseEntityAttributeBase64_Unsigned(self):
+        d = dict(type="base64", value="AQL/", metadata=dict(dataType=dict(type="dataType", value="uint8[]")))
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), [1, 2, 255])
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="array").getValue(), array.array('B', [1, 2, 255]))
+
+    def test_ReverseEntityAttributeBase64_Numeric(self):
+        d = dict(type="base64", value="AAAAAf%2F%2F", metadata=dict(
+            dataType=dict(type="dataType", value="int16[]"), byteOrder=dict(type="dataType", value="big")))
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), [0, 1, -1])
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="array").getValue().typecode, array.array('h').typecode)
+        # The bytes are returned in the native byte order
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="bytes").getValue(), _toBytes(array.array('h', [0, 1, -1])))
+        d["metadata"]["byteOrder"]["value"] = "little"
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), [0, 256, -1])
+
+    def test_ReverseEntityAttributeBase64_Float(self):
+        for dataType, typecode in (("float32[]", 'f'), ("float64[36]", 'd')):
+            packed = array.array(typecode, [0.5, -1.25, 3.0])
+            d = dict(type="base64", value=base64.b64encode(_toBytes(packed)).decode('ascii'), metadata=dict(
+                dataType=dict(type="dataType", value=dataType), byteOrder=dict(type="dataType", value=sys.byteorder)))
+            self.assertEqual(ReverseEntityAttribute(d).getValue(), [0.5, -1.25, 3.0])
+        # Fixed-size signed Arrays
+        d = dict(type="base64", value="%2F%2F8B", metadata=dict(dataType=dict(type="dataType", value="int8[3]")))
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), [-1, -1, 1])
+
+    def test_ReverseEntityAttributeBase64_PythonMetaData(self):
+        d = dict(type="base64", value="AQL%2F", metadata=dict(
+            python=dict(type="dataType", value="bytes"), dataType=dict(type="dataType", value="uint8[]")))
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), b"\x01\x02\xff")
+        self.assertEqual(ReverseEntityAttribute(d, useMetaData=False).getValue(), [1, 2, 255])
+        self.assertEqual(ReverseEntityAttribute(d, binaryType="bytearray").getValue(), bytearray(b"\x01\x02\xff"))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_ReverseEntityAttributeNdarray(self):
+        d = dict(type="base64", value="AAABAAIAAwA%3D", metadata=dict(
+            python=dict(type="dataType", value="ndarray"),
+            dtype=dict(type="dataType", value="<u2"),
+            shape=dict(type="array", value=[2, 2]),
+            byteOrder=dict(type="dataType", value="little")))
+        value = ReverseEntityAttribute(d).getValue()
+        self.assertEqual(type(value), numpy.ndarray)
+        self.assertEqual(value.dtype, numpy.dtype('<u2'))
+        self.assertEqual(value.tolist(), [[0, 1], [2, 3]])
+
+    def test_ReverseEntityAttributeInt_Exact(self):
+        d = dict(type="number", value=2**63 + 1, metadata=dict(python=dict(type="dataType", value="int")))
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), 2**63 + 1)
+        d = dict(type="Integer", value="9007199254740993")
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), 9007199254740993)
+
+    def test_ReverseEntityAttributeFloat_WholeNumber(self):
+        d = dict(type="number", value=2.0, metadata=dict(python=dict(type="dataType", value="float")))
+        self.assertEqual(type(ReverseEntityAttribute(d).getValue()), float)
+        # Without the python-type int it is a long in Python 2
+        d = dict(type="number", value=2.0, metadata={})
+        self.assertEqual(type(ReverseEntityAttribute(d).getValue()), WHOLE_NUMBERS[-1])
+        self.assertEqual(type(ReverseEntityAttribute(d, useMetaData=False).getValue()), WHOLE_NUMBERS[-1])
+        d = dict(type="number", value=2.0, metadata=dict(python=dict(type="dataType", value="int")))
+        self.assertEqual(type(ReverseEntityAttribute(d).getValue()), int)
+
+    def test_ReverseEntityAttributeBool_Strings(self):
+        for value, expected in (("true", True), ("True", True), ("f", False), ("0", False), (0, False), (1, True)):
+            self.assertEqual(ReverseEntityAttribute(dict(type="Boolean", value=value)).getValue(), expected)
+
+    def test_ReverseEntityAttributeEncoded_NotModified(self):
+        d = dict(type="My%2FClass", value=dict(
+            s=dict(type="string", value="a%2Fb"),
+            l=dict(type="array", value=[dict(type="Text", value="c%20d")])))
+        value = ReverseEntityAttribute(d, encoded=True).getValue()
+        self.assertEqual(value, dict(s="a/b", l=["c d"]))
+        self.assertEqual(d["type"], "My%2FClass")
+        self.assertEqual(d["value"]["s"]["value"], "a%2Fb")
+
+    def test_ReverseEntityAttributeMissingTypeOrValue(self):
+        self.assertRaises(ValueError, ReverseEntityAttribute, None)
+        self.assertRaises(ValueError, ReverseEntityAttribute, dict(type="number"))
+        self.assertRaises(ValueError, ReverseEntityAttribute, dict(type="array", value=[dict(value=1)]))
+
+    def test_ReverseEntityAttributeCompactArray(self):
+        def compact(value, elementType, python=None):
+            metadata = dict(elementType=dict(type="dataType", value=elementType))
+            if python is not None:
+                metadata["python"] = dict(type="dataType", value=python)
+            return dict(type="array", value=value, metadata=metadata)
+        value = ReverseEntityAttribute(compact([1, 2.0], "float")).getValue()
+        self.assertEqual([type(item) for item in value], [float, float])
+        self.assertEqual(ReverseEntityAttribute(compact([1, 2], "int", "tuple")).getValue(), (1, 2))
+        self.assertEqual(ReverseEntityAttribute(compact([1, 2], "int", "tuple"), useMetaData=False).getValue(), [1, 2])
+        self.assertEqual(ReverseEntityAttribute(compact(["a%2Fb"], "str"), encoded=True).getValue(), ["a/b"])
+        self.assertEqual(ReverseEntityAttribute(compact(["a%2Fb"], "str")).getValue(), ["a%2Fb"])
+        nested = dict(type="array", value=[compact([True], "bool"), dict(type="number", value=1)])
+        self.assertEqual(ReverseEntityAttribute(nested).getValue(), [[True], 1])
+        self.assertRaises(ValueError, ReverseEntityAttribute, compact([1], "ndarray"))
+
+    def test_RestoreKeyValue(self):
+        self.assertEqual(restoreKeyValue([1, 2], complex), 1 + 2j)
+        self.assertEqual(type(restoreKeyValue(1, 0.0)), float)
+        self.assertEqual(restoreKeyValue("a%2Fb", str, encoded=True), "a/b")
+        self.assertEqual(restoreKeyValue([[1, "a%20b"]], [(0, "")], encoded=True), [(1, "a b")])
+        self.assertEqual(restoreKeyValue(dict(k=[1]), dict(k=(0,))), dict(k=(1,)))
+        # Positional templates if the lengths match, otherwise the first item is the template
+        self.assertEqual(list(map(type, restoreKeyValue([1, 1], [1, True]))), [int, bool])
+        self.assertEqual(list(map(type, restoreKeyValue([1, 0, 1], [True]))), [bool, bool, bool])
+        self.assertEqual(restoreKeyValue("AAE%3D", bytearray), bytearray(b"\x00\x01"))
+        # Without template (or if it cannot be converted) the JSON-value is kept
+        self.assertEqual(restoreKeyValue(dict(k=["a%2Fb"]), None, encoded=True), dict(k=["a/b"]))
+        self.assertEqual(restoreKeyValue("text", 0), "text")
+
+    def test_RestoreKeyValue_Class(self):
+        template = KeyValuePoint()
+        template.x = 0.0
+        template.tags = ("",)
+        point = restoreKeyValue(dict(x=1, tags=["a"], other=[2]), template)
+        self.assertEqual(type(point), KeyValuePoint)
+        self.assertEqual((point.x, type(point.x), point.tags, point.other), (1.0, float, ("a",), [2]))
+        self.assertEqual(restoreKeyValue(dict(x=1), KeyValuePoint).x, 1)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_RestoreKeyValue_Ndarray(self):
+        template = numpy.zeros((2, 2), dtype='<i2')
+        value = restoreKeyValue("AQACAAMABAA%3D", template)
+        self.assertEqual(value.tolist(), [[1, 2], [3, 4]])
+        self.assertEqual(restoreKeyValue([[1.5]], numpy.ndarray).tolist(), [[1.5]])
+
+    def test_ReverseEntityAttributeDeep(self):
+        # Deeper than the recursion limit
+        depth = sys.getrecursionlimit() * 10
+        d = dict(type="array", value=[], metadata={})
+        for i in range(depth):
+            d = dict(type="object", value=dict(next=d, value=dict(type="number", value=i)))
+        value = ReverseEntityAttribute(d).getValue()
+        for i in reversed(range(depth)):
+            self.assertEqual(value["value"], i)
+            value = value["next"]
+        self.assertEqual(value, [])
+
+    def test_ReverseEntityAttributeDeep_Tuple(self):
+        d = dict(type="array", value=[dict(type="number", value=1)], metadata=dict(python=dict(type="dataType", value="tuple")))
+        for _ in range(3):
+            d = dict(type="array", value=[d, dict(type="number", value=2)])
+        self.assertEqual(ReverseEntityAttribute(d).getValue(), [[[(1,), 2], 2], 2])
+
+
+def _toBytes(packed):
+    # tostring() on Python 2
+    return packed.tobytes() if hasattr(packed, 'tobytes') else packed.tostring()
+
+
+class KeyValuePoint(object):
+    pass
@@ -23,9 +23,18 @@ import sys, os
 # Adding This Sub-Project into the PythonPath
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
+import json_backend
+import entity_stream
+from instrumentation import OBJ2FIWARE, FIWARE2OBJ, INTROSPECTION, JSON, PARSING, DECODING
+
 from json_to_object.reverse_entity import ReverseEntity
+from json_to_object.message_plan import isMessage
 from object_to_json.entity import Entity
 
+# Action Types of the NGSIv2 batch update operation (/v2/op/update)
+BATCH_ACTION_TYPES = ["append", "appendStrict", "update", "delete", "replace"]
+# Types of id and type, with which an Entity is plain (see json_backend.dumps)
+_PLAIN_IDS = (str, int, type(None))
 
 
 class ObjectFiwareConverter(object):
@@ -33,22 +42,164 @@ class ObjectFiwareConverter(object):
         The classes in subdirectories are either used to convert them into JSON
         or into a Python-specific-Object. 
     """
+    # Collects statistics of all conversions if set (see setInstrumentation)
+    instrumentation = None
+
+    @classmethod
+    def setInstrumentation(clsself, instrumentation):
+        """ Sets the Instrumentation (see instrumentation.py) which collects timings and
+            counters of every conversion and calls its callbacks around every Entity.
+            None disables it (the default), then nothing is measured.
+        """
+        clsself.instrumentation = instrumentation
+
+    @classmethod
+    def obj2Fiware(clsself, _object, ind=0, dataTypeDict={}, ignorePythonMetaData=False, showIdValue=True, encode=False, packThreshold=None, fragmentCache=None, asBytes=False, keyValues=False, schema=None, compactArrays=False, idGenerator=None): 
+        """ Converts the Object into the JSON-String of a Fiware-Entity. With keyValues the
+            Attributes are plain JSON-values (options=keyValues in NGSIv2), a schema
+            (dict: Attribute-name -> type) restricts them to the Attributes in the schema.
+            With compactArrays, homogeneous lists and tuples of primitives (bool, int, float
+            or str) are plain JSON-Arrays, the type of their elements is added once to their
+            metadata ('elementType'). fiware2Obj restores them exactly.
+            The idGenerator creates the id of Objects without 'id', by default Entity-type + uuid4()
+            (see entity_id.py for stable, deterministic and counter-based ids).
+            ind=None gives the compact JSON of the C encoder of the json-module, the default
+            ind=0 keeps the newline-separated layout (pure Python encoder unless orjson is installed).
+        """
+        en = Entity()
+        stats = clsself._begin(OBJ2FIWARE, _object)
+        en.setObject(_object, dataTypeDict, ignorePythonMetaData, showIdValue= showIdValue, encode=encode, plain=True, packing=packThreshold, fragmentCache=fragmentCache, stats=stats, keyValues=keyValues, schema=schema, compactArrays=compactArrays, idGenerator=idGenerator, sharedMetaData=True)
+        if stats is None:
+            return clsself._json(en, ind, asBytes)
+        stats.mark(INTROSPECTION)
+        body = clsself._json(en, ind, asBytes)
+        stats.mark(JSON)
+        return stats.end(getattr(en, 'type', type(_object).__name__), _attributeCount(en.__dict__), body)
 
     @classmethod
-    def obj2Fiware(clsself, _object, ind=0, dataTypeDict={}, ignorePythonMetaData=False, showIdValue=True, encode=False): 
+    def obj2FiwareBatch(clsself, _objects, actionType="append", ind=0, dataTypeDict={}, ignorePythonMetaData=False, encode=False, asBytes=False, packThreshold=None, fragmentCache=None, keyValues=False, schema=None, compactArrays=False, idGenerator=None):
+        """ Converts multiple Objects into one body for the batch update operation:
+            {"actionType": actionType, "entities": [...]}
+            The Entities always contain their id and type. With asBytes the UTF-8 encoded
+            body is returned, which can be directly used for a HTTP-Request.
+            keyValues, schema, compactArrays and idGenerator are the same as in obj2Fiware.
+        """
+        if actionType not in BATCH_ACTION_TYPES:
+            raise ValueError("Unknown actionType '{}', expected one of {}".format(actionType, BATCH_ACTION_TYPES))
         en = Entity()
-        en.setObject(_object, dataTypeDict, ignorePythonMetaData, showIdValue= showIdValue, encode=encode)
-        return clsself._json(en, ind)
+        entities = []
+        for _object in _objects:
+            stats = clsself._begin(OBJ2FIWARE, _object)
+            en.setObject(_object, dataTypeDict, ignorePythonMetaData, showIdValue=True, encode=encode, plain=True, packing=packThreshold, fragmentCache=fragmentCache, stats=stats, keyValues=keyValues, schema=schema, compactArrays=compactArrays, idGenerator=idGenerator, sharedMetaData=True)
+            entities.append(en.toDict())
+            if stats is not None:
+                stats.mark(INTROSPECTION)
+                stats.end(en.type, _attributeCount(en.__dict__))
+        plain = all(_plainIdAndType(entity) for entity in entities)
+        if clsself.instrumentation is not None:
+            return clsself.instrumentation.timed(JSON, json_backend.dumps, dict(actionType=actionType, entities=entities), ind, asBytes=asBytes, plain=plain)
+        return json_backend.dumps(dict(actionType=actionType, entities=entities), ind, asBytes=asBytes, plain=plain)
 
     @classmethod
-    def fiware2Obj(clsself, _fiwareEntity, _objectStructure={}, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False):
+    def obj2FiwareStream(clsself, _objects, ndjson=False, actionType=None, dataTypeDict={}, ignorePythonMetaData=False, showIdValue=True, encode=False, packThreshold=None, fragmentCache=None, keyValues=False, schema=None, compactArrays=False, idGenerator=None):
+        """ Returns a generator which converts one Object after the other and yields the JSON-chunks.
+            By default the chunks form a JSON-Array: '[', '{...}', ', {...}', ']'.
+            With ndjson every Entity is yielded as a single line (newline-delimited JSON).
+            With an actionType the Array is wrapped into a batch update body (see obj2FiwareBatch).
+            keyValues, schema, compactArrays and idGenerator are the same as in obj2Fiware.
+            Invalid arguments raise a ValueError right away, not with the first chunk.
+        """
+        if actionType is not None and actionType not in BATCH_ACTION_TYPES:
+            raise ValueError("Unknown actionType '{}', expected one of {}".format(actionType, BATCH_ACTION_TYPES))
+        if actionType is not None and ndjson:
+            raise ValueError("A batch update body cannot be newline-delimited")
+        if actionType is not None:
+            # Batch Entities always need their id and type
+            showIdValue = True
+        return clsself._stream(_objects, ndjson, actionType, dataTypeDict, ignorePythonMetaData, showIdValue, encode, packThreshold, fragmentCache, keyValues, schema, compactArrays, idGenerator)
+
+    @classmethod
+    def _stream(clsself, _objects, ndjson, actionType, dataTypeDict, ignorePythonMetaData, showIdValue, encode, packThreshold, fragmentCache, keyValues, schema, compactArrays, idGenerator):
+        if actionType is not None:
+            yield '{"actionType": ' + json.dumps(actionType) + ', "entities": ['
+        elif not ndjson:
+            yield "["
+
+        en = Entity()
+        separator = ""
+        for _object in _objects:
+            stats = clsself._begin(OBJ2FIWARE, _object)
+            en.setObject(_object, dataTypeDict, ignorePythonMetaData, showIdValue=showIdValue, encode=encode, plain=True, packing=packThreshold, fragmentCache=fragmentCache, stats=stats, keyValues=keyValues, schema=schema, compactArrays=compactArrays, idGenerator=idGenerator, sharedMetaData=True)
+            if stats is not None:
+                stats.mark(INTROSPECTION)
+            chunk = json_backend.dumps(en.__dict__)
+            if stats is not None:
+                stats.mark(JSON)
+                stats.end(getattr(en, 'type', type(_object).__name__), _attributeCount(en.__dict__), chunk)
+            if ndjson:
+                yield chunk + "\n"
+            else:
+                yield separator + chunk
+                separator = ", "
+        if actionType is not None:
+            yield "]}"
+        elif not ndjson:
+            yield "]"
+
+    @classmethod
+    def fiware2Obj(clsself, _fiwareEntity, _objectStructure={}, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False, binaryType=None, lazy=False, keyValues=False, schema=None):
+        """ Converts the Fiware-Entity into _objectStructure. With lazy a LazyEntity
+            is returned instead, which converts the Attributes on their first access
+            (_objectStructure is then optional and used as template).
+            With keyValues the Entity is in the keyValues-Representation, the types of the
+            Attributes are restored from the schema (dict: Attribute-name -> type) or from
+            the current Attributes of _objectStructure.
+            A ROS-Message (or its class) is filled directly, nested Messages are created
+            without intermediate dicts (see MessagePlan), also in the keyValues-Representation.
+            The (new) Object or Message is returned.
+        """
+        if keyValues and lazy:
+            raise ValueError("An Entity in the keyValues-Representation cannot be converted lazily")
+        stats = clsself._begin(FIWARE2OBJ, _fiwareEntity)
         jsonObj= None
-        if(type(_fiwareEntity) is str):
+        if(type(_fiwareEntity) in (str, bytes)):
             jsonObj = clsself._obj(_fiwareEntity)
         else:
             jsonObj = _fiwareEntity
-        re = ReverseEntity(**jsonObj)
-        return re.setObject(_objectStructure, useMetaData, ignoreWrongDataType, setAttr, encoded=encoded) 
+        if stats is not None:
+            stats.mark(PARSING)
+        re = ReverseEntity.fromDict(jsonObj)
+        if keyValues:
+            result = re.setKeyValues(_objectStructure, schema, ignoreWrongDataType, setAttr, encoded=encoded)
+        elif lazy:
+            template = _objectStructure if hasattr(_objectStructure, '__dict__') else None
+            result = re.lazy(template, useMetaData, ignoreWrongDataType, setAttr, encoded=encoded, binaryType=binaryType)
+        else:
+            result = re.setObject(_objectStructure, useMetaData, ignoreWrongDataType, setAttr, encoded=encoded, binaryType=binaryType) 
+        if stats is not None:
+            stats.mark(DECODING)
+            stats.end(re.type, _attributeCount(jsonObj), _fiwareEntity if type(_fiwareEntity) in (str, bytes) else None)
+        return result
+
+    @classmethod
+    def fiware2ObjStream(clsself, source, objectType, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False, binaryType=None, lazy=False, keyValues=False, schema=None, chunkSize=entity_stream.CHUNK_SIZE):
+        """ Generator which reads the Entities of source (e.g. the response of GET /v2/entities) incrementally
+            and yields one converted Object after the other. source is a JSON-Array of Entities or
+            newline-delimited Entities as str/bytes, a file-like object (read in chunks of chunkSize)
+            or an iterable of chunks. Only the current Entity is kept in memory.
+            Every Entity is converted with fiware2Obj into a new objectType() (a ROS-Message class
+            is passed as it is), the other arguments are the same as in fiware2Obj.
+        """
+        for entity in entity_stream.iterEntities(source, chunkSize):
+            target = objectType if isMessage(objectType) else objectType()
+            yield clsself.fiware2Obj(entity, target, useMetaData, ignoreWrongDataType, setAttr, encoded=encoded, binaryType=binaryType, lazy=lazy, keyValues=keyValues, schema=schema)
+
+    @classmethod
+    def _begin(clsself, direction, _object):
+        # Statistics of the Entity or None if nothing is measured
+        if clsself.instrumentation is None:
+            return None
+        return clsself.instrumentation.begin(direction, _object)
 
     @classmethod
     def _complex_handler(clsself, Obj):
@@ -59,9 +210,22 @@ class ObjectFiwareConverter(object):
                 type(Obj), repr(Obj)))
 
     @classmethod
-    def _json(clsself, obj, ind=0):
-        return json.dumps(obj.__dict__, default=clsself._complex_handler, indent=ind)
+    def _json(clsself, obj, ind=0, asBytes=False):
+        # Entities with plain Attributes never reach _complex_handler. The json-module uses its
+        # C encoder only with ind=None, any other indent (also the default 0) is written by its
+        # pure Python encoder unless orjson can take over (see json_backend)
+        return json_backend.dumps(obj.__dict__, ind, default=clsself._complex_handler, asBytes=asBytes, plain=_plainIdAndType(obj.__dict__))
 
     @classmethod
     def _obj(clsself, json_str):
-        return json.loads(json_str)
+        return json_backend.loads(json_str)
+
+
+def _plainIdAndType(entity):
+    # The Attributes built by the converters are plain, id and type are taken from the Object as they are
+    return type(entity.get('id')) in _PLAIN_IDS and type(entity.get('type')) in _PLAIN_IDS
+
+
+def _attributeCount(entity):
+    # id and type are no Attributes
+    return len(entity) - ('id' in entity) - ('type' in entity)
@@ -0,0 +1,159 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import array
+import url_encoding
+
+
+# Kinds of fields a plan can contain
+FIELD_PLAIN = 0         # Convert the value with EntityAttribute
+FIELD_ROS_UINT8 = 1     # 'uint8[]' given by the dataTypeDict, ROS may deliver str/bytes
+
+# Maximum number of plans which are kept. Further plans are compiled but not cached
+MAX_PLANS = 1024
+
+
+def _typecode(typecodes, itemsize):
+    # The first typecode of array.array with this itemsize (they differ between platforms)
+    for typecode in typecodes:
+        try:
+            if array.array(typecode).itemsize == itemsize:
+                return typecode
+        except ValueError:
+            # 'q' and 'Q' are missing in Python 2
+            pass
+    return None
+
+
+# Typecodes of array.array for the fixed-width numeric ROS-types. Arrays of these types can be packed into Base64
+ROS_TYPECODES = dict((rosType, typecode) for rosType, typecode in [
+    ("int8", 'b'), ("uint8", 'B'),
+    ("int16", _typecode('hil', 2)), ("uint16", _typecode('HIL', 2)),
+    ("int32", _typecode('ilq', 4)), ("uint32", _typecode('ILQ', 4)),
+    ("int64", _typecode('lq', 8)), ("uint64", _typecode('LQ', 8)),
+    ("float32", _typecode('f', 4)), ("float64", _typecode('d', 8))] if typecode is not None)
+
+
+class ConversionPlan(object):
+    """ A compiled description how objects of one class are converted.
+        Compiling is done once per class (and dataTypeDict/options of the ConversionContext). The plan contains
+        the keys to iterate, the (already escaped) type and for every field a tuple of
+        (key, concrete DataType, kind of conversion, array-typecode if it can be packed
+        into base64, ROS-slot-type, threshold for packing it). 'packed' maps the keys of
+        the fields, which can be packed, to (typecode, DataType, threshold).
+        The plans are cached in ConversionPlan.cache.
+    """
+    cache = dict()
+
+    def __init__(self, _object, concreteDataType, ctx):
+        self.cls = _object.__class__
+        self.usesSlots = hasattr(_object, '__slots__')
+        self.isRos = hasattr(_object, '_type') and hasattr(_object, '_slot_types') and self.usesSlots
+        self.fields = []
+
+        if self.usesSlots:
+            iterL = getattr(_object, '__slots__')
+        elif hasattr(_object, '__dict__'):
+            iterL = _object.__dict__
+        else:
+            raise ValueError("Cannot get attrs from {}".format(str(_object)))
+        self.keys = tuple(iterL)
+
+        if self.isRos:
+            # This is a special CASE for ROS!!!! The type is retrieved on every call
+            # since '_type' can be set per instance
+            self.type = None
+            self.encode = ctx.encode
+            for key, key_type in zip(_object.__slots__, _object._slot_types):
+                if key.startswith('_'):
+                    continue
+                innerConcreteMetaData = self._innerConcrete(concreteDataType, key)
+                # Special Case 'Image-like'-Data in ROS (very long numeric arrays, e.g. 'uint8[]' or 'float32[]')
+                typecode = ROS_TYPECODES.get(key_type[:key_type.index('[')]) if '[' in key_type else None
+                if innerConcreteMetaData is not None and "uint8[" in innerConcreteMetaData:
+                    # SPECIAL ROS CASE we have uint8[]-Array as a String or byte
+                    # See: http://wiki.ros.org/msg#Fields -> Array-Handling
+                    kind = FIELD_ROS_UINT8
+                else:
+                    kind = FIELD_PLAIN
+                threshold = ctx.packing.threshold(_object._type, key, key_type)
+                self.fields.append((key, innerConcreteMetaData, kind, typecode, key_type, threshold))
+        else:
+            # Simple Class
+            self.type = self.cls.__name__
+            for key in self.keys:
+                if key.startswith('_'):
+                    continue
+                self.fields.append((key, self._innerConcrete(concreteDataType, key), FIELD_PLAIN, None, None, None))
+        self.fields = tuple(self.fields)
+        self.packed = dict((key, (typecode, innerConcreteMetaData or slotType, threshold))
+                           for key, innerConcreteMetaData, kind, typecode, slotType, threshold in self.fields if typecode is not None)
+
+    def getType(self, _object):
+        """ Returns the type of the object. Only ROS-Messages can differ per instance,
+            the shared plan is not changed (quote memoizes the short types)
+        """
+        if not self.isRos:
+            return self.type
+        if self.encode:
+            return url_encoding.quote(_object._type)
+        return _object._type
+
+    @staticmethod
+    def _innerConcrete(concreteDataType, key):
+        if concreteDataType is not None and key in concreteDataType:
+            return concreteDataType[key]
+        return None
+
+    @classmethod
+    def get(cls, _object, concreteDataType, ctx):
+        """ Returns the cached plan for the object or compiles a new one.
+            Plans are only cached if the concreteDataType can be frozen into a key
+        """
+        if hasattr(_object, '__slots__'):
+            shape = None
+        else:
+            # Objects with a __dict__ may have different keys per instance
+            shape = tuple(getattr(_object, '__dict__', ()))
+        try:
+            planKey = (_object.__class__, shape, freeze(concreteDataType), ctx.ipmd, ctx.encode, ctx.packing)
+            plan = cls.cache.get(planKey)
+        except TypeError:
+            # Unhashable dataTypeDict, compile without caching
+            return ConversionPlan(_object, concreteDataType, ctx)
+
+        if plan is None:
+            # Unseen shape, compile it
+            plan = ConversionPlan(_object, concreteDataType, ctx)
+            if len(cls.cache) < MAX_PLANS:
+                cls.cache[planKey] = plan
+        return plan
+
+    @classmethod
+    def clear(cls):
+        cls.cache.clear()
+
+
+def freeze(concreteDataType):
+    """ Converts a (nested) dataTypeDict into something hashable.
+        Raises a TypeError if this is not possible
+    """
+    if concreteDataType is None or isinstance(concreteDataType, str):
+        return concreteDataType
+    if isinstance(concreteDataType, dict):
+        return frozenset((key, freeze(value)) for key, value in concreteDataType.items())
+    if isinstance(concreteDataType, (list, tuple)):
+        return tuple(freeze(value) for value in concreteDataType)
+    hash(concreteDataType)
+    return concreteDataType
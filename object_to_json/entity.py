@@ -13,44 +13,65 @@
 #    limitations under the License.
 
 
-import uuid
 
-try: 
-    import urllib.parse as quote
-except ImportError:
-    import urllib as quote
+import url_encoding
 
-from object_to_json.entity_attribute import EntityAttribute
+from object_to_json.conversion_plan import ConversionPlan
+from object_to_json.entity_attribute import ConversionContext, toKeyValue, packArray
+from object_to_json.entity_id import UuidIds
 
 ERROR_MESSAGE_ATTTRIBUTE = 'Error setting Object in \'setObject\' : '
+# Ids of Objects without 'id', if no idGenerator is given
+DEFAULT_ID_GENERATOR = UuidIds()
 
 
 class Entity(object):
     """ This is the Entity which will be later serialized with json. 
-        Here the __dict__ is set with setObject. Also th uuid is here generated and
+        Here the __dict__ is set with setObject. Also th id is here generated (uuid4) and
         all types are converted into correct structure with EntityAttribute.
-        The Keys "type" "id" and "_*" are ignored and not added into the Entity
+        The Keys "type" "id" and "_*" are ignored and not added into the Entity.
+        With 'plain' the Attributes are plain dicts instead of EntityAttributes, so
+        that json.dumps does not need to call back for every node. 'packing' is the
+        threshold or PackingPolicy for converting Arrays into Base64. Converted sub-objects
+        can be reused with a FragmentCache. 'stats' collects statistics of the conversion.
+        With 'keyValues' the Attributes are plain JSON-values without type and metadata
+        (NGSIv2 keyValues). A 'schema' (dict: Attribute-name -> type) restricts the
+        Attributes to the ones in the schema. With 'compactArrays' homogeneous Arrays of
+        primitives are plain JSON-Arrays with the type of their elements in the metadata.
+        The 'idGenerator' (see entity_id.py) creates the id of Objects without 'id'.
+        With 'sharedMetaData' the Attributes share their metadata with other conversions, it
+        is only set if the Entity is serialized directly and not modified (see ConversionContext).
     """
 
     def __init__(self):
         self.type = self.__class__.__name__
-        self.id = self.type + str(uuid.uuid4())
+        self.id = DEFAULT_ID_GENERATOR(self, self.type)
 
-    def setObject(self, _object, dataTypeDict, ignorePythonMetaData, showIdValue=True, encode=False):
+    def setObject(self, _object, dataTypeDict, ignorePythonMetaData, showIdValue=True, encode=False, plain=False, packing=None, fragmentCache=None, stats=None, keyValues=False, schema=None, compactArrays=False, idGenerator=None, sharedMetaData=False):
         # Clear own dictionary
         self.__dict__.clear()
+        # The metadata of keyValues is dropped anyway
+        ctx = ConversionContext(ignorePythonMetaData, encode, packing, plain or keyValues, fragmentCache, stats, compactArrays, sharedMetaData or keyValues, keyValues)
         try:
             # Setting EntityType and EntitiyID
             if (showIdValue):
                 self.type = _object.__class__.__name__
-                self.id = self.type + str(uuid.uuid4())
+                # Generated after the loop, if the Object has no id
+                self.id = None
 
 
             # Set Key/Value in own Dictionary
+            packed = {}
             if (isinstance(_object, dict)):
                 iterL = _object.keys()
             elif(hasattr(_object, '__slots__')):
                 iterL = getattr(_object, '__slots__')
+                if hasattr(_object, '_type') and hasattr(_object, '_slot_types'):
+                    # The numeric Arrays of ROS-Messages may be packed
+                    packed = ConversionPlan.get(_object, dataTypeDict, ctx).packed
+                    if keyValues:
+                        # Without metadata only uint8 can be restored
+                        packed = dict((key, field) for key, field in packed.items() if field[0] == 'B')
             else:
                 iterL = _object.__dict__
 
@@ -71,19 +92,32 @@ class Entity(object):
                     value = _object[key]
                 else:
                     value = getattr(_object, key)
+                if key in packed:
+                    value = packArray(value, packed[key], ctx)
                 if (key == "type" or key == "id" or key.startswith('_', 0, 1)):
                     # Object contains invalid key-name, ignore!
                     pass
+                elif schema is not None and key not in schema:
+                    # Not part of the schema, ignore!
+                    pass
+                elif keyValues:
+                    self.__dict__[key] = toKeyValue(ctx.node(value, dataTypeDict.get(key), baseEntity=True))
                 else:
-                    self.__dict__[key] = EntityAttribute(value, ignorePythonMetaData, dataTypeDict.get(key), baseEntity=True, encode=encode) 
+                    self.__dict__[key] = ctx.node(value, dataTypeDict.get(key), baseEntity=True)
+            if showIdValue and self.id is None:
+                self.id = (DEFAULT_ID_GENERATOR if idGenerator is None else idGenerator)(_object, self.type)
         except AttributeError as ex:
             raise ValueError(ERROR_MESSAGE_ATTTRIBUTE, ex)
 
         # Encode in HTML (OCB Specific!)
         if encode and showIdValue:
-            self.type = quote.quote(self.type, safe='')
-            self.id = quote.quote(self.id, safe='')
+            self.type = url_encoding.quote(self.type)
+            self.id = url_encoding.quote(self.id)
+
 
+    def toDict(self):
+        """ Returns the (shallow copied) Entity as dict, e.g. to collect multiple Entities """
+        return dict(self.__dict__)
 
     def __repr__(self):
         return "Id: " + str(self.id) + ", Type: " + str(self.type)
@@ -16,232 +16,695 @@
 import sys
 import array
 import base64
+import json
+
+import url_encoding
 
 try:
-    import urllib.parse as quote
+    # NumPy is optional, ndarrays are only converted if it is installed
+    import numpy
 except ImportError:
-    import urllib as quote
+    numpy = None
+
+from object_to_json.conversion_plan import ConversionPlan, FIELD_ROS_UINT8, ROS_TYPECODES
 
-# TODO DL Threshold for converting large Arrays in ROS-Messages?
+# Default Threshold (Length of the Array) for converting large Arrays in ROS-Messages into Base64
 THRESH = 256
+PYTHON_VERSION = sys.version_info
 
 
-class EntityAttribute():
+class EntityAttribute(object):
     """ Here the actual Conversion to the correct JSON-Format happens 
     (no string is generated here). By initializing this class the given Object is 
-    translated into the format. This is straight-forward if-then-else-magic.
+    translated into the format. The type of the Object selects the converter in
+    '_CONVERTERS', classes are converted with a cached ConversionPlan.
     Additional information are given for some types, for a bidirectional Conversion.
+    The metadata of the EntityAttribute (and its nested ones) is its own and can be modified.
 
     """
-    python_version = sys.version_info
-
-    def __init__(self, _object, ipmd, concreteDataType=None, baseEntity=False, encode=False):
-        self.value = _object
-        self.type = ""
-        self.metadata = dict()
-        if baseEntity:
-            self.setConcreteMetaData(concreteDataType)
-        objectType = type(_object)
-
-        # Simply if-then-else to the Json fromat
-        if(objectType is type(None)):
-            pass
-        elif objectType is bool:
-            self.type = "boolean"
-            self.value = bool(_object)
-            # self.setConcreteMetaData(concreteDataType)
-        elif objectType is int:
-            self.type = "number"
-            self.value = int(_object)
-            self.setPythonMetaData(ipmd, "int")
-            # self.setConcreteMetaData(concreteDataType)
-        elif objectType is float:
-            self.type = "number"
-            self.value = float(_object)
-            self.setPythonMetaData(ipmd, "float")
-            # self.setConcreteMetaData(concreteDataType)
-        # Check explicitly if Python 2 is used
-        elif self.python_version < (3, 0) and objectType is long:
-            self.type = "number"
-            self.value = long(_object)
-            self.setPythonMetaData(ipmd, "long")
-            # self.setConcreteMetaData(concreteDataType)
-        elif objectType is complex:
-            self.type = "array"
-            t = complex(_object)
-            self.value = [EntityAttribute(
-                t.real, ipmd), EntityAttribute(t.imag, ipmd)]
-            self.setPythonMetaData(ipmd, "complex")
-            # self.setConcreteMetaData(concreteDataType)
-        elif objectType is str:
-            # Thanks to ROS, Bytes are converted into
-            self.type = "string"
-            if not encode:
-                self.value = str(_object)
-            else:
-                self.value = quote.quote(str(_object), safe='')
-
-            # self.setConcreteMetaData(concreteDataType)
-        # Check explicitly if Python 2 is used
-        elif self.python_version < (3, 0) and objectType is unicode:
-            self.type = "string"
-            if not encode:
-                self.value = unicode(_object)
-            else:
-                self.value = quote.quote(unicode(_object), safe='')
-            # self.setConcreteMetaData(concreteDataType)
-            self.setPythonMetaData(ipmd, "unicode")
-        elif objectType is tuple:
-            self.type = "array"
-            self.value = []
-            self.setPythonMetaData(ipmd, "tuple")
-            self.setConcreteMetaData(concreteDataType)
-            for item in _object:
-                self.value.append(EntityAttribute(item, ipmd, encode=encode))
-        elif objectType is list:
-            self.type = "array"
-            self.value = []
-            self.setConcreteMetaData(concreteDataType)
-            for item in _object:
-                self.value.append(EntityAttribute(item, ipmd, encode=encode))
-        elif objectType is dict:
-            self.type = "object"
-            tempDict = {}
-            for key, value in _object.items():
-                innerConcreteMetaData = None
-                if concreteDataType is not None and key in concreteDataType:
-                    innerConcreteMetaData = concreteDataType[key]
-                tempDict[key] = EntityAttribute(
-                    value, ipmd, innerConcreteMetaData, encode=encode)
-            self.value = tempDict
+    __slots__ = ['value', 'type', 'metadata']
+    python_version = PYTHON_VERSION
+
+    def __init__(self, _object, ipmd, concreteDataType=None, baseEntity=False, encode=False, packing=None, compactArrays=False, _context=None):
+        if _context is None:
+            _context = ConversionContext(ipmd, encode, packing, compactArrays=compactArrays)
+            # The nodes of the ConversionContext are copied by 'node', not this one
+            _fresh = not _context.sharedMetaData
         else:
-            # Case it is a Class
-            # check explicitly if it has the needed attrs
-            if (hasattr(_object, '__slots__')):
-                iterL = getattr(_object, '__slots__')
-            elif(hasattr(_object, '__dict__')):
-                iterL = _object.__dict__
-            else:
-                raise ValueError(
-                    "Cannot get attrs from {}".format(str(_object)))
-
-            # ROS-Specific Type-Declaration
-            if hasattr(_object, '_type') and hasattr(_object, '_slot_types') and hasattr(_object, '__slots__'):
-                # This is a special CASE for ROS!!!!
-                if not encode:
-                    self.type = _object._type
-                else:
-                    self.type = quote.quote(_object._type, safe='')
-
-                self.setPythonMetaData(ipmd, "class")
-                # Special Case 'Image-like'-Data in ROS (very long 'int8[]'- and 'uint8[]' - arrays)
-                # These are converted into Base64 (escaped)
-                tempDict = {}
-                for key, key_type in zip(_object.__slots__, _object._slot_types):
-                    if key.startswith('_'):
-                        continue
-                    if ('int8[' in key_type or 'uint8[' in key_type) and len(getattr(_object, key)) >= THRESH:
-                        # TODO DL 256 -> Threshold?
-                        # Generate Base64 String of the Array:
-                        tempDict[key] = EntityAttribute(
-                            None, ipmd, encode=encode)
-                        tempDict[key].type = "base64"
-
-                        # Either generate unsigned or signed byte-array
-                        if 'int8[' in key_type:
-                            tempDict[key].value = array.array(
-                                'b', getattr(_object, key)).tostring()
-                        else:
-                            tempDict[key].value = array.array(
-                                'B', getattr(_object, key)).tostring()
-
-                        # Form that Byte-Array: generate Base64 String
-                        tempDict[key].value = base64.b64encode(
-                            tempDict[key].value)
-
-                        # Escape Special Characters:
-                        tempDict[key].value = quote.quote(
-                            tempDict[key].value, safe='')
-                        tempDict[key].metadata = dict()
-                        self.setConcreteMetaData(
-                            concreteDataType[key], tempDict[key])
-                    else:
-                        innerConcreteMetaData = None
-                        if concreteDataType is not None and key in concreteDataType:
-                            # We have a special DatType for it
-                            innerConcreteMetaData = concreteDataType[key]
-                            alreadySet = False  # Boolean to check if data ist already set
-                            if "uint8[" in innerConcreteMetaData:
-                                # SPECIAL ROS CASE we have uint8[]-Array as a String or byte
-                                # See: http://wiki.ros.org/msg#Fields -> Array-Handling
-                                strangeObj = getattr(_object, key)
-                                toConvert = None
-                                if type(strangeObj) is str:
-                                    # Looks like ROS converted it for us into str!
-                                    toConvert = array.array(
-                                        "B", strangeObj).tolist()
-                                if not self.python_version < (3, 0) and type(strangeObj) is bytes:
-                                    # Looks like ROS converted it for us into bytes!
-                                    toConvert = list(strangeObj)
-                                if toConvert is not None and len(toConvert) >= THRESH:
-                                    # TODO DL 256 -> Threshold?
-                                    # Generate Base64 String of the Array:
-                                    tempDict[key] = EntityAttribute(
-                                        None, ipmd, encode=encode)
-                                    tempDict[key].type = "base64"
-
-                                    # Generate unsigned or byte-array
-                                    tempDict[key].value = array.array(
-                                        'B', getattr(_object, key)).tostring()
-
-                                    # Form that Byte-Array: generate Base64 String
-                                    tempDict[key].value = base64.b64encode(
-                                        tempDict[key].value)
-
-                                    # Escape Special Characters:
-                                    tempDict[key].value = quote.quote(
-                                        tempDict[key].value, safe='')
-                                    tempDict[key].metadata = dict()
-                                    self.setConcreteMetaData(
-                                        innerConcreteMetaData, tempDict[key])
-                                    alreadySet = True
-
-                            else:
-                                # Something else we should convert
-                                toConvert = getattr(_object, key)
-                            if alreadySet is False:
-                                tempDict[key] = EntityAttribute(
-                                    toConvert, ipmd, innerConcreteMetaData, encode=encode)
-                        else:
-                            # Just get its child and convert it
-                            tempDict[key] = EntityAttribute(
-                                getattr(_object, key), ipmd, None, encode=encode)
-                self.value = tempDict
-            else:
-                # Simple Class. Recursively retrieve the other values
-                self.type = _object.__class__.__name__
-                self.setPythonMetaData(ipmd, "class")
-                tempDict = {}
-                for key in iterL:
-                    if key.startswith('_'):
-                        continue
-                    innerConcreteMetaData = None
-                    if concreteDataType is not None and key in concreteDataType:
-                        innerConcreteMetaData = concreteDataType[key]
-                    tempDict[key] = EntityAttribute(
-                        getattr(_object, key), ipmd, innerConcreteMetaData, encode=encode)
-                self.value = tempDict
-
-        # Remove metadata-Attribute if it is empty (minimizing the JSON)
-        if self.metadata == {}:
-            delattr(self, "metadata")
+            _fresh = False
+        self.value, self.type, metadata = convert(_object, concreteDataType, baseEntity, _context)
+        # The metadata-Attribute is only set if it is not empty (minimizing the JSON)
+        if metadata:
+            self.metadata = metadata
+        if _fresh:
+            _freshMetaData(self)
+
+    @property
+    def __dict__(self):
+        # The Attributes as dict (in the order of the JSON), like the __dict__ without __slots__
+        if hasattr(self, "metadata"):
+            return {"value": self.value, "type": self.type, "metadata": self.metadata}
+        return {"value": self.value, "type": self.type}
 
     def setPythonMetaData(self, ignorePythonMetaData, val):
         if not ignorePythonMetaData:
-            self.metadata["python"] = dict(type="dataType", value=val)
+            self._metadata()["python"] = _dataType(val)
 
     def setConcreteMetaData(self, val, obj=None):
-        if val is not None and obj is None:
-            self.metadata["dataType"] = dict(type="dataType", value=val)
-        elif val is not None:
-            obj.metadata["dataType"] = dict(type="dataType", value=val)
+        if val is not None:
+            (self if obj is None else obj)._metadata()["dataType"] = _dataType(val)
+
+    def _metadata(self):
+        # Copy the (maybe shared) metadata before it is modified
+        self.metadata = dict(getattr(self, "metadata", ()))
+        return self.metadata
+
+
+def toPlain(_object, ipmd, concreteDataType=None, baseEntity=False, encode=False, packing=None, compactArrays=False):
+    """ The same conversion as in EntityAttribute, but the result is a plain dict
+        (and its values plain dicts and lists) which can be serialized by json.dumps
+        without calling back into Python for every node.
+    """
+    return ConversionContext(ipmd, encode, packing, plain=True, compactArrays=compactArrays).node(_object, concreteDataType, baseEntity)
+
+
+def toKeyValue(node):
+    """ Returns the value of the plain node (see toPlain) without its type and metadata,
+        as in the NGSIv2-Representation 'keyValues'. Nested nodes are unwrapped, too.
+    """
+    root = [None]
+    stack = [(root, 0, node)]
+    while stack:
+        parent, key, node = stack.pop()
+        value = node["value"]
+        if type(value) is list and "elementType" in node.get("metadata", ()):
+            # A compact Array contains plain values
+            value = list(value)
+        elif type(value) is list:
+            unwrapped = [None] * len(value)
+            stack.extend((unwrapped, index, item) for index, item in enumerate(value))
+            value = unwrapped
+        elif type(value) is dict:
+            # The keys are added first, so that they keep their order
+            unwrapped = dict.fromkeys(value)
+            stack.extend((unwrapped, itemKey, item) for itemKey, item in value.items())
+            value = unwrapped
+        parent[key] = value
+    return root[0]
+
+
+class PackingPolicy(object):
+    """ Decides which Arrays in ROS-Messages are packed into Base64.
+        A threshold is either the minimal length of the Array (int), "auto" (pack if
+        the Base64 String is smaller than the JSON-Array) or None (never pack).
+        'types' maps the ROS-type of the field (e.g. "uint8[]") and 'fields' the name
+        of the field (e.g. "data" or qualified with the ROS-Message "sensor_msgs/Image.data")
+        to a threshold. The most specific one is used, otherwise 'default'.
+        A PackingPolicy should not be changed after it was used.
+    """
+
+    def __init__(self, default=THRESH, types=None, fields=None):
+        self.default = _checkThreshold(default)
+        self.types = dict((_arrayType(key), _checkThreshold(value)) for key, value in (types or {}).items())
+        self.fields = dict((key, _checkThreshold(value)) for key, value in (fields or {}).items())
+        self._key = (self.default, frozenset(self.types.items()), frozenset(self.fields.items()))
+
+    @classmethod
+    def of(cls, packing):
+        """ Returns a PackingPolicy for a threshold, a PackingPolicy or None (the default) """
+        if packing is None:
+            return DEFAULT_PACKING
+        if isinstance(packing, PackingPolicy):
+            return packing
+        return PackingPolicy(packing)
+
+    def threshold(self, rosType, field, slotType):
+        """ Returns the threshold for a field of a ROS-Message """
+        qualified = "{}.{}".format(rosType, field)
+        if qualified in self.fields:
+            return self.fields[qualified]
+        if field in self.fields:
+            return self.fields[field]
+        return self.types.get(_arrayType(slotType), self.default)
+
+    def __eq__(self, other):
+        return isinstance(other, PackingPolicy) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key)
+
+
+def _checkThreshold(threshold):
+    if threshold is None or threshold == "auto" or (isinstance(threshold, int) and not isinstance(threshold, bool)):
+        return threshold
+    raise ValueError("A threshold is either an int, 'auto' or None, not {}".format(repr(threshold)))
+
+
+def _arrayType(slotType):
+    # 'uint8[16]' and 'uint8[]' share their threshold
+    if slotType is not None and '[' in slotType:
+        return slotType[:slotType.index('[')] + '[]'
+    return slotType
+
+
+DEFAULT_PACKING = PackingPolicy()
+
+
+class ConversionContext(object):
+    """ The options of one conversion, which are passed to every converter.
+        'make' converts nested Objects into nodes, which are EntityAttributes
+        or (if plain is set) dicts. With a FragmentCache the nodes of cacheable
+        Objects are looked up first, new nodes are only cached after they are filled. If statistics are collected (see instrumentation.py),
+        'stats' wraps 'make' and the converters once, otherwise nothing is measured.
+        Nested Objects are not converted recursively: 'make' converts primitives directly,
+        for everything else an empty node is returned and put onto the stack 'pending'.
+        'convert' fills the pending nodes, until the stack is empty.
+        With sharedMetaData the nodes share their metadata-dicts (see _pythonMetaData), which is
+        faster, but only safe if the nodes are serialized and not modified (as in obj2Fiware).
+        Otherwise 'node' returns nodes with their own copies.
+        With keyValues the nodes are converted into keyValues afterwards (see toKeyValue), which
+        drops the metadata. Only uint8-Arrays of ROS-Messages are packed then, since the other
+        typecodes cannot be restored without their metadata.
+        With compactArrays, homogeneous Arrays of primitives are plain JSON-Arrays (see _compactArray).
+    """
+    __slots__ = ['ipmd', 'encode', 'packing', 'plain', 'cache', 'stats', 'compactArrays', 'sharedMetaData', 'keyValues', 'converters', 'pending', 'unfinished', 'make', '_make']
+
+    def __init__(self, ipmd, encode=False, packing=None, plain=False, cache=None, stats=None, compactArrays=False, sharedMetaData=False, keyValues=False):
+        self.ipmd = bool(ipmd)
+        self.sharedMetaData = sharedMetaData
+        self.keyValues = bool(keyValues)
+        self.encode = bool(encode)
+        self.compactArrays = bool(compactArrays)
+        self.packing = PackingPolicy.of(packing)
+        self.plain = plain
+        self.cache = cache
+        self.stats = stats
+        self.pending = []
+        # Key -> (Object, node) of the cacheable nodes, which are not filled yet
+        self.unfinished = {}
+        self._make = self._makePlain if plain else self._makeAttribute
+        self.make = self._make if cache is None else self._makeCached
+        if stats is None:
+            self.converters = _CONVERTERS
+        else:
+            self.converters = stats.wrapConverters(_CONVERTERS)
+            self.make = stats.wrapMake(self.make)
+
+    def node(self, _object, concreteDataType=None, baseEntity=False):
+        """ Converts the Object into a node """
+        if self.cache is not None:
+            node = self._cached(_object, concreteDataType, baseEntity)
+        else:
+            node = self._node(_object, concreteDataType, baseEntity)
+        if not self.sharedMetaData:
+            _freshMetaData(node)
+        return node
+
+    def _node(self, _object, concreteDataType, baseEntity):
+        if not self.plain:
+            return EntityAttribute(_object, self.ipmd, concreteDataType, baseEntity, _context=self)
+        return _plainNode(*convert(_object, concreteDataType, baseEntity, self))
+
+    def _makeAttribute(self, _object, concreteDataType=None):
+        node = EntityAttribute.__new__(EntityAttribute)
+        if type(_object) in _PRIMITIVES:
+            _fillAttribute(node, *self.converters[type(_object)](_object, concreteDataType, self))
+        else:
+            self.pending.append((node, _object, concreteDataType))
+        return node
+
+    def _makePlain(self, _object, concreteDataType=None):
+        if type(_object) in _PRIMITIVES:
+            return _plainNode(*self.converters[type(_object)](_object, concreteDataType, self))
+        node = {}
+        self.pending.append((node, _object, concreteDataType))
+        return node
+
+    def _makeCached(self, _object, concreteDataType=None):
+        key = self.cache.key(_object, concreteDataType, False, self)
+        if key is None:
+            return self._make(_object, concreteDataType)
+        entry = self.unfinished.get(key)
+        if entry is not None:
+            return entry[1]
+        node = self.cache.get(key)
+        if node is None:
+            # The (maybe still empty) node is cached by fillPending, when it is filled
+            node = self._make(_object, concreteDataType)
+            self.unfinished[key] = (_object, node)
+        return node
+
+    def _cached(self, _object, concreteDataType, baseEntity):
+        key = self.cache.key(_object, concreteDataType, baseEntity, self)
+        if key is None:
+            return self._node(_object, concreteDataType, baseEntity)
+        node = self.cache.get(key)
+        if node is None:
+            node = self._node(_object, concreteDataType, baseEntity)
+            self.cache.put(key, _object, node)
+        return node
+
+    def fillPending(self):
+        """ Converts the Objects of the pending nodes. Their converters may add further nodes """
+        pending = self.pending
+        converters = self.converters
+        fill = _fillPlain if self.plain else _fillAttribute
+        try:
+            while pending:
+                node, _object, concreteDataType = pending.pop()
+                fill(node, *converters.get(type(_object), _fromClass)(_object, concreteDataType, self))
+        except Exception:
+            # Half filled nodes are never cached
+            del pending[:]
+            self.unfinished.clear()
+            raise
+        if self.unfinished:
+            for key, (_object, node) in self.unfinished.items():
+                self.cache.put(key, _object, node)
+            self.unfinished.clear()
+
+
+def _plainNode(value, type_, metadata):
+    if metadata:
+        return {"value": value, "type": type_, "metadata": metadata}
+    return {"value": value, "type": type_}
+
+
+def _fillPlain(node, value, type_, metadata):
+    # The same keys (and order) as in _plainNode
+    node["value"] = value
+    node["type"] = type_
+    if metadata:
+        node["metadata"] = metadata
+
+
+def _fillAttribute(node, value, type_, metadata):
+    # The same Attributes as in EntityAttribute.__init__
+    node.value = value
+    node.type = type_
+    if metadata:
+        node.metadata = metadata
+
+
+def convert(_object, concreteDataType, baseEntity, ctx):
+    """ Converts the Object into the tuple (value, type, metadata).
+        Nested Objects are converted with ctx.make(_object, concreteDataType),
+        which decides the representation of the nodes (EntityAttribute or dict).
+        The nested nodes are complete, when convert returns.
+    """
+    # Simply lookup the converter to the Json fromat
+    converter = ctx.converters.get(type(_object), _fromClass)
+    value, type_, metadata = converter(_object, concreteDataType, ctx)
+    if ctx.pending:
+        ctx.fillPending()
+    if baseEntity and concreteDataType is not None:
+        # The concrete DataType of the base Entity comes first
+        baseMetadata = dict(dataType=_dataType(concreteDataType))
+        if metadata:
+            baseMetadata.update(metadata)
+        metadata = baseMetadata
+    return value, type_, metadata
+
+
+def _freshMetaData(node):
+    """ Replaces the (shared) metadata of the node and its nested nodes by copies """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if type(node) is dict:
+            metadata = node.get("metadata")
+            if metadata:
+                node["metadata"] = metadata = _copyMetaData(metadata)
+            value = node["value"]
+        else:
+            metadata = getattr(node, "metadata", None)
+            if metadata:
+                node.metadata = metadata = _copyMetaData(metadata)
+            value = node.value
+        if type(value) is list and not (metadata and "elementType" in metadata):
+            stack.extend(value)
+        elif type(value) is dict:
+            stack.extend(value.values())
+
+
+def _copyMetaData(metadata):
+    return dict((key, dict(item) if type(item) is dict else item) for key, item in metadata.items())
+
+
+def _pythonMetaData(ipmd, val, concreteDataType=None, elementType=None):
+    """ Returns the metadata with the python-type, the concrete DataType and the type of
+        the elements of a compact Array. The dict is shared by all nodes with the same
+        metadata and must not be modified (see ConversionContext.sharedMetaData)
+    """
+    key = (None if ipmd else val, concreteDataType, elementType)
+    try:
+        return _METADATA[key]
+    except KeyError:
+        return _METADATA.setdefault(key, _newMetaData(ipmd, val, concreteDataType, elementType))
+    except TypeError:
+        # The concrete DataType is not hashable (e.g. a dict)
+        return _newMetaData(ipmd, val, concreteDataType, elementType)
+
+
+def _newMetaData(ipmd, val, concreteDataType, elementType):
+    metadata = dict()
+    if not ipmd:
+        metadata["python"] = _dataType(val)
+    if concreteDataType is not None:
+        metadata["dataType"] = _dataType(concreteDataType)
+    if elementType is not None:
+        metadata["elementType"] = _dataType(elementType)
+    return metadata
+
+
+def _dataType(val):
+    # The shared metadata-value of a python-type or a concrete DataType
+    try:
+        return _DATA_TYPES[val]
+    except KeyError:
+        return _DATA_TYPES.setdefault(val, dict(type="dataType", value=val))
+    except TypeError:
+        return dict(type="dataType", value=val)
+
+
+# Shared metadata (see _pythonMetaData, _dataType and _byteOrderMetaData)
+_METADATA = {}
+_DATA_TYPES = {}
+_BYTE_ORDER_METADATA = {}
+
+
+def _fromNone(_object, concreteDataType, ctx):
+    return _object, "", None
+
+
+def _fromBool(_object, concreteDataType, ctx):
+    return bool(_object), "boolean", None
+
+
+def _fromInt(_object, concreteDataType, ctx):
+    return int(_object), "number", _pythonMetaData(ctx.ipmd, "int")
+
+
+def _fromFloat(_object, concreteDataType, ctx):
+    return float(_object), "number", _pythonMetaData(ctx.ipmd, "float")
+
+
+def _fromLong(_object, concreteDataType, ctx):
+    # Only used in Python 2
+    return long(_object), "number", _pythonMetaData(ctx.ipmd, "long")
+
+
+def _fromComplex(_object, concreteDataType, ctx):
+    t = complex(_object)
+    return [ctx.make(t.real), ctx.make(t.imag)], "array", _pythonMetaData(ctx.ipmd, "complex")
+
+
+def _fromStr(_object, concreteDataType, ctx):
+    # Thanks to ROS, Bytes are converted into
+    if not ctx.encode:
+        return str(_object), "string", None
+    return url_encoding.quote(str(_object)), "string", None
+
+
+def _fromUnicode(_object, concreteDataType, ctx):
+    # Only used in Python 2
+    if not ctx.encode:
+        return unicode(_object), "string", _pythonMetaData(ctx.ipmd, "unicode")
+    return url_encoding.quote(unicode(_object)), "string", _pythonMetaData(ctx.ipmd, "unicode")
+
+
+def _fromTuple(_object, concreteDataType, ctx):
+    if ctx.compactArrays:
+        value, elementType = _compactArray(_object, ctx)
+        if elementType is not None:
+            return value, "array", _pythonMetaData(ctx.ipmd, "tuple", concreteDataType, elementType)
+    value = [ctx.make(item) for item in _object]
+    return value, "array", _pythonMetaData(ctx.ipmd, "tuple", concreteDataType)
+
+
+def _fromList(_object, concreteDataType, ctx):
+    if ctx.compactArrays:
+        value, elementType = _compactArray(_object, ctx)
+        if elementType is not None:
+            return value, "array", _pythonMetaData(True, None, concreteDataType, elementType)
+    value = [ctx.make(item) for item in _object]
+    return value, "array", _pythonMetaData(True, None, concreteDataType)
+
+
+def _compactArray(_object, ctx):
+    """ Returns the plain JSON-values and the python-type of the elements, if all
+        elements of the Array have the same primitive type. Otherwise (None, None).
+        The type of the elements is hoisted into the metadata 'elementType' of the Array.
+    """
+    types = set(map(type, _object))
+    if len(types) != 1:
+        return None, None
+    elementType = types.pop()
+    name = _ELEMENT_TYPES.get(elementType)
+    if name is None:
+        return None, None
+    if ctx.encode and elementType in _TEXT_TYPES:
+        return list(map(url_encoding.quote, _object)), name
+    return list(_object), name
+
+
+def _fromDict(_object, concreteDataType, ctx):
+    tempDict = {}
+    for key, value in _object.items():
+        innerConcreteMetaData = None
+        if concreteDataType is not None and key in concreteDataType:
+            innerConcreteMetaData = concreteDataType[key]
+        tempDict[key] = ctx.make(value, innerConcreteMetaData)
+    return tempDict, "object", None
+
+
+def _fromClass(_object, concreteDataType, ctx):
+    # Case it is a Class, the (cached) plan knows which attrs are converted
+    # and which ROS-specific Cases need to be considered
+    plan = ConversionPlan.get(_object, concreteDataType, ctx)
+
+    tempDict = {}
+    for key, innerConcreteMetaData, kind, typecode, slotType, threshold in plan.fields:
+        value = getattr(_object, key)
+        if typecode is not None and (typecode == 'B' or not ctx.keyValues) and _shouldPack(value, threshold, ctx, typecode):
+            # Special Case 'Image-like'-Data in ROS (very long numeric arrays, e.g. 'uint8[]' or 'float32[]')
+            # These are converted into Base64 (escaped)
+            tempDict[key] = ctx.make(PackedArray(value, typecode, innerConcreteMetaData or slotType))
+        elif kind is FIELD_ROS_UINT8:
+            # SPECIAL ROS CASE we have uint8[]-Array as a String or byte
+            # See: http://wiki.ros.org/msg#Fields -> Array-Handling
+            if isinstance(value, _BYTE_STRINGS) and _shouldPack(value, threshold, ctx):
+                # Looks like ROS converted it for us into str or bytes!
+                tempDict[key] = ctx.make(PackedArray(value, 'B', innerConcreteMetaData))
+            elif isinstance(value, _BYTE_STRINGS):
+                try:
+                    value = array.array("B", _asBuffer(value)).tolist()
+                except UnicodeEncodeError:
+                    value = _codePoints(value)
+                tempDict[key] = ctx.make(value, innerConcreteMetaData)
+            else:
+                tempDict[key] = ctx.make(value, innerConcreteMetaData)
+        else:
+            # Just get its child and convert it
+            tempDict[key] = ctx.make(value, innerConcreteMetaData)
+    return tempDict, plan.getType(_object), _pythonMetaData(ctx.ipmd, "class")
+
+
+def packArray(value, packedField, ctx):
+    """ Returns the PackedArray of a list or tuple of a field of a ROS-Message, if it is
+        packed (packedField is the entry of the field in ConversionPlan.packed), otherwise the value
+    """
+    typecode, dataType, threshold = packedField
+    if isinstance(value, (list, tuple)) and _shouldPack(value, threshold, ctx, typecode):
+        return PackedArray(value, typecode, dataType)
+    return value
+
+
+def _shouldPack(value, threshold, ctx, typecode='B'):
+    """ Decides with the threshold of the field if the Array is packed into Base64 """
+    if threshold is None:
+        return False
+    if threshold != "auto":
+        return len(value) >= threshold
+    # "auto": Compare the (estimated) length of the Base64 String with the length of the JSON-Array.
+    # About 1/32 of the Base64-characters ('+', '/') and the padding ('=') are escaped into three characters.
+    length = len(value)
+    elementLength = _ELEMENT_LENGTH[ctx.ipmd, ctx.compactArrays]
+    itemsize = _ITEMSIZES[typecode]
+    if itemsize > 1 and length > 0:
+        # The first element estimates the length of the (wider) numbers instead of '100'
+        elementLength += len(repr(value[0])) - 3
+    size = length * itemsize
+    packed = (size + 2) // 3 * 4 * 17 // 16 + (-size % 3) * 2 + _PACKED_OVERHEAD
+    return packed < length * elementLength + _ARRAY_OVERHEAD[ctx.compactArrays]
+
+
+class PackedArray(object):
+    """ Marks an Array which is converted into a Base64 String (escaped).
+        The dataType is added to the metadata, so that it can be converted back.
+        The elements are packed with the typecode (see ROS_TYPECODES) in the native
+        byte order, which is added to the metadata for elements wider than one byte.
+    """
+    __slots__ = ['data', 'typecode', 'dataType']
+
+    def __init__(self, data, typecode, dataType):
+        self.data = data
+        self.typecode = typecode
+        self.dataType = dataType
+
+
+def _fromPackedArray(_object, concreteDataType, ctx):
+    try:
+        value = packBase64(_object.data, _object.typecode)
+    except (OverflowError, TypeError):
+        # The values do not fit into the typecode (e.g. None or a too large integer)
+        return _fromList(list(_object.data), _object.dataType, ctx)
+    except UnicodeEncodeError:
+        # Text with characters beyond latin-1
+        return _fromList(_codePoints(_object.data), _object.dataType, ctx)
+    if _ITEMSIZES[_object.typecode] == 1:
+        return value, "base64", _pythonMetaData(True, None, _object.dataType)
+    return value, "base64", _byteOrderMetaData(_object.dataType)
+
+
+def _byteOrderMetaData(dataType):
+    # The shared metadata of a packed Array with elements wider than one byte
+    try:
+        return _BYTE_ORDER_METADATA[dataType]
+    except (KeyError, TypeError):
+        metadata = dict(_pythonMetaData(True, None, dataType))
+        metadata["byteOrder"] = _dataType(sys.byteorder)
+        try:
+            return _BYTE_ORDER_METADATA.setdefault(dataType, metadata)
+        except TypeError:
+            return metadata
+
+
+def _fromBuffer(_object, concreteDataType, ctx):
+    # bytes, bytearray, memoryview and byte-arrays are directly converted into Base64
+    typecode = _bufferTypecode(_object)
+    if typecode not in ('b', 'B'):
+        # An Array of other numbers, convert it like a list
+        return _fromList(_object.tolist(), concreteDataType, ctx)
+    if concreteDataType is None:
+        concreteDataType = "int8[]" if typecode == 'b' else "uint8[]"
+    return packBase64(_object, typecode), "base64", _pythonMetaData(ctx.ipmd, type(_object).__name__, concreteDataType)
+
+
+def _fromNdarray(_object, concreteDataType, ctx):
+    # The whole Array is packed into one Base64 String. dtype (containing the byte order)
+    # and shape are always added to the metadata, since they are needed to convert it back
+    if _object.dtype.hasobject:
+        # Arrays of Python-Objects cannot be packed, convert it like a list
+        return _fromList(_object.tolist(), concreteDataType, ctx)
+    metadata = dict(_pythonMetaData(ctx.ipmd, "ndarray", concreteDataType))
+    metadata["dtype"] = _dataType(_object.dtype.str)
+    metadata["shape"] = dict(type="array", value=list(_object.shape))
+    metadata["byteOrder"] = _dataType(_BYTE_ORDERS[_object.dtype.str[0]])
+    data = numpy.ascontiguousarray(_object).reshape(-1).view(numpy.uint8)
+    return packBase64(data, 'B'), "base64", metadata
+
+
+# Byte order of the dtype-strings in NumPy
+_BYTE_ORDERS = {'<': "little", '>': "big", '|': "none"}
+
+
+def _bufferTypecode(_object):
+    if isinstance(_object, array.array):
+        return _object.typecode
+    if isinstance(_object, memoryview) and _object.format == 'b':
+        return 'b'
+    return 'B'
+
+
+def _asBuffer(data):
+    """ Text (ROS-str in Python 2 or unicode) is converted into its bytes,
+        everything else is already a buffer
+    """
+    if not isinstance(data, bytes) and isinstance(data, _TEXT_TYPES):
+        return data.encode('latin-1')
+    return data
+
+
+def _codePoints(text):
+    """ The values of the characters, like the bytes of latin-1 (but also greater than 255) """
+    return [ord(character) for character in text]
+
+
+def packBase64(data, typecode):
+    """ Returns the escaped Base64 String of an Array. Objects providing the
+        buffer protocol (bytes, bytearray, memoryview, array) are encoded
+        directly, lists and tuples are packed into an array of typecode first.
+    """
+    if isinstance(data, (list, tuple)):
+        data = array.array(typecode, data)
+    else:
+        data = _asBuffer(data)
+    try:
+        encoded = base64.b64encode(data)
+    except (TypeError, ValueError, BufferError):
+        # E.g. a not contiguous memoryview
+        encoded = base64.b64encode(memoryview(data).tobytes())
+    if not isinstance(encoded, str):
+        encoded = encoded.decode('ascii')
+
+    # Escape Special Characters. Only '+', '/' and the padding '=' need to be escaped
+    # (the same as quote(encoded, safe=''))
+    padding = len(encoded) - len(encoded.rstrip('='))
+    if padding:
+        encoded = encoded[:-padding]
+    return encoded.replace('+', '%2B').replace('/', '%2F') + '%3D' * padding
+
+
+# Converters for each (primitive) type. Everything else is handled as a class
+_CONVERTERS = {
+    type(None): _fromNone,
+    bool: _fromBool,
+    int: _fromInt,
+    float: _fromFloat,
+    complex: _fromComplex,
+    str: _fromStr,
+    tuple: _fromTuple,
+    list: _fromList,
+    dict: _fromDict,
+    bytearray: _fromBuffer,
+    memoryview: _fromBuffer,
+    array.array: _fromBuffer,
+    PackedArray: _fromPackedArray,
+}
+if numpy is not None:
+    _CONVERTERS[numpy.ndarray] = _fromNdarray
+if PYTHON_VERSION < (3, 0):
+    # Check explicitly if Python 2 is used (bytes is str here)
+    _CONVERTERS[long] = _fromLong
+    _CONVERTERS[unicode] = _fromUnicode
+    _BYTE_STRINGS = (str, unicode, bytearray)
+    _TEXT_TYPES = (str, unicode)
+else:
+    _CONVERTERS[bytes] = _fromBuffer
+    _BYTE_STRINGS = (str, bytes, bytearray)
+    _TEXT_TYPES = (str,)
+
+# Size of the elements of the typecodes of packed Arrays
+_ITEMSIZES = dict((typecode, array.array(typecode).itemsize) for typecode in ROS_TYPECODES.values())
+
+# Names of the primitive types, whose Arrays can be compact (see _compactArray)
+_ELEMENT_TYPES = {bool: "bool", int: "int", float: "float", str: "str"}
+if PYTHON_VERSION < (3, 0):
+    _ELEMENT_TYPES.update({long: "long", unicode: "unicode"})
+
+# Converters of these types never create nested nodes. They are converted directly by 'make'
+_PRIMITIVES = set(_type for _type in _CONVERTERS if _CONVERTERS[_type] in (
+    _fromNone, _fromBool, _fromInt, _fromFloat, _fromLong, _fromStr, _fromUnicode, _fromPackedArray))
+
+# Length of the JSON-String of a packed and an unpacked Array without its values and of an
+# element (with the separator) in a JSON-Array (with and without python-metadata and as compact
+# Array). Used by "auto"-packing
+_PACKED_OVERHEAD = len(json.dumps(toPlain(PackedArray(b"", 'B', "uint8[]"), False)))
+_ELEMENT_LENGTH = dict(((ipmd, False), len(json.dumps(toPlain(100, ipmd))) + 2) for ipmd in (False, True))
+_ELEMENT_LENGTH.update(((ipmd, True), len(json.dumps(100)) + 2) for ipmd in (False, True))
+_ARRAY_OVERHEAD = dict((compactArrays, len(json.dumps(toPlain([100], False, compactArrays=compactArrays))) - _ELEMENT_LENGTH[False, compactArrays])
+                       for compactArrays in (False, True))
@@ -0,0 +1,111 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Strategies for the id of Entities, whose Object has no 'id' (see obj2Fiware(..., idGenerator=...)).
+    A strategy is called with the Object and the Entity-type and returns the id.
+"""
+
+import itertools
+import uuid
+import weakref
+
+
+class UuidIds(object):
+    """ The default: Entity-type + uuid4(), a new Entity for every conversion """
+
+    def __call__(self, _object, entityType):
+        return entityType + str(uuid.uuid4())
+
+
+class IdRegistry(object):
+    """ Gives every live Object the same id in all conversions. The id is created by
+        'generate' (default UuidIds) on the first conversion and forgotten as soon as
+        the Object is garbage collected (the Objects are only weakly referenced).
+        Objects, which cannot be weakly referenced (e.g. __slots__ without __weakref__),
+        get a new id from 'generate' on every conversion.
+    """
+
+    def __init__(self, generate=None):
+        self.generate = UuidIds() if generate is None else generate
+        # id(Object) -> (weak reference, Entity-id)
+        self._ids = {}
+
+    def __call__(self, _object, entityType):
+        key = id(_object)
+        entry = self._ids.get(key)
+        if entry is not None and entry[0]() is _object:
+            return entry[1]
+        entityId = self.generate(_object, entityType)
+        try:
+            ref = weakref.ref(_object, self._remove(key))
+        except TypeError:
+            return entityId
+        self._ids[key] = (ref, entityId)
+        return entityId
+
+    def _remove(self, key):
+        # Callback of the weak reference, a newer Object with the same id() is kept
+        def remove(ref):
+            entry = self._ids.get(key)
+            if entry is not None and entry[0] is ref:
+                del self._ids[key]
+        return remove
+
+    def forget(self, _object):
+        """ The next conversion of the Object gets a new id """
+        entry = self._ids.get(id(_object))
+        if entry is not None and entry[0]() is _object:
+            del self._ids[id(_object)]
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class KeyFieldIds(object):
+    """ Deterministic ids from the values of key fields: Entity-type and the values joined
+        with the separator, e.g. KeyFieldIds(["line", "station"]) -> 'Robot:3:7'. 'fields' is a
+        list of Attribute-names or a dict Entity-type -> list. The Objects of other types get
+        their id from 'fallback' (default UuidIds).
+    """
+
+    def __init__(self, fields, separator=":", fallback=None):
+        self.fields = fields
+        self.separator = separator
+        self.fallback = UuidIds() if fallback is None else fallback
+
+    def __call__(self, _object, entityType):
+        fields = self.fields.get(entityType) if isinstance(self.fields, dict) else self.fields
+        if fields is None:
+            return self.fallback(_object, entityType)
+        values = [entityType]
+        for field in fields:
+            try:
+                value = _object[field] if isinstance(_object, dict) else getattr(_object, field)
+            except (KeyError, AttributeError):
+                raise ValueError("The key field '{}' of the id is missing in {}".format(field, entityType))
+            values.append(str(value))
+        return self.separator.join(values)
+
+
+class CounterIds(object):
+    """ Fast ids for bulk inserts: Entity-type + prefix + running number. The default
+        prefix is random per generator, so that the ids of different runs do not collide.
+    """
+
+    def __init__(self, prefix=None, start=1):
+        self.prefix = uuid.uuid4().hex[:12] + "-" if prefix is None else prefix
+        self._counter = itertools.count(start)
+
+    def __call__(self, _object, entityType):
+        return entityType + self.prefix + str(next(self._counter))
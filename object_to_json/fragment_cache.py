@@ -0,0 +1,111 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from collections import OrderedDict
+
+from object_to_json.conversion_plan import freeze
+
+# Objects with this attribute are cached by their identity and the value of it.
+# Increment it, whenever the Object (or one of its children) is changed.
+VERSION_ATTRIBUTE = "_fragmentVersion"
+
+# Primitive types and their fingerprint (the type is part of it, since 1 == 1.0 == True)
+_PRIMITIVES = set([type(None), bool, int, float, complex, str])
+try:
+    # Python 2
+    _PRIMITIVES.update([long, unicode])
+except NameError:
+    _PRIMITIVES.add(bytes)
+_UNCACHED = set([list, dict, bytearray, memoryview])
+
+
+class FragmentCache(object):
+    """ A bounded (LRU) cache of converted sub-objects (nodes), which is used by
+        obj2Fiware(..., fragmentCache=cache). A cached node is inserted again
+        instead of converting the sub-object once more. Only sub-objects with a
+        fingerprint are cached:
+            - immutable tuples (and bytes) by their content (at least minSize elements)
+            - objects with the attribute VERSION_ATTRIBUTE by their identity and version
+            - or whatever the function 'fingerprint' returns (None for not cacheable)
+        Mutable objects (lists, dicts, ...) without a version are never cached.
+        The cached nodes are shared and must not be modified.
+    """
+
+    def __init__(self, maxSize=128, minSize=8, fingerprint=None):
+        self.maxSize = maxSize
+        self.minSize = minSize
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def key(self, _object, concreteDataType, baseEntity, ctx):
+        """ Returns the key of the node of the Object or None if it cannot be cached """
+        objectType = type(_object)
+        if objectType in _PRIMITIVES or objectType in _UNCACHED:
+            return None
+        try:
+            if self.fingerprint is not None:
+                fingerprint = self.fingerprint(_object)
+            elif objectType is tuple:
+                fingerprint = _content(_object) if len(_object) >= self.minSize else None
+            else:
+                version = getattr(_object, VERSION_ATTRIBUTE, None)
+                fingerprint = None if version is None else (id(_object), version)
+            if fingerprint is None:
+                return None
+            # The options of the conversion change the node, too
+            return (fingerprint, freeze(concreteDataType), baseEntity,
+                    ctx.ipmd, ctx.encode, ctx.packing, ctx.plain, ctx.compactArrays, ctx.keyValues)
+        except TypeError:
+            # Not hashable
+            return None
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Mark as recently used
+        del self._entries[key]
+        self._entries[key] = entry
+        return entry[1]
+
+    def put(self, key, _object, node):
+        # The Object is kept as well, so that its id cannot be reused
+        self._entries[key] = (_object, node)
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _content(_object):
+    """ The fingerprint of an immutable (nested) tuple of primitives """
+    objectType = type(_object)
+    if objectType is tuple:
+        return (tuple, tuple(_content(item) for item in _object))
+    if objectType is float or objectType is complex:
+        # 0.0 == -0.0, but NaN != NaN: the exact text tells them apart
+        return (objectType, repr(_object))
+    if objectType in _PRIMITIVES:
+        return (objectType, _object)
+    raise TypeError("Not an immutable primitive")
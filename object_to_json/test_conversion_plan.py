@@ -0,0 +1,120 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import array
+import unittest
+
+from object_to_json.conversion_plan import ConversionPlan, FIELD_PLAIN, FIELD_ROS_UINT8, ROS_TYPECODES
+from object_to_json.entity_attribute import EntityAttribute as EA, ConversionContext, PackingPolicy
+
+
+class TestConversionPlan(unittest.TestCase):
+
+    def setUp(self):
+        ConversionPlan.clear()
+
+    def test_PlanIsCachedPerClass(self):
+        plan = ConversionPlan.get(ClassInt(), None, ConversionContext(False, False))
+        self.assertTrue(plan is ConversionPlan.get(ClassInt(), None, ConversionContext(False, False)))
+        self.assertEqual(plan.type, "ClassInt")
+        self.assertEqual(plan.fields, (("int", None, FIELD_PLAIN, None, None, None),))
+
+    def test_PlanDependsOnFlagsAndDataTypeDict(self):
+        plan = ConversionPlan.get(ClassInt(), None, ConversionContext(False, False))
+        self.assertFalse(plan is ConversionPlan.get(ClassInt(), None, ConversionContext(True, False)))
+        self.assertFalse(plan is ConversionPlan.get(ClassInt(), None, ConversionContext(False, True)))
+        withDataType = ConversionPlan.get(ClassInt(), dict(int="uint32_t"), ConversionContext(False, False))
+        self.assertFalse(plan is withDataType)
+        self.assertEqual(withDataType.fields, (("int", "uint32_t", FIELD_PLAIN, None, None, None),))
+        self.assertTrue(withDataType is ConversionPlan.get(ClassInt(), dict(int="uint32_t"), ConversionContext(False, False)))
+
+    def test_PlanForUnseenShape(self):
+        plan = ConversionPlan.get(ClassInt(), None, ConversionContext(False, False))
+        other = ClassInt()
+        other.additional = "value"
+        otherPlan = ConversionPlan.get(other, None, ConversionContext(False, False))
+        self.assertFalse(plan is otherPlan)
+        self.assertEqual(otherPlan.keys, ("int", "additional"))
+        self.assertEqual(set(EA(other, False).value.keys()), set(["int", "additional"]))
+
+    def test_PlanWithUnhashableDataTypeDict(self):
+        ea = EA(ClassInt(), False, concreteDataType=dict(int=set(["uint32_t"])))
+        self.assertEqual(ea.value['int'].value, 1)
+        self.assertEqual(ConversionPlan.cache, {})
+
+    def test_PlanRosClass(self):
+        plan = ConversionPlan.get(RosClassWithSlots(), dict(data="uint8[]"), ConversionContext(False, True))
+        self.assertEqual(plan.fields, (
+            ("val1", None, FIELD_PLAIN, None, "uint8", 256),
+            ("data", "uint8[]", FIELD_ROS_UINT8, "B", "uint8[]", 256),
+            ("signed", None, FIELD_PLAIN, "b", "int8[]", 256)))
+        self.assertEqual(plan.getType(RosClassWithSlots()), "RosClass%2FData")
+        # The type of a single Message does not change the shared plan
+        other = RosClassWithSlots()
+        other._type = "Other/Data"
+        self.assertEqual(plan.getType(other), "Other%2FData")
+        self.assertEqual(plan.type, None)
+        self.assertEqual(plan.getType(RosClassWithSlots()), "RosClass%2FData")
+
+    def test_PlanRosClass_NumericArrays(self):
+        plan = ConversionPlan.get(RosScan(), None, ConversionContext(False))
+        self.assertEqual([field[3] for field in plan.fields], [None, 'f', ROS_TYPECODES["uint16"], 'd', None])
+        self.assertEqual(plan.packed, {"ranges": ('f', "float32[]", 256), "depth": (ROS_TYPECODES["uint16"], "uint16[]", 256),
+                                       "covariance": ('d', "float64[36]", 256)})
+        for rosType, itemsize in (("int16", 2), ("uint32", 4), ("int64", 8), ("float32", 4)):
+            self.assertEqual(array.array(ROS_TYPECODES[rosType]).itemsize, itemsize)
+
+    def test_PlanDependsOnPacking(self):
+        plan = ConversionPlan.get(RosClassWithSlots(), None, ConversionContext(False, packing=4))
+        self.assertTrue(plan is ConversionPlan.get(RosClassWithSlots(), None, ConversionContext(False, packing=PackingPolicy(4))))
+        other = ConversionPlan.get(RosClassWithSlots(), None, ConversionContext(False, packing=PackingPolicy(4, fields=dict(data=None))))
+        self.assertFalse(plan is other)
+        self.assertEqual([field[5] for field in other.fields], [4, None, 4])
+
+    def test_PlanGivesSameResultOnEveryCall(self):
+        first = EA(RosClassWithSlots(), False)
+        second = EA(RosClassWithSlots(), False)
+        self.assertEqual(first.type, second.type)
+        self.assertEqual(first.metadata, second.metadata)
+        self.assertEqual(sorted(first.value.keys()), sorted(second.value.keys()))
+        self.assertEqual([item.value for item in first.value['data'].value], [1, 2, 3])
+
+
+class ClassInt(object):
+    def __init__(self):
+        self.int = 1
+
+
+class RosClassWithSlots(object):
+    __slots__ = ['val1', 'data', 'signed', '_type']
+    _slot_types = ['uint8', 'uint8[]', 'int8[]', 'string']
+
+    def __init__(self):
+        self.val1 = 1
+        self.data = [1, 2, 3]
+        self.signed = [-1, 2]
+        self._type = "RosClass/Data"
+
+
+class RosScan(object):
+    __slots__ = ['seq', 'ranges', 'depth', 'covariance', 'names', '_type']
+    _slot_types = ['uint32', 'float32[]', 'uint16[]', 'float64[36]', 'string[]', 'string']
+
+    def __init__(self):
+        self.seq = 1
+        self.ranges = [0.5, 1.5]
+        self.depth = [1, 2]
+        self.covariance = [0.0] * 36
+        self.names = ["a"]
+        self._type = "sensor_msgs/Scan"
@@ -51,6 +51,14 @@ class Test_JsonConverter(unittest.TestCase):
         self.assertFalse(hasattr(en, "type"))
         self.assertEqual(en.__dict__['value'].value, 1)
 
+    def test_Entitiy_setObejct_Plain_MetaDataCanBeModified(self):
+        en = Entity()
+        en.setObject(TestClass(), {}, False, plain=True)
+        en.value['metadata']['unit'] = dict(type="Text", value="m")
+        en.value['metadata']['python']['value'] = "x"
+        en.setObject(TestClass(), {}, False, plain=True)
+        self.assertEqual(en.value['metadata'], dict(python=dict(type="dataType", value="int")))
+
 
 class TestClass(object):
     def __init__(self):
@@ -13,10 +13,22 @@
 #    limitations under the License.
 
 import unittest
+import array
+import base64
 import json
 import sys
 
-from object_to_json.entity_attribute import EntityAttribute as EA
+try:
+    import urllib.parse as quote
+except ImportError:
+    import urllib as quote
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from object_to_json.entity_attribute import EntityAttribute as EA, toPlain, toKeyValue, packBase64, PackingPolicy, ConversionContext, THRESH
 from object_to_json.entity import Entity
 
 
@@ -159,6 +171,248 @@ class TestEntityAttribute(unittest.TestCase):
         self.assertEqual(ea.type, "RosClass%2FInteger")  # FOC should encode it
         self.assertTrue(ea.value != None)
 
+    def test_PlainEqualsEntityAttribute(self):
+        for ipmd in (False, True):
+            for encode in (False, True):
+                obj = ComplexExample()
+                plain = toPlain(obj, ipmd, encode=encode)
+                tree = EA(obj, ipmd, encode=encode)
+                self.assertEqual(json.dumps(plain), ComplexExample.ToJSON(tree, None))
+
+    def test_PlainIsJsonReady(self):
+        plain = toPlain(RosClassWithSlotsInt(), False, dict(val1="uint8"), baseEntity=True)
+        self.assertEqual(plain, dict(
+            value=dict(val1=dict(value=1, type="number", metadata=dict(
+                python=dict(type="dataType", value="int")))),
+            type="RosClass/Integer",
+            metadata=dict(
+                dataType=dict(type="dataType", value=dict(val1="uint8")),
+                python=dict(type="dataType", value="class"))))
+
+    def test_packBase64IsEscaped(self):
+        for data in (b"", b"a", b"ab", b"abc", bytearray(range(256)) * 3, b"\xfb\xff\xfe" * 100):
+            self.assertEqual(packBase64(data, 'B'), quote.quote(base64.b64encode(bytes(data)), safe=''))
+
+    def test_packBase64Buffers(self):
+        data = bytearray(range(256))
+        expected = packBase64(bytes(data), 'B')
+        self.assertEqual(packBase64(memoryview(data), 'B'), expected)
+        self.assertEqual(packBase64(array.array('B', data), 'B'), expected)
+        self.assertEqual(packBase64(list(data), 'B'), expected)
+        if sys.version_info >= (3,):
+            # Python 2 cannot slice memoryviews with a step
+            self.assertEqual(packBase64(memoryview(data)[::2], 'B'), packBase64(bytes(data[::2]), 'B'))
+        self.assertEqual(packBase64([-1, 0, 1], 'b'), packBase64(b"\xff\x00\x01", 'B'))
+
+    def test_EntityAttributeBytes(self):
+        ea = EA(bytearray(b"abc"), False)
+        self.assertEqual(ea.type, "base64")
+        self.assertEqual(ea.value, "YWJj")
+        self.assertEqual(ea.metadata, dict(
+            python=dict(type="dataType", value="bytearray"),
+            dataType=dict(type="dataType", value="uint8[]")))
+
+        ea = EA(array.array('b', [-1, 2]), True)
+        self.assertEqual(ea.value, packBase64([-1, 2], 'b'))
+        self.assertEqual(ea.metadata, dict(dataType=dict(type="dataType", value="int8[]")))
+
+    def test_EntityAttributeRosImage(self):
+        image = RosImage(bytes(bytearray(range(256))) * 3600)
+        ea = EA(image, False)
+        self.assertEqual(ea.value['data'].type, "base64")
+        self.assertEqual(ea.value['data'].value, quote.quote(base64.b64encode(image.data), safe=''))
+        self.assertEqual(ea.value['data'].metadata, dict(dataType=dict(type="dataType", value="uint8[]")))
+
+        # Lists are packed too
+        image = RosImage(list(range(128)) * 2)
+        self.assertEqual(EA(image, False).value['data'].value, packBase64(bytearray(range(128)) * 2, 'B'))
+
+        # Text beyond latin-1 is kept as its code points
+        for length in (3, 300):
+            ea = EA(RosImage(u"a\u20ac\u00ff" * length), False, dict(data="uint8[]"))
+            self.assertEqual(ea.value['data'].type, "array")
+            self.assertEqual([item.value for item in ea.value['data'].value], [97, 8364, 255] * length)
+
+        # Short Arrays are kept
+        image = RosImage([1, 2])
+        self.assertEqual(EA(image, False).value['data'].type, "array")
+
+    def test_EntityAttributeRosUint8AsBytes(self):
+        data = b"\x01" * THRESH
+        ea = EA(RosImage(data), False, concreteDataType=dict(data="uint8[]"))
+        self.assertEqual(ea.value['data'].type, "base64")
+        self.assertEqual(ea.value['data'].value, packBase64(data, 'B'))
+        ea = EA(RosImage(b"\x01\x02"), False, concreteDataType=dict(data="uint8[]"))
+        self.assertEqual([item.value for item in ea.value['data'].value], [1, 2])
+
+    def test_PackingPolicyThreshold(self):
+        policy = PackingPolicy(10, types={"int8[]": "auto"}, fields={"data": None, "sensor_msgs/Image.data": 0})
+        self.assertEqual(policy.threshold("sensor_msgs/Image", "data", "uint8[]"), 0)
+        self.assertEqual(policy.threshold("sensor_msgs/CompressedImage", "data", "uint8[]"), None)
+        self.assertEqual(policy.threshold("sensor_msgs/Image", "other", "int8[4]"), "auto")
+        self.assertEqual(policy.threshold("sensor_msgs/Image", "other", "uint8[]"), 10)
+        self.assertEqual(PackingPolicy.of(None).default, THRESH)
+        self.assertEqual(PackingPolicy.of("auto"), PackingPolicy("auto"))
+        self.assertRaises(ValueError, PackingPolicy, "always")
+        self.assertRaises(ValueError, PackingPolicy, 1, fields=dict(data=1.5))
+
+    def test_EntityAttributeRosImage_Packing(self):
+        image = RosImage([1, 2])
+        self.assertEqual(EA(image, False, packing=2).value['data'].type, "base64")
+        self.assertEqual(EA(image, False, packing=3).value['data'].type, "array")
+        self.assertEqual(EA(RosImage([1] * THRESH), False, packing=None).value['data'].type, "base64")
+        self.assertEqual(EA(RosImage([1] * THRESH), False, packing=PackingPolicy(None)).value['data'].type, "array")
+        self.assertEqual(EA(image, True, packing=PackingPolicy(None, types={"uint8[]": 0})).value['data'].type, "base64")
+        self.assertEqual(EA(image, True, packing=PackingPolicy(None, fields={"sensor_msgs/Image.data": 0})).value['data'].type, "base64")
+        self.assertEqual(EA(image, True, packing=PackingPolicy(0, fields={"data": None})).value['data'].type, "array")
+
+    def test_EntityAttributeRosImage_AutoPacking(self):
+        for ipmd in (False, True):
+            for length in range(0, 10):
+                packed = json.dumps(toPlain(RosImage([100] * length), ipmd, packing=0)["value"]["data"])
+                unpacked = json.dumps(toPlain(RosImage([100] * length), ipmd, packing=None)["value"]["data"])
+                auto = json.dumps(toPlain(RosImage([100] * length), ipmd, packing="auto")["value"]["data"])
+                self.assertEqual(auto, min(packed, unpacked, key=len))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_EntityAttributeRosNumericArrays(self):
+        plain = toPlain(RosScan(), False, packing=0)
+        ranges = plain["value"]["ranges"]
+        self.assertEqual(ranges["type"], "base64")
+        self.assertEqual(ranges["value"], packBase64(array.array('f', [0.5, 1.5, -2.0]), 'B'))
+        self.assertEqual(ranges["metadata"], dict(dataType=dict(type="dataType", value="float32[]"),
+                                                  byteOrder=dict(type="dataType", value=sys.byteorder)))
+        self.assertEqual(plain["value"]["depth"]["metadata"]["dataType"]["value"], "uint16[]")
+        # Not representable as uint16, converted like a list
+        scan = RosScan()
+        scan.depth = [-1, 70000]
+        self.assertEqual(toPlain(scan, False, packing=0)["value"]["depth"]["type"], "array")
+        # The default threshold is the same for all types
+        self.assertEqual(toPlain(RosScan(), False)["value"]["ranges"]["type"], "array")
+
+    def test_EntityAttributeRosNumericArrays_Auto(self):
+        scan = RosScan()
+        scan.ranges = [0.1 * i for i in range(100)]
+        scan.depth = [1] * 100
+        plain = toPlain(scan, False, packing="auto")
+        self.assertEqual(plain["value"]["ranges"]["type"], "base64")
+        self.assertEqual(plain["value"]["depth"]["type"], "base64")
+        scan.depth = [1, 2]
+        self.assertEqual(toPlain(scan, True, packing="auto", compactArrays=True)["value"]["depth"]["type"], "array")
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_EntityAttributeNdarray(self):
+        ea = EA(numpy.arange(6, dtype='<f4').reshape(2, 3), False)
+        self.assertEqual(ea.type, "base64")
+        self.assertEqual(ea.value, packBase64(numpy.arange(6, dtype='<f4').tobytes(), 'B'))
+        self.assertEqual(ea.metadata, dict(
+            python=dict(type="dataType", value="ndarray"),
+            dtype=dict(type="dataType", value="<f4"),
+            shape=dict(type="array", value=[2, 3]),
+            byteOrder=dict(type="dataType", value="little")))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_EntityAttributeNdarray_NotContiguous(self):
+        data = numpy.arange(12, dtype='>i2').reshape(3, 4)[:, ::2]
+        ea = EA(data, True)
+        self.assertEqual(ea.value, packBase64(data.copy().tobytes(), 'B'))
+        self.assertEqual(ea.metadata['shape']['value'], [3, 2])
+        self.assertEqual(ea.metadata['byteOrder']['value'], "big")
+        self.assertFalse('python' in ea.metadata)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_EntityAttributeNdarray_Objects(self):
+        ea = EA(numpy.array([1, "a"], dtype=object), True)
+        self.assertEqual(ea.type, "array")
+        self.assertEqual([item.value for item in ea.value], [1, "a"])
+
+    def test_EntityAttributeSlots(self):
+        ea = EA([1, 2], False)
+        self.assertFalse(hasattr(ea.value[0], 'x'))
+        self.assertRaises(AttributeError, setattr, ea.value[0], 'x', 1)
+        self.assertEqual(sorted(ea.__dict__), ["type", "value"])
+        self.assertEqual(sorted(ea.value[0].__dict__), ["metadata", "type", "value"])
+
+    def test_EntityAttributeSharedMetaData(self):
+        # Only a ConversionContext with sharedMetaData shares the metadata
+        first, second = ConversionContext(False, plain=True, sharedMetaData=True).node([1, 2])["value"]
+        self.assertTrue(first["metadata"] is second["metadata"])
+
+        ea = EA([1, 2], False)
+        first, second = ea.value
+        self.assertFalse(first.metadata is second.metadata)
+        # Modifying the metadata of one node does not change the other
+        first.setConcreteMetaData("int32")
+        first.metadata["python"]["value"] = "x"
+        self.assertEqual(first.metadata["dataType"], dict(type="dataType", value="int32"))
+        self.assertFalse("dataType" in second.metadata)
+        self.assertFalse("dataType" in EA(3, False).metadata)
+        self.assertEqual(EA(3, False).metadata["python"]["value"], "int")
+
+        plain = toPlain((1.5, [2.5]), False)
+        plain["metadata"]["unit"] = dict(type="Text", value="m")
+        plain["value"][1]["value"][0]["metadata"]["python"]["value"] = "x"
+        self.assertEqual(toPlain((1.5, [2.5]), False), dict(value=[toPlain(1.5, False), toPlain([2.5], False)], type="array",
+                                                            metadata=dict(python=dict(type="dataType", value="tuple"))))
+        self.assertEqual(toPlain(2.5, False)["metadata"]["python"]["value"], "float")
+
+    def test_EntityAttributeCompactArrays(self):
+        plain = toPlain((1.5, 2.0), False, compactArrays=True)
+        self.assertEqual(plain, dict(value=[1.5, 2.0], type="array", metadata=dict(
+            python=dict(type="dataType", value="tuple"), elementType=dict(type="dataType", value="float"))))
+        plain = toPlain(["a/b", "c"], True, "string[]", encode=True, compactArrays=True)
+        self.assertEqual(plain, dict(value=["a%2Fb", "c"], type="array", metadata=dict(
+            dataType=dict(type="dataType", value="string[]"), elementType=dict(type="dataType", value="str"))))
+        ea = EA([True, False], True, compactArrays=True)
+        self.assertEqual((ea.value, ea.metadata["elementType"]["value"]), ([True, False], "bool"))
+        self.assertEqual(toKeyValue(toPlain([[1, 2]], False, compactArrays=True)), [[1, 2]])
+
+    def test_EntityAttributeCompactArrays_NotHomogeneous(self):
+        for value in ([1, 2.0], [True, 1], [], [None], [1j]):
+            self.assertEqual(toPlain(value, False, compactArrays=True), toPlain(value, False))
+
+    def test_ToKeyValue(self):
+        obj = ComplexExample()
+        self.assertEqual(toKeyValue(toPlain((1, [2.5, None], dict(b="x", a=True)), False)), [1, [2.5, None], dict(b="x", a=True)])
+        # The order of the keys is kept
+        value = dict(b=1, a=2)
+        self.assertEqual(list(toKeyValue(toPlain(value, False))), list(value))
+        self.assertEqual(toKeyValue(toPlain(RosImage([100] * 300), False, packing=0))["data"], packBase64([100] * 300, 'B'))
+        self.assertEqual(toKeyValue(toPlain(obj, True)), json.loads(json.dumps(toKeyValue(toPlain(obj, False)))))
+
+    def test_EntityAttributeDeep(self):
+        # Deeper than the recursion limit
+        depth = sys.getrecursionlimit() * 10
+        nested = deepList = []
+        for _ in range(depth):
+            nested.append([])
+            nested = nested[0]
+        plain = toPlain(Node(depth), False)
+        for _ in range(depth):
+            self.assertEqual(plain["type"], "Node")
+            self.assertEqual(sorted(plain["value"]), ["next", "value"])
+            plain = plain["value"]["next"]
+        self.assertEqual(plain, dict(type="", value=None))
+
+        ea = EA(deepList, False)
+        for _ in range(depth):
+            self.assertEqual(ea.type, "array")
+            ea = ea.value[0]
+        self.assertEqual((ea.type, ea.value), ("array", []))
+
+
+class Node(object):
+    """ The first Node of a linked list with 'length' Nodes """
+
+    def __init__(self, length):
+        self.value = length
+        self.next = None
+        node = self
+        for value in range(length - 1, 0, -1):
+            node.next = Node(0)
+            node = node.next
+            node.value = value
+
 
 class ComplexExample(object):
     def __init__(self):
@@ -208,3 +462,23 @@ class RosClassWithSlotsInt(object):
     def __init__(self):
         self.val1 = 1
         self._type = "RosClass/Integer"  # Example-Type
+
+
+class RosImage(object):
+    __slots__ = ['height', 'data', '_type']
+    _slot_types = ['uint32', 'uint8[]', 'string']
+
+    def __init__(self, data):
+        self.height = 1
+        self.data = data
+        self._type = "sensor_msgs/Image"
+
+
+class RosScan(object):
+    __slots__ = ['ranges', 'depth', '_type']
+    _slot_types = ['float32[]', 'uint16[]', 'string']
+
+    def __init__(self):
+        self.ranges = [0.5, 1.5, -2.0]
+        self.depth = [1, 65535]
+        self._type = "sensor_msgs/Scan"
@@ -0,0 +1,96 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import gc
+import json
+import unittest
+
+from object_fiware_converter import ObjectFiwareConverter
+from object_to_json.entity_id import UuidIds, IdRegistry, KeyFieldIds, CounterIds
+
+
+class TestEntityId(unittest.TestCase):
+
+    def test_UuidIds(self):
+        generate = UuidIds()
+        first = generate(Robot(), "Robot")
+        self.assertEqual(first[:5], "Robot")
+        self.assertEqual(len(first), 5 + 36)
+        self.assertNotEqual(first, generate(Robot(), "Robot"))
+
+    def test_IdRegistry(self):
+        registry = IdRegistry()
+        robot = Robot()
+        first = json.loads(ObjectFiwareConverter.obj2Fiware(robot, idGenerator=registry))["id"]
+        robot.speed = 2.0
+        self.assertEqual(json.loads(ObjectFiwareConverter.obj2Fiware(robot, idGenerator=registry))["id"], first)
+        self.assertNotEqual(registry(Robot(), "Robot"), first)
+
+        registry.forget(robot)
+        self.assertNotEqual(registry(robot, "Robot"), first)
+
+    def test_IdRegistry_Weak(self):
+        registry = IdRegistry(CounterIds(prefix=""))
+        robot = Robot()
+        self.assertEqual(registry(robot, "Robot"), "Robot1")
+        self.assertEqual(len(registry), 1)
+        del robot
+        gc.collect()
+        self.assertEqual(len(registry), 0)
+        # Not weakly referenceable
+        self.assertEqual(registry(SlotRobot(), "SlotRobot"), "SlotRobot2")
+        self.assertEqual(len(registry), 0)
+
+    def test_KeyFieldIds(self):
+        generate = KeyFieldIds(["line", "station"])
+        self.assertEqual(generate(Robot(), "Robot"), "Robot:3:7")
+        self.assertEqual(generate(dict(line=1, station="a"), "dict"), "dict:1:a")
+        self.assertRaises(ValueError, generate, SlotRobot(), "SlotRobot")
+
+        generate = KeyFieldIds(dict(Robot=["line"]), separator="-", fallback=CounterIds(prefix="_"))
+        self.assertEqual(generate(Robot(), "Robot"), "Robot-3")
+        self.assertEqual(generate(SlotRobot(), "SlotRobot"), "SlotRobot_1")
+        body = json.loads(ObjectFiwareConverter.obj2FiwareBatch([Robot(), Robot()], idGenerator=generate))
+        self.assertEqual([entity["id"] for entity in body["entities"]], ["Robot-3", "Robot-3"])
+
+    def test_CounterIds(self):
+        generate = CounterIds()
+        ids = [generate(Robot(), "Robot") for _ in range(3)]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertTrue(ids[2].startswith("Robot" + generate.prefix))
+        self.assertNotEqual(generate.prefix, CounterIds().prefix)
+        chunks = ObjectFiwareConverter.obj2FiwareStream([Robot(), Robot()], ndjson=True, idGenerator=CounterIds("/", start=10))
+        self.assertEqual([json.loads(chunk)["id"] for chunk in chunks], ["Robot/10", "Robot/11"])
+
+    def test_GivenIdIsKept(self):
+        calls = []
+        robot = Robot()
+        robot.id = "Robot42"
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(robot, idGenerator=lambda *args: calls.append(args)))
+        self.assertEqual(entity["id"], "Robot42")
+        self.assertEqual(calls, [])
+
+
+class Robot(object):
+    def __init__(self):
+        self.line = 3
+        self.station = 7
+        self.speed = 1.5
+
+
+class SlotRobot(object):
+    __slots__ = ['speed']
+
+    def __init__(self):
+        self.speed = 1.5
@@ -0,0 +1,132 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import unittest
+
+from object_fiware_converter import ObjectFiwareConverter
+from object_to_json.entity_attribute import ConversionContext
+from object_to_json.fragment_cache import FragmentCache
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def test_VersionedObjectIsCached(self):
+        cache = FragmentCache()
+        ctx = ConversionContext(False, plain=True, cache=cache)
+        calibration = Calibration()
+        first = ctx.node(Robot(calibration))
+        second = ctx.node(Robot(calibration))
+        self.assertTrue(first["value"]["calibration"] is second["value"]["calibration"])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        calibration.matrix = [2.0]
+        calibration._fragmentVersion += 1
+        third = ctx.node(Robot(calibration))
+        self.assertEqual(third["value"]["calibration"]["value"]["matrix"]["value"][0]["value"], 2.0)
+
+    def test_TupleIsCachedByContent(self):
+        cache = FragmentCache(minSize=2)
+        ctx = ConversionContext(False, plain=True, cache=cache)
+        ints = ctx.node((1, 2))
+        self.assertTrue(ints is ctx.node((1, 2)))
+        floats = ctx.node((1.0, 2.0))
+        self.assertFalse(ints is floats)
+        self.assertEqual(floats["value"][0]["metadata"]["python"]["value"], "float")
+        self.assertFalse(ctx.node((1, (2, 3))) is ctx.node((1, (2.0, 3))))
+
+    def test_SignedZeroAndNaN(self):
+        cache = FragmentCache(minSize=2)
+        ctx = ConversionContext(False, plain=True, cache=cache)
+        self.assertEqual(repr(ctx.node((0.0, 1.0))["value"][0]["value"]), "0.0")
+        self.assertEqual(repr(ctx.node((-0.0, 1.0))["value"][0]["value"]), "-0.0")
+        ctx.node((complex(0.0, 0.0), 1.0))
+        self.assertEqual(repr([item["value"] for item in ctx.node((complex(0.0, -0.0), 1.0))["value"][0]["value"]]), "[0.0, -0.0]")
+        nan = ctx.node((float("nan"), 1.0))
+        self.assertTrue(nan is ctx.node((float("nan"), 1.0)))
+        self.assertEqual(len(cache), 5)
+
+    def test_MutableObjectsAreNotCached(self):
+        cache = FragmentCache(minSize=0)
+        ctx = ConversionContext(False, plain=True, cache=cache)
+        ctx.node([1, 2])
+        ctx.node(dict(a=1))
+        ctx.node(Unversioned())
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.key((1, [2]), None, False, ctx), None)
+
+    def test_OptionsArePartOfTheKey(self):
+        cache = FragmentCache(minSize=2)
+        plain = ConversionContext(False, plain=True, cache=cache).node((1, 2))
+        withoutMetaData = ConversionContext(True, plain=True, cache=cache).node((1, 2))
+        self.assertFalse(plain is withoutMetaData)
+        self.assertFalse("metadata" in withoutMetaData)
+
+    def test_LRU(self):
+        cache = FragmentCache(maxSize=2, minSize=1)
+        ctx = ConversionContext(False, plain=True, cache=cache)
+        first = ctx.node((1,))
+        ctx.node((2,))
+        ctx.node((1,))
+        ctx.node((3,))
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(first is ctx.node((1,)))
+        self.assertEqual(cache.misses, 3)
+
+    def test_Fingerprint(self):
+        cache = FragmentCache(fingerprint=lambda obj: getattr(obj, "name", None))
+        ctx = ConversionContext(False, plain=True, cache=cache)
+        calibration = Calibration()
+        self.assertTrue(ctx.node(calibration) is ctx.node(calibration))
+
+    def test_FailedConversionIsNotCached(self):
+        cache = FragmentCache()
+        calibration = Calibration()
+        calibration.broken = set([1])
+        holder = Unversioned()
+        holder.id = "Holder1"
+        holder.robot = Robot(calibration)
+        for _ in range(2):
+            self.assertRaises(ValueError, ObjectFiwareConverter.obj2Fiware, holder, fragmentCache=cache)
+        self.assertEqual(len(cache), 0)
+
+        del calibration.broken
+        self.assertEqual(ObjectFiwareConverter.obj2Fiware(holder, fragmentCache=cache), ObjectFiwareConverter.obj2Fiware(holder))
+        self.assertEqual(len(cache), 1)
+
+    def test_SameJsonAsWithoutCache(self):
+        cache = FragmentCache(minSize=1)
+        robot = Robot(Calibration())
+        expected = ObjectFiwareConverter.obj2Fiware(robot, ind=2, encode=True)
+        for _ in range(3):
+            self.assertEqual(ObjectFiwareConverter.obj2Fiware(robot, ind=2, encode=True, fragmentCache=cache), expected)
+        self.assertTrue(cache.hits >= 2)
+
+
+class Calibration(object):
+    def __init__(self):
+        self._fragmentVersion = 0
+        self.name = "camera"
+        self.matrix = [1.0, 0.0, 0.0, 1.0]
+        self.frame = ("base_link", (0.1, 0.2, 0.3))
+
+
+class Unversioned(object):
+    pass
+
+
+class Robot(object):
+    def __init__(self, calibration):
+        self.id = "Robot1"
+        self.calibration = calibration
+        self.position = (1.5, 2.5)
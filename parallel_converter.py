@@ -0,0 +1,221 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" Converts large amounts of Objects in parallel with the ObjectFiwareConverter.
+    The Objects are split into chunks, which are converted by a pool of processes
+    (or threads on Python-builds without the GIL). The results keep the order of the input.
+"""
+
+import sys
+from collections import deque
+try:
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the 'futures' backport
+    ProcessPoolExecutor = ThreadPoolExecutor = None
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
+from object_fiware_converter import ObjectFiwareConverter
+from json_to_object.message_plan import isMessage
+
+
+class ParallelConverter(object):
+    """ A pool which converts chunks of chunkSize Objects with obj2Fiware or fiware2Obj.
+        By default a process for every core is used, threads only if the GIL is disabled
+        (useThreads=None). Chunks of JSON-Strings with at least sharedMemoryThreshold bytes
+        are returned from the processes via shared memory instead of pickling them (None disables it).
+        The pool is started with the first conversion and kept until close() is called.
+        If a chunk fails, the remaining chunks are cancelled or discarded (and their shared memory unlinked).
+    """
+
+    def __init__(self, workers=None, chunkSize=256, useThreads=None, sharedMemoryThreshold=1 << 20):
+        if ProcessPoolExecutor is None:
+            raise ImportError("The ParallelConverter needs concurrent.futures (on Python 2 the 'futures' backport)")
+        if chunkSize < 1:
+            raise ValueError("chunkSize has to be at least 1")
+        if useThreads is None:
+            # Free-threaded builds (PEP 703) can convert in parallel with threads
+            useThreads = not getattr(sys, '_is_gil_enabled', lambda: True)()
+        self.workers = workers
+        self.chunkSize = chunkSize
+        self.useThreads = useThreads
+        self.sharedMemoryThreshold = None if useThreads or shared_memory is None else sharedMemoryThreshold
+        self._executor = None
+
+    def obj2Fiware(self, _objects, ind=0, dataTypeDict={}, ignorePythonMetaData=False, showIdValue=True, encode=False, packThreshold=None, asBytes=False,
+                   keyValues=False, schema=None, compactArrays=False, idGenerator=None):
+        """ Returns the list of JSON-Strings (or UTF-8 encoded bytes) of the Objects,
+            the parameters are the ones of ObjectFiwareConverter.obj2Fiware. The idGenerator
+            is called in this process, so that its state (e.g. of an IdRegistry) is kept
+        """
+        options = dict(ind=ind, dataTypeDict=dataTypeDict, ignorePythonMetaData=ignorePythonMetaData,
+                       showIdValue=showIdValue, encode=encode, packThreshold=packThreshold,
+                       keyValues=keyValues, schema=schema, compactArrays=compactArrays)
+        result = []
+        futures = deque()
+        try:
+            self._submit(futures, _toFiware, options, _withIds(_objects, showIdValue, idGenerator))
+            while futures:
+                chunk = futures.popleft().result()
+                if type(chunk) is tuple:
+                    chunk = _readSharedMemory(*chunk)
+                if not asBytes:
+                    chunk = [body.decode('utf-8') for body in chunk]
+                result.extend(chunk)
+        finally:
+            _discard(futures)
+        return result
+
+    def fiware2Obj(self, _fiwareEntities, objectType, useMetaData=True, ignoreWrongDataType=False, setAttr=False, encoded=False, binaryType=None,
+                   lazy=False, keyValues=False, schema=None):
+        """ Returns the list of Objects converted from the Fiware-Entities (JSON-Strings or dicts).
+            For every Entity a new Object is created with objectType() (a ROS-Message class
+            is passed as it is), which has to be picklable (e.g. a class) if processes are used.
+            lazy is only supported with threads, a LazyEntity converts its Attributes in this
+            process anyway. The other parameters are the ones of ObjectFiwareConverter.fiware2Obj
+        """
+        if lazy and not self.useThreads:
+            raise ValueError("LazyEntities can only be created with threads (useThreads=True)")
+        options = dict(useMetaData=useMetaData, ignoreWrongDataType=ignoreWrongDataType, setAttr=setAttr, encoded=encoded,
+                       binaryType=binaryType, lazy=lazy, keyValues=keyValues, schema=schema)
+        result = []
+        futures = deque()
+        try:
+            self._submit(futures, _toObject, (objectType, options), _fiwareEntities)
+            while futures:
+                result.extend(futures.popleft().result())
+        finally:
+            _discard(futures)
+        return result
+
+    def _submit(self, futures, function, options, items):
+        # Appends the futures of the chunks of items in their order
+        if self._executor is None:
+            if self.useThreads:
+                self._executor = ThreadPoolExecutor(self.workers)
+            else:
+                if self.sharedMemoryThreshold is not None:
+                    # The workers have to share the tracker of the shared memory
+                    # with this process, which unlinks it
+                    resource_tracker.ensure_running()
+                self._executor = ProcessPoolExecutor(self.workers)
+        for chunk in _chunks(items, self.chunkSize):
+            futures.append(self._executor.submit(function, options, chunk, self.sharedMemoryThreshold))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _chunks(items, chunkSize):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _withIds(_objects, showIdValue, idGenerator):
+    """ Yields (Object, id) with the id of the idGenerator for Objects without 'id' (otherwise None) """
+    for _object in _objects:
+        entityId = None
+        if showIdValue and idGenerator is not None:
+            if isinstance(_object, dict):
+                if _object.get("id") is None:
+                    entityId = idGenerator(_object, _object.get("type", _object.__class__.__name__))
+            elif getattr(_object, "id", None) is None:
+                entityId = idGenerator(_object, getattr(_object, "type", _object.__class__.__name__))
+        yield _object, entityId
+
+
+def _givenId(entityId):
+    return lambda _object, entityType: entityId
+
+
+def _toFiware(options, chunk, sharedMemoryThreshold):
+    """ Converts a chunk of (Object, id) in the worker. Returns the list of bodies or
+        (name, lengths) of the shared memory which contains them
+    """
+    bodies = [ObjectFiwareConverter.obj2Fiware(_object, asBytes=True, idGenerator=None if entityId is None else _givenId(entityId), **options)
+              for _object, entityId in chunk]
+    if sharedMemoryThreshold is None:
+        return bodies
+    lengths = [len(body) for body in bodies]
+    size = sum(lengths)
+    if size == 0 or size < sharedMemoryThreshold:
+        return bodies
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        start = 0
+        for body in bodies:
+            memory.buf[start:start + len(body)] = body
+            start += len(body)
+        return (memory.name, lengths)
+    finally:
+        # The memory is unlinked by the receiver
+        memory.close()
+
+
+def _discard(futures):
+    """ Cancels the futures which are not read. Chunks, which are already converted,
+        are waited for and their shared memory is unlinked
+    """
+    for future in futures:
+        future.cancel()
+    for future in futures:
+        if future.cancelled() or future.exception() is not None:
+            continue
+        chunk = future.result()
+        if type(chunk) is tuple:
+            memory = shared_memory.SharedMemory(name=chunk[0])
+            memory.close()
+            memory.unlink()
+
+
+def _readSharedMemory(name, lengths):
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        data = bytes(memory.buf[:sum(lengths)])
+    finally:
+        memory.close()
+        memory.unlink()
+    bodies = []
+    start = 0
+    for length in lengths:
+        bodies.append(data[start:start + length])
+        start += length
+    return bodies
+
+
+def _toObject(options, chunk, sharedMemoryThreshold):
+    objectType, options = options
+    objects = []
+    for entity in chunk:
+        target = objectType if isMessage(objectType) else objectType()
+        objects.append(ObjectFiwareConverter.fiware2Obj(entity, target, **options))
+    return objects
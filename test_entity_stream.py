@@ -0,0 +1,74 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import io
+import json
+import unittest
+
+from entity_stream import EntitySplitter, iterEntities
+
+ENTITIES = [
+    dict(id="A1", type="T", text=dict(type="string", value="]}[{")),
+    dict(id="A2", type="T", text=dict(type="string", value="\\\"}\\")),
+    dict(id=u"A\u00fc", type="T", nested=dict(type="array", value=[dict(type="number", value=1), []])),
+]
+
+
+class TestEntityStream(unittest.TestCase):
+
+    def test_Array(self):
+        body = json.dumps(ENTITIES).encode('utf-8')
+        self.assertEqual([json.loads(entity.decode('utf-8')) for entity in iterEntities(body)], ENTITIES)
+        self.assertEqual(list(iterEntities(" [ ]\n")), [])
+        self.assertEqual(list(iterEntities("")), [])
+
+    def test_ChunkBoundaries(self):
+        body = json.dumps(ENTITIES, ensure_ascii=False).encode('utf-8')
+        # Every split position, also inside of escapes and UTF-8 sequences
+        for size in range(1, 12):
+            entities = iterEntities(body[i:i + size] for i in range(0, len(body), size))
+            self.assertEqual([json.loads(entity.decode('utf-8')) for entity in entities], ENTITIES)
+
+    def test_NDJSON(self):
+        body = u"\n".join(json.dumps(entity) for entity in ENTITIES) + u"\n"
+        entities = iterEntities(io.StringIO(body), chunkSize=5)
+        self.assertEqual([json.loads(entity.decode('utf-8')) for entity in entities], ENTITIES)
+
+    def test_BoundedBuffer(self):
+        splitter = EntitySplitter()
+        entity = json.dumps(ENTITIES[0]).encode('utf-8')
+        for _ in range(100):
+            self.assertEqual(splitter.feed(b", " + entity if _ else b"[" + entity), [entity])
+            # Only the unfinished rest is kept
+            self.assertEqual(len(splitter._buffer), 0)
+        self.assertEqual(splitter.feed(b", " + entity[:10]), [])
+        self.assertEqual(len(splitter._buffer), 10)
+
+    def test_Errors(self):
+        self.assertRaises(ValueError, list, iterEntities('[{"id": "A1"}'))
+        self.assertRaises(ValueError, list, iterEntities('{"id": "A1", "text": "}'))
+        self.assertRaises(ValueError, list, iterEntities('[1, 2]'))
+        self.assertRaises(ValueError, list, iterEntities('[{"id": "A1"}] {"id": "A2"}'))
+        self.assertRaises(ValueError, list, iterEntities('"A1"'))
+
+    def test_Commas(self):
+        for body in ('[{"a": 1},]', '[,{"a": 1}]', '[{"a": 1}{"b": 2}]', '[{"a": 1},,{"b": 2}]', '[,]', '{"a": 1}, {"b": 2}'):
+            self.assertRaises(ValueError, list, iterEntities(body))
+            # Also if the commas are in other chunks
+            self.assertRaises(ValueError, list, iterEntities(body, chunkSize=1))
+        self.assertEqual(len(list(iterEntities(' [ {"a": 1} ,\n{"b": 2} ] '))), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
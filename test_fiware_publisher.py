@@ -0,0 +1,26 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import sys
+import unittest
+
+if sys.version_info >= (3, 7):
+    # The asyncio-Syntax cannot be compiled on Python 2
+    from fiware_publisher_cases import TestFiwarePublisher, TestFiwarePublisherRetry, TestFiwarePublisherNonIdempotent, \
+        TestFiwarePublisherErrors, TestFiwarePublisherClosedConnections, TestFiwarePublisherLoops  # noqa: F401
+else:
+    @unittest.skip("The FiwarePublisher needs Python 3.7 (asyncio)")
+    class TestFiwarePublisher(unittest.TestCase):
+        def test_Python3(self):
+            pass
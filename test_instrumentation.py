@@ -0,0 +1,112 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import unittest
+
+from object_fiware_converter import ObjectFiwareConverter
+from object_to_json.entity_attribute import ConversionContext, packBase64, _CONVERTERS
+from instrumentation import Instrumentation, PHASES, OBJ2FIWARE, FIWARE2OBJ
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.started = []
+        self.ended = []
+        self.instrumentation = Instrumentation(onEntityStart=self.started.append, onEntityEnd=self.ended.append)
+        ObjectFiwareConverter.setInstrumentation(self.instrumentation)
+
+    def tearDown(self):
+        ObjectFiwareConverter.setInstrumentation(None)
+
+    def test_DisabledByDefault(self):
+        ObjectFiwareConverter.setInstrumentation(None)
+        ObjectFiwareConverter.obj2Fiware(Camera())
+        self.assertEqual(self.started, [])
+        ctx = ConversionContext(False)
+        self.assertTrue(ctx.converters is _CONVERTERS)
+        self.assertEqual(ctx.stats, None)
+
+    def test_Obj2Fiware(self):
+        body = ObjectFiwareConverter.obj2Fiware(Camera(), encode=True)
+        self.assertEqual(len(self.started), 1)
+        self.assertTrue(self.ended[0] is self.started[0])
+        stats = self.ended[0]
+        self.assertEqual(stats.direction, OBJ2FIWARE)
+        self.assertEqual(stats.type, "Camera")
+        self.assertEqual(stats.attributes, 2)
+        # 2 Attributes, 3 fields of the Image and 2 elements of the tuple
+        self.assertEqual(stats.nodes, 7)
+        self.assertEqual((stats.base64Fields, stats.base64Bytes), (1, len(packBase64(RosImage().data, 'B'))))
+        self.assertEqual(stats.bytes, len(body))
+        for phase in ("introspection", "base64", "quoting", "json"):
+            self.assertTrue(stats.timings[phase] > 0, phase)
+
+        ObjectFiwareConverter.obj2Fiware(Camera())
+        counters = self.instrumentation.types[OBJ2FIWARE]["Camera"]
+        self.assertEqual(counters["entities"], 2)
+        self.assertEqual(counters["base64Fields"], 2)
+        self.assertEqual(counters["nodes"], 14)
+        self.assertEqual(self.instrumentation.timings["quoting"], stats.timings["quoting"])
+        self.assertTrue("obj2Fiware Camera: entities=2" in self.instrumentation.report())
+
+    def test_Fiware2Obj(self):
+        ObjectFiwareConverter.setInstrumentation(None)
+        body = ObjectFiwareConverter.obj2Fiware(Camera())
+        ObjectFiwareConverter.setInstrumentation(self.instrumentation)
+        ObjectFiwareConverter.fiware2Obj(body, Target(), setAttr=True)
+        stats = self.ended[0]
+        self.assertEqual(stats.direction, FIWARE2OBJ)
+        self.assertEqual(stats.object, body)
+        self.assertEqual((stats.type, stats.attributes, stats.bytes), ("Camera", 2, len(body)))
+        self.assertTrue(stats.timings["parsing"] > 0)
+        self.assertTrue(stats.timings["decoding"] > 0)
+        self.assertEqual(set(self.instrumentation.types[FIWARE2OBJ]), set(["Camera"]))
+
+    def test_BatchAndStream(self):
+        ObjectFiwareConverter.obj2FiwareBatch([Camera(), Target()])
+        self.assertEqual([stats.type for stats in self.ended], ["Camera", "Target"])
+        self.assertTrue(self.instrumentation.timings["json"] > 0)
+        chunks = list(ObjectFiwareConverter.obj2FiwareStream([Camera()], ndjson=True, showIdValue=False))
+        self.assertEqual(self.ended[2].type, "Camera")
+        self.assertEqual(self.ended[2].bytes, len(chunks[0]) - 1)
+
+    def test_Reset(self):
+        ObjectFiwareConverter.obj2Fiware(Camera())
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.timings, dict.fromkeys(PHASES, 0.0))
+        self.assertEqual(self.instrumentation.types[OBJ2FIWARE], {})
+
+
+class RosImage(object):
+    __slots__ = ['frame', 'size', 'data', '_type']
+    _slot_types = ['string', 'uint32[2]', 'uint8[]', 'string']
+
+    def __init__(self):
+        self.frame = "camera/left"
+        self.size = (2, 300)
+        self.data = list(range(200)) * 3
+        self._type = 'sensor_msgs/Image'
+
+
+class Camera(object):
+    def __init__(self):
+        self.id = "Camera1"
+        self.name = "left camera"
+        self.image = RosImage()
+
+
+class Target(object):
+    def __init__(self):
+        self.id = "Target1"
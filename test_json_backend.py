@@ -0,0 +1,158 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import json
+import unittest
+
+import json_backend
+from object_fiware_converter import ObjectFiwareConverter
+
+
+class TestJsonBackend(unittest.TestCase):
+    """ Every test is run with every installed backend """
+
+    def setUp(self):
+        self.previous = json_backend.get()
+
+    def tearDown(self):
+        json_backend.use(self.previous.name)
+
+    def backends(self):
+        for name in json_backend.available():
+            yield json_backend.use(name)
+
+    def test_StdlibIsAlwaysAvailable(self):
+        self.assertTrue("json" in json_backend.available())
+        self.assertTrue(json_backend.get("json") is json_backend.STDLIB)
+
+    def test_UnknownBackend(self):
+        self.assertRaises(ValueError, json_backend.use, "yaml")
+
+    def test_RoundTrip(self):
+        for backend in self.backends():
+            tc = TestClass()
+            jsonStr = ObjectFiwareConverter.obj2Fiware(tc, encode=True)
+            self.assertEqual(type(jsonStr), str)
+            result = Empty()
+            ObjectFiwareConverter.fiware2Obj(jsonStr, result, setAttr=True, encoded=True)
+            tc.type = "TestClass"
+            self.assertEqual(result.__dict__, tc.__dict__, backend.name)
+
+    def test_AsBytes(self):
+        for backend in self.backends():
+            body = ObjectFiwareConverter.obj2Fiware(TestClass(), asBytes=True)
+            self.assertEqual(type(body), bytes)
+            self.assertEqual(json.loads(body.decode('utf-8'))["text"]["value"], u"Gr\u00fc\u00dfe/%", backend.name)
+            result = Empty()
+            ObjectFiwareConverter.fiware2Obj(body, result, setAttr=True)
+            self.assertEqual(result.text, u"Gr\u00fc\u00dfe/%")
+
+    def test_Indent(self):
+        for backend in self.backends():
+            for ind in (2, 4):
+                jsonStr = ObjectFiwareConverter.obj2Fiware(TestClass(), ind=ind)
+                self.assertTrue(jsonStr.startswith("{\n" + " " * ind + '"'), backend.name)
+                self.assertEqual(json.loads(jsonStr), json.loads(ObjectFiwareConverter.obj2Fiware(TestClass())))
+
+    def test_SameAsStdlib(self):
+        expected = json.loads(ObjectFiwareConverter.obj2FiwareBatch([TestClass()] * 3))
+        for backend in self.backends():
+            self.assertEqual(json.loads(ObjectFiwareConverter.obj2FiwareBatch([TestClass()] * 3)), expected, backend.name)
+
+    def test_SameTextAsStdlib(self):
+        values = [TestClass(), Special(), Plain()]
+        for backend in self.backends():
+            for ind in (0, 2, 4):
+                json_backend.use("json")
+                expected = [ObjectFiwareConverter.obj2Fiware(value, ind=ind) for value in values]
+                json_backend.use(backend.name)
+                self.assertEqual([ObjectFiwareConverter.obj2Fiware(value, ind=ind) for value in values], expected, backend.name)
+            plain = dict(a=[1, 2.5, {}, []], b="x", c=None, d=True, e=1e-4)
+            self.assertEqual(json_backend.dumps(plain, 0), json.dumps(plain, indent=0), backend.name)
+            self.assertEqual(json_backend.dumps(plain, 2, asBytes=True), json.dumps(plain, indent=2).encode('utf-8'), backend.name)
+            self.assertEqual(json_backend.dumps(plain), json.dumps(plain), backend.name)
+
+    def test_Plain(self):
+        values = [dict(a=[1, 2.5, {}, []], b="x: null", c="1e5", d=True, e=1e-4),
+                  dict(nan=float("nan"), ranges=[1e16, -1e-05, float("inf")], text=u"Gr\u00fc\u00dfe", none=None),
+                  [1e22, "a\x7fb"], 2 ** 70]
+        for backend in self.backends():
+            for value in values:
+                for ind in (0, 2):
+                    self.assertEqual(json_backend.dumps(value, ind, plain=True), json.dumps(value, indent=ind), backend.name)
+
+    @unittest.skipIf("orjson" not in json_backend.available(), "orjson is not installed")
+    def test_PlainIsNotWalked(self):
+        walked = []
+        reproducible = json_backend._reproducible
+        json_backend._reproducible = lambda obj: walked.append(obj) or reproducible(obj)
+        try:
+            backend = json_backend.get("orjson")
+            plain = dict(a=[1, 2.5, {}, []], b="x", d=True, e=1e-4)
+            self.assertEqual(json_backend.dumps(plain, 2, backend=backend, plain=True), json.dumps(plain, indent=2))
+            self.assertEqual(walked, [])
+            # null may be a NaN, then the walk decides
+            plain["c"] = None
+            self.assertEqual(json_backend.dumps(plain, 2, backend=backend, plain=True), json.dumps(plain, indent=2))
+            self.assertEqual(walked, [plain])
+        finally:
+            json_backend._reproducible = reproducible
+
+    def test_NonFiniteFloats(self):
+        for backend in self.backends():
+            special = Special()
+            result = Empty()
+            ObjectFiwareConverter.fiware2Obj(ObjectFiwareConverter.obj2Fiware(special), result, setAttr=True)
+            self.assertTrue(result.nan != result.nan, backend.name)
+            self.assertEqual(result.ranges, special.ranges, backend.name)
+
+    def test_LargeIntegers(self):
+        for backend in self.backends():
+            value = 2 ** 70
+            self.assertEqual(json_backend.loads(json_backend.dumps([value])), [value], backend.name)
+            self.assertEqual(json_backend.loads(json_backend.dumps([value], asBytes=True)), [value], backend.name)
+
+    def test_NotSerializable(self):
+        for backend in self.backends():
+            self.assertRaises(TypeError, json_backend.dumps, set([1]))
+
+
+class TestClass(object):
+    def __init__(self):
+        self.id = "Test1"
+        self.number = 1
+        self.float = 1e16
+        self.text = u"Gr\u00fc\u00dfe/%"
+        self.nested = dict(a=[1, 2.5, None, True], b=(1, "2"))
+        self.complex = complex(1, -2)
+
+
+class Special(object):
+    def __init__(self):
+        self.id = "Special1"
+        self.nan = float("nan")
+        self.ranges = [1.5, float("inf"), -float("inf"), 1e-07, 1e22]
+        self.text = "a\x7fb"
+
+
+class Plain(object):
+    def __init__(self):
+        self.id = "Plain1"
+        self.pose = [1.5, -2.25, 0.0]
+        self.name = "arm/1"
+        self.nested = dict(a=[1, None, True], b={})
+
+
+class Empty(object):
+    pass
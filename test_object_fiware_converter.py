@@ -13,10 +13,19 @@
 #    limitations under the License.
 
 
+import json
 import unittest
 from object_fiware_converter import ObjectFiwareConverter
 from object_to_json.entity import Entity
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# On Python 2 bytes is str (text), binary data is a bytearray
+BINARY = bytes if bytes is not str else bytearray
+
 
 
 class Test_JsonConverter(unittest.TestCase):
@@ -69,6 +78,17 @@ class Test_JsonConverter(unittest.TestCase):
 
         self.assertEqual(tc.val, 1)
 
+    def test_2Fiware2Obj_Lazy(self):
+        tc = TestClass()
+        tc.id = "TestClass1"
+        tc.val = dict(a=[1, 2.5], b="string")
+        json = ObjectFiwareConverter.obj2Fiware(tc, encode=True)
+
+        lazy = ObjectFiwareConverter.fiware2Obj(json, lazy=True, encoded=True)
+        self.assertEqual(lazy.id, "TestClass1")
+        self.assertEqual(lazy.type, "TestClass")
+        self.assertEqual(lazy.val, tc.val)
+
     def test_2Fiware2Obj_WithOut_ID_Value(self):
         json = ObjectFiwareConverter.obj2Fiware(TestClass(), showIdValue=False)
 
@@ -78,6 +98,211 @@ class Test_JsonConverter(unittest.TestCase):
 
         self.assertEqual(tc.val, 1)
 
+    def test_2Fiware_SameAsEntityAttributeTree(self):
+        tc = TestClass()
+        tc.id = "TestClass1"
+        json = ObjectFiwareConverter.obj2Fiware(tc, ind=4, dataTypeDict=dict(val="int32"))
+        en = Entity()
+        en.setObject(tc, dict(val="int32"), False)
+        self.assertEqual(json, ObjectFiwareConverter._json(en, 4))
+
+    def test_2FiwareBatch(self):
+        body = ObjectFiwareConverter.obj2FiwareBatch([TestClass(), TestClass()], actionType="update")
+        batch = json.loads(body)
+        self.assertEqual(batch["actionType"], "update")
+        self.assertEqual(len(batch["entities"]), 2)
+        self.assertNotEqual(batch["entities"][0]["id"], batch["entities"][1]["id"])
+        for entity in batch["entities"]:
+            self.assertEqual(entity["type"], "TestClass")
+            tc = TestClass()
+            tc.val = 42
+            ObjectFiwareConverter.fiware2Obj(entity, tc)
+            self.assertEqual(tc.val, 1)
+
+    def test_2FiwareBatch_AsBytes(self):
+        body = ObjectFiwareConverter.obj2FiwareBatch(iter([TestClass()]), asBytes=True)
+        self.assertEqual(type(body), bytes)
+        self.assertEqual(json.loads(body.decode('utf-8'))["actionType"], "append")
+
+    def test_2FiwareBatch_UnknownActionType(self):
+        self.assertRaises(ValueError, ObjectFiwareConverter.obj2FiwareBatch, [TestClass()], actionType="upsert")
+
+    def test_2FiwareStream(self):
+        chunks = list(ObjectFiwareConverter.obj2FiwareStream(TestClass() for _ in range(3)))
+        self.assertEqual(len(chunks), 5)
+        entities = json.loads("".join(chunks))
+        self.assertEqual([entity["val"]["value"] for entity in entities], [1, 1, 1])
+
+    def test_2FiwareStream_Empty(self):
+        self.assertEqual("".join(ObjectFiwareConverter.obj2FiwareStream([])), "[]")
+
+    def test_2FiwareStream_IsLazy(self):
+        def objects():
+            yield TestClass()
+            raise RuntimeError("Only the first Object should be converted")
+        stream = ObjectFiwareConverter.obj2FiwareStream(objects(), ndjson=True)
+        self.assertEqual(json.loads(next(stream))["type"], "TestClass")
+
+    def test_2FiwareStream_NDJSON(self):
+        lines = list(ObjectFiwareConverter.obj2FiwareStream([TestClass(), TestClass()], ndjson=True, showIdValue=False))
+        self.assertEqual(len(lines), 2)
+        for line in lines:
+            self.assertTrue(line.endswith("\n"))
+            self.assertEqual(json.loads(line), dict(val=dict(type="number", value=1, metadata=dict(
+                python=dict(type="dataType", value="int")))))
+
+    def test_2FiwareStream_Batch(self):
+        body = "".join(ObjectFiwareConverter.obj2FiwareStream([TestClass()], actionType="append", showIdValue=False))
+        batch = json.loads(body)
+        self.assertEqual(batch["actionType"], "append")
+        self.assertEqual(batch["entities"][0]["type"], "TestClass")
+
+    def test_2FiwareStream_InvalidArguments(self):
+        # Raised by the call, before the first chunk is requested
+        self.assertRaises(ValueError, ObjectFiwareConverter.obj2FiwareStream, [], actionType="unknown")
+        self.assertRaises(ValueError, ObjectFiwareConverter.obj2FiwareStream, [], actionType="append", ndjson=True)
+        # The separator is part of the chunks after the first Entity
+        chunks = list(ObjectFiwareConverter.obj2FiwareStream([TestClass(), TestClass()], showIdValue=False))
+        self.assertTrue(chunks[2].startswith(", {"))
+
+    def test_2Fiware2Obj_Bytes(self):
+        data = BINARY(bytearray(range(256)))
+        tc = TestClass()
+        tc.val = data
+        json = ObjectFiwareConverter.obj2Fiware(tc)
+
+        tc = TestClass()
+        tc.val = type(data)()
+        ObjectFiwareConverter.fiware2Obj(json, tc)
+        self.assertEqual(tc.val, data)
+        self.assertEqual(type(tc.val), type(data))
+
+        tc.val = bytearray()
+        ObjectFiwareConverter.fiware2Obj(json, tc, binaryType="bytearray")
+        self.assertEqual(tc.val, bytearray(range(256)))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_2Fiware2Obj_Ndarray(self):
+        for dtype in ('<f8', '>i4', 'u1', '?', '<c16'):
+            tc = TestClass()
+            tc.val = (numpy.arange(24) % 3).astype(dtype).reshape(2, 3, 4)
+            json = ObjectFiwareConverter.obj2Fiware(tc, encode=True)
+
+            result = TestClass()
+            result.val = numpy.zeros(1)
+            ObjectFiwareConverter.fiware2Obj(json, result)
+            self.assertEqual(result.val.dtype, tc.val.dtype)
+            self.assertEqual(result.val.shape, (2, 3, 4))
+            self.assertTrue(numpy.array_equal(result.val, tc.val))
+
+    def test_2Fiware_KeyValues(self):
+        tc = TestClass()
+        tc.id = "TestClass1"
+        tc.val = dict(a=[1, 2.5], b=(True, None))
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(tc, keyValues=True))
+        self.assertEqual(entity, dict(id="TestClass1", type="TestClass", val=dict(a=[1, 2.5], b=[True, None])))
+        self.assertTrue(len(ObjectFiwareConverter.obj2Fiware(tc, keyValues=True)) < len(ObjectFiwareConverter.obj2Fiware(tc)) / 2)
+
+    def test_2Fiware_KeyValuesSchema(self):
+        tc = KeyValuesClass()
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(tc, keyValues=True, schema=dict(speed=float, pose=tuple)))
+        self.assertEqual(sorted(entity), ["id", "pose", "speed", "type"])
+        batch = json.loads(ObjectFiwareConverter.obj2FiwareBatch([tc], keyValues=True))
+        self.assertEqual(batch["entities"][0]["name"], "arm/1")
+
+    def test_2Fiware2Obj_KeyValues(self):
+        body = ObjectFiwareConverter.obj2Fiware(KeyValuesClass(), keyValues=True, encode=True)
+        target = KeyValuesClass()
+        target.speed, target.count, target.name, target.pose, target.data = 0.0, 0, "", (0.0, 0), BINARY()
+        ObjectFiwareConverter.fiware2Obj(body, target, keyValues=True, encoded=True)
+        expected = KeyValuesClass()
+        expected.type = "KeyValuesClass"
+        self.assertEqual(target.__dict__, expected.__dict__)
+        self.assertEqual(type(target.pose[0]), float)
+
+    def test_2Fiware2Obj_KeyValuesSchema(self):
+        body = ObjectFiwareConverter.obj2Fiware(KeyValuesClass(), keyValues=True)
+        target = TestClass()
+        ObjectFiwareConverter.fiware2Obj(body, target, keyValues=True, setAttr=True, schema=dict(pose=tuple, data=BINARY))
+        self.assertEqual(target.pose, (1.5, 2))
+        self.assertEqual(target.data, KeyValuesClass().data)
+        # Without template the plain JSON-value
+        self.assertEqual(target.count, 3)
+
+    def test_2Fiware2Obj_KeyValuesTypeCheck(self):
+        body = ObjectFiwareConverter.obj2Fiware(KeyValuesClass(), keyValues=True)
+        target = KeyValuesClass()
+        target.pose = None
+        target.name = 42
+        self.assertRaises(TypeError, ObjectFiwareConverter.fiware2Obj, body, target, keyValues=True)
+        self.assertRaises(ValueError, ObjectFiwareConverter.fiware2Obj, body, target, keyValues=True, lazy=True)
+
+    def test_2Fiware2Obj_CompactArrays(self):
+        tc = TestClass()
+        tc.val = dict(floats=[1.0, 2.5] * 100, ints=(1, 2), texts=["a/b", "c"], mixed=[1, "x"], nested=[[True], [False]])
+        body = ObjectFiwareConverter.obj2Fiware(tc, compactArrays=True, encode=True)
+        self.assertTrue(len(body) < len(ObjectFiwareConverter.obj2Fiware(tc, encode=True)) / 4)
+
+        result = TestClass()
+        result.val = dict()
+        ObjectFiwareConverter.fiware2Obj(body, result, encoded=True)
+        self.assertEqual(result.val, tc.val)
+        self.assertEqual(type(result.val["floats"][0]), float)
+        self.assertEqual(type(result.val["ints"]), tuple)
+
+    def test_2Fiware2Obj_RosNumericArrays(self):
+        scan = RosScan()
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(scan))
+        self.assertEqual(entity["ranges"]["type"], "base64")
+        self.assertEqual(entity["intensities"]["type"], "array")
+
+        result = TestClass()
+        ObjectFiwareConverter.fiware2Obj(json.dumps(entity), result, setAttr=True)
+        self.assertEqual(result.ranges, scan.ranges)
+        self.assertEqual(result.intensities, scan.intensities)
+
+    def test_2Fiware2Obj_KeyValuesRosArrays(self):
+        scan, signed = RosScan(), RosSigned()
+        scan.intensities = [1, 2, 3] * 100
+        # Without metadata only uint8[] is packed
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(scan, keyValues=True))
+        self.assertEqual((entity["ranges"], entity["intensities"]), (scan.ranges, scan.intensities))
+        entity = json.loads(ObjectFiwareConverter.obj2Fiware(signed, keyValues=True))
+        self.assertEqual(entity["data"], signed.data)
+        self.assertTrue(isinstance(entity["image"], type(u"")))
+
+        result = TestClass()
+        result.data, result.image = [0], [0]
+        ObjectFiwareConverter.fiware2Obj(entity, result, keyValues=True, setAttr=True)
+        self.assertEqual((result.data, result.image), (signed.data, signed.image))
+
+    def test_2Fiware2ObjStream(self):
+        objects = []
+        for i in range(3):
+            tc = TestClass()
+            tc.val = "[{}]\" {{".format(i)
+            objects.append(tc)
+        body = "".join(ObjectFiwareConverter.obj2FiwareStream(objects, encode=True)).encode('utf-8')
+        # Split into chunks of 7 bytes
+        chunks = (body[i:i + 7] for i in range(0, len(body), 7))
+        results = list(ObjectFiwareConverter.fiware2ObjStream(chunks, TestClass, ignoreWrongDataType=True, encoded=True))
+        self.assertEqual([type(result) for result in results], [TestClass] * 3)
+        self.assertEqual([result.val for result in results], [tc.val for tc in objects])
+        self.assertEqual([result.id for result in results], [entity["id"] for entity in json.loads(body.decode('utf-8'))])
+
+    def test_2Fiware2ObjStream_NDJSON(self):
+        body = "".join(ObjectFiwareConverter.obj2FiwareStream([RosScan(), RosScan()], ndjson=True))
+        results = list(ObjectFiwareConverter.fiware2ObjStream(body, RosScan))
+        self.assertEqual([type(result) for result in results], [RosScan, RosScan])
+        self.assertEqual(results[1].ranges, RosScan().ranges)
+        self.assertFalse(results[0] is results[1])
+
+    def test_2Fiware2ObjStream_IsLazy(self):
+        body = '[' + ObjectFiwareConverter.obj2Fiware(TestClass()) + ', {"id": "Broken"'
+        stream = ObjectFiwareConverter.fiware2ObjStream(body, TestClass)
+        self.assertEqual(next(stream).val, 1)
+        self.assertRaises(ValueError, next, stream)
+
     def test_IntegerType(self):  # TODO Accept Integers and other primitives?
         json = """{"id":"Task1","type":"Task","task":{"type":"Integer","value":0}}"""
         tc = TestClass()
@@ -94,3 +319,33 @@ class Test_JsonConverter(unittest.TestCase):
 class TestClass(object):
     def __init__(self):
         self.val = 1
+
+
+class KeyValuesClass(object):
+    def __init__(self):
+        self.id = "KeyValues1"
+        self.speed = 1.0
+        self.count = 3
+        self.name = "arm/1"
+        self.pose = (1.5, 2)
+        self.data = BINARY(bytearray(range(256))) * 2
+
+
+class RosScan(object):
+    __slots__ = ['ranges', 'intensities', '_type']
+    _slot_types = ['float32[]', 'uint16[]', 'string']
+
+    def __init__(self):
+        self.ranges = [0.25 * i for i in range(300)]
+        self.intensities = [1, 2, 3]
+        self._type = 'sensor_msgs/LaserScan'
+
+
+class RosSigned(object):
+    __slots__ = ['data', 'image', '_type']
+    _slot_types = ['int8[]', 'uint8[]', 'string']
+
+    def __init__(self):
+        self.data = [-1, 1] * 150
+        self.image = [255, 0] * 150
+        self._type = 'test_msgs/Signed'
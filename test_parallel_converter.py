@@ -0,0 +1,125 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import unittest
+
+from object_fiware_converter import ObjectFiwareConverter
+from object_to_json.entity_id import CounterIds
+from json_to_object.reverse_entity import LazyEntity
+from parallel_converter import ParallelConverter, ProcessPoolExecutor, shared_memory
+
+
+@unittest.skipIf(ProcessPoolExecutor is None, "concurrent.futures is not installed")
+class TestParallelConverter(unittest.TestCase):
+
+    def expected(self, objects, **options):
+        return [ObjectFiwareConverter.obj2Fiware(_object, **options) for _object in objects]
+
+    def test_ProcessesKeepOrder(self):
+        objects = [Message(i) for i in range(25)]
+        with ParallelConverter(workers=2, chunkSize=4, useThreads=False) as converter:
+            self.assertEqual(converter.obj2Fiware(objects, encode=True), self.expected(objects, encode=True))
+            # The pool is reused
+            self.assertEqual(converter.obj2Fiware(iter(objects), ind=2, showIdValue=False),
+                             self.expected(objects, ind=2, showIdValue=False))
+
+    def test_SharedMemory(self):
+        objects = [Message(i) for i in range(10)]
+        with ParallelConverter(workers=2, chunkSize=3, useThreads=False, sharedMemoryThreshold=1) as converter:
+            self.assertEqual(converter.obj2Fiware(objects, asBytes=True), [body.encode('utf-8') for body in self.expected(objects)])
+            self.assertEqual(converter.obj2Fiware(objects, packThreshold=0), self.expected(objects, packThreshold=0))
+
+    def test_Threads(self):
+        objects = [Message(i) for i in range(10)]
+        with ParallelConverter(workers=3, chunkSize=1, useThreads=True) as converter:
+            self.assertEqual(converter.sharedMemoryThreshold, None)
+            self.assertEqual(converter.obj2Fiware(objects), self.expected(objects))
+
+    def test_Empty(self):
+        with ParallelConverter(workers=1, useThreads=False) as converter:
+            self.assertEqual(converter.obj2Fiware([]), [])
+
+    def test_Fiware2Obj(self):
+        bodies = self.expected([Message(i) for i in range(7)])
+        with ParallelConverter(workers=2, chunkSize=2, useThreads=False) as converter:
+            messages = converter.fiware2Obj(bodies, Message)
+        self.assertEqual([message.seq for message in messages], list(range(7)))
+        self.assertEqual(messages[3].data, [3] * 10)
+        self.assertEqual(messages[3].id, "Message3")
+
+    def test_Options(self):
+        objects = [Message(i) for i in range(6)]
+        for message in objects[::2]:
+            del message.id
+        with ParallelConverter(workers=2, chunkSize=2, useThreads=False) as converter:
+            bodies = converter.obj2Fiware(objects, keyValues=True, compactArrays=True, schema={"seq": None, "data": None},
+                                          idGenerator=CounterIds(prefix="-"))
+            self.assertEqual(bodies, self.expected(objects, keyValues=True, compactArrays=True, schema={"seq": None, "data": None},
+                                                   idGenerator=CounterIds(prefix="-")))
+            # Every Object without 'id' gets the next number
+            self.assertEqual([ObjectFiwareConverter._obj(body)["id"] for body in bodies],
+                             ["Message-1", "Message1", "Message-2", "Message3", "Message-3", "Message5"])
+            messages = converter.fiware2Obj(bodies, Message, keyValues=True)
+        self.assertEqual([message.seq for message in messages], list(range(6)))
+        self.assertEqual(messages[1].data, [1] * 10)
+
+    def test_Fiware2Message(self):
+        bodies = self.expected([Pose(i) for i in range(5)])
+        with ParallelConverter(workers=2, chunkSize=2, useThreads=False) as converter:
+            # The class of a ROS-Message is passed to fiware2Obj as it is
+            poses = converter.fiware2Obj(bodies, Pose)
+        self.assertEqual([pose.seq for pose in poses], list(range(5)))
+        self.assertEqual(poses[2].frame_id, "map/2")
+
+    def test_Lazy(self):
+        bodies = self.expected([Message(i) for i in range(5)])
+        with ParallelConverter(workers=2, chunkSize=2, useThreads=True) as converter:
+            messages = converter.fiware2Obj(bodies, Message, lazy=True)
+        self.assertTrue(all(isinstance(message, LazyEntity) for message in messages))
+        self.assertEqual([message.seq for message in messages], list(range(5)))
+        with ParallelConverter(workers=1, useThreads=False) as converter:
+            self.assertRaises(ValueError, converter.fiware2Obj, bodies, Message, lazy=True)
+
+    @unittest.skipIf(shared_memory is None or not os.path.isdir("/dev/shm"), "Needs shared memory in /dev/shm")
+    def test_ErrorUnlinksSharedMemory(self):
+        objects = [Message(i) for i in range(20)]
+        objects[0].frame = set([0])
+        before = set(os.listdir("/dev/shm"))
+        with ParallelConverter(workers=2, chunkSize=2, useThreads=False, sharedMemoryThreshold=1) as converter:
+            self.assertRaises(ValueError, converter.obj2Fiware, objects)
+            # The pool can still be used
+            self.assertEqual(converter.obj2Fiware(objects[1:]), self.expected(objects[1:]))
+        self.assertEqual(set(os.listdir("/dev/shm")) - before, set())
+
+    def test_InvalidChunkSize(self):
+        self.assertRaises(ValueError, ParallelConverter, chunkSize=0)
+
+
+class Message(object):
+    def __init__(self, seq=0):
+        self.id = "Message" + str(seq)
+        self.seq = seq
+        self.frame = "map/" + str(seq)
+        self.data = [seq] * 10
+
+
+class Pose(object):
+    __slots__ = ['seq', 'frame_id']
+    _slot_types = ['uint32', 'string']
+    _type = 'test_msgs/Pose'
+
+    def __init__(self, seq=0):
+        self.seq = seq
+        self.frame_id = "map/" + str(seq)
@@ -0,0 +1,56 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import random
+import unittest
+try:
+    import urllib.parse as urllib
+except ImportError:
+    import urllib
+
+import url_encoding
+
+
+class TestUrlEncoding(unittest.TestCase):
+
+    def setUp(self):
+        url_encoding.clear()
+
+    def test_SameAsUrllib(self):
+        rnd = random.Random(4711)
+        alphabet = [chr(i) for i in range(128)] + [u"\u00fc", u"\u20ac", "%", "/", " "]
+        for length in list(range(8)) + [63, 64, 65, 300]:
+            for _ in range(50):
+                text = "".join(rnd.choice(alphabet) for _ in range(length))
+                # Python 3 escapes the UTF-8 bytes of Strings, also on Python 2
+                self.assertEqual(url_encoding.quote(text), urllib.quote(text.encode('utf-8'), safe=''))
+                self.assertEqual(url_encoding.unquote(url_encoding.quote(text)), text)
+        for text in ["%", "%2", "%ZZ", "a%2Fb%c3%bc", "%F0" * 70]:
+            self.assertEqual(url_encoding.unquote(text), urllib.unquote(text))
+
+    def test_SafeStringsAreUnchanged(self):
+        text = "base_link" * 10
+        self.assertTrue(url_encoding.quote(text) is text)
+        self.assertTrue(url_encoding.unquote(text) is text)
+        self.assertEqual(url_encoding.quote("sensor_msgs/LaserScan"), "sensor_msgs%2FLaserScan")
+        self.assertEqual(url_encoding.quote(b"a/b"), urllib.quote(b"a/b", safe=''))
+
+    def test_MemoIsBounded(self):
+        for i in range(url_encoding.MEMO_SIZE + 10):
+            url_encoding.quote("frame/" + str(i))
+        self.assertEqual(url_encoding._quoteShort.cache_info().currsize, url_encoding.MEMO_SIZE)
+        # Long Strings are not memoized
+        url_encoding.clear()
+        url_encoding.quote("/" * (url_encoding.MAX_MEMO_LENGTH + 1))
+        self.assertEqual(url_encoding._quoteShort.cache_info().currsize, 0)
@@ -0,0 +1,127 @@
+#    Copyright 2018 Fraunhofer IML
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+""" URL-encoding of the Strings with encode=True (the Context-Broker forbids some characters).
+    quote(text) returns the same as quote(text, safe='') of urllib, unquote(text) the same as
+    unquote(text) of Python 3, also on Python 2 (unicode is escaped as UTF-8). Strings without
+    characters to escape (or without '%') are returned unchanged after one check. Short Strings
+    (types, ids, frame names, ...) are memoized in a bounded LRU-cache.
+"""
+
+import re
+try:
+    import urllib.parse as _urllib
+except ImportError:
+    import urllib as _urllib
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2
+    lru_cache = None
+from collections import OrderedDict, namedtuple
+
+# Only Strings up to this length are memoized
+MAX_MEMO_LENGTH = 64
+# Number of memoized Strings per function
+MEMO_SIZE = 1024
+
+# The characters which urllib does not escape (with safe=''), they differ between Python versions
+SAFE_CHARACTERS = "".join(c for c in map(chr, range(128)) if _urllib.quote(c, safe='') == c)
+_UNSAFE = re.compile("[^" + re.escape(SAFE_CHARACTERS) + "]")
+# str.isascii() needs Python 3.7
+_NON_ASCII = re.compile(u"[^\x00-\x7f]")
+# Translation of the ASCII-characters into their escapes
+_ESCAPES = dict((i, "%{:02X}".format(i)) for i in range(128) if chr(i) not in SAFE_CHARACTERS)
+# unicode on Python 2, str on Python 3
+_TEXT = type(u"")
+# The statistics of functools.lru_cache
+_CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def _quote(text):
+    if type(text) is not str:
+        if type(text) is _TEXT:
+            # Python 2, urllib only escapes bytes
+            return _urllib.quote(text.encode('utf-8'), safe='').decode('ascii')
+        # E.g. bytes, urllib decides
+        return _urllib.quote(text, safe='')
+    if _UNSAFE.search(text) is None:
+        return text
+    if bytes is not str and _NON_ASCII.search(text) is None:
+        return text.translate(_ESCAPES)
+    # Python 2 or non ASCII-characters
+    return _urllib.quote(text, safe='')
+
+
+def _unquote(text):
+    try:
+        if '%' not in text:
+            return text
+    except TypeError:
+        pass
+    if type(text) is _TEXT and type(text) is not str:
+        # Python 2, the same as Python 3 (which replaces invalid UTF-8)
+        return _urllib.unquote(text.encode('utf-8')).decode('utf-8', 'replace')
+    return _urllib.unquote(text)
+
+
+def _memoize(function):
+    """ Returns the function with a bounded LRU-cache """
+    if lru_cache is not None:
+        return lru_cache(maxsize=MEMO_SIZE)(function)
+    memo = OrderedDict()
+    counts = [0, 0]
+
+    def memoized(text):
+        try:
+            result = memo.pop(text)
+            counts[0] += 1
+        except KeyError:
+            result = function(text)
+            counts[1] += 1
+            if len(memo) >= MEMO_SIZE:
+                memo.popitem(last=False)
+        memo[text] = result
+        return result
+
+    def cache_clear():
+        memo.clear()
+        counts[:] = [0, 0]
+    memoized.cache_clear = cache_clear
+    memoized.cache_info = lambda: _CacheInfo(counts[0], counts[1], MEMO_SIZE, len(memo))
+    return memoized
+
+
+_quoteShort = _memoize(_quote)
+_unquoteShort = _memoize(_unquote)
+
+
+def quote(text):
+    """ The same as urllib's quote(text, safe='') """
+    if len(text) <= MAX_MEMO_LENGTH:
+        return _quoteShort(text)
+    return _quote(text)
+
+
+def unquote(text):
+    """ The same as urllib's unquote(text) """
+    if len(text) <= MAX_MEMO_LENGTH:
+        return _unquoteShort(text)
+    return _unquote(text)
+
+
+def clear():
+    """ Forgets the memoized Strings """
+    _quoteShort.cache_clear()
+    _unquoteShort.cache_clear()